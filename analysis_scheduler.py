@@ -0,0 +1,107 @@
+# analysis_scheduler.py
+
+import threading
+import time
+
+
+class AnalysisScheduler:
+    """
+    Paces the fall-detection inference thread independently of the camera frame rate.
+
+    The inference thread always takes the newest decoded frame; frames that arrive while it is
+    busy are skipped (and counted) instead of queueing, so latency never accumulates. On top of
+    that the scheduler can cap the analysis rate at `target_fps` and/or keep inference within a
+    `cpu_budget` fraction of one core, based on a moving average of how long inference takes.
+    With neither set it analyzes back-to-back.
+    """
+
+    def __init__(self, target_fps=None, cpu_budget=None, smoothing=0.2):
+        """
+        :param target_fps: Maximum analyses per second, or None for no cap.
+        :param cpu_budget: Fraction (0, 1] of one core inference may use, or None for no cap.
+        :param smoothing: Weight of the newest sample in the moving averages.
+        """
+        if cpu_budget is not None and not 0 < cpu_budget <= 1:
+            raise ValueError(f"cpu_budget must be in (0, 1], got {cpu_budget}")
+        self.target_fps = target_fps
+        self.cpu_budget = cpu_budget
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self._last_start = None
+        self._avg_duration = None
+
+        self.processed = 0
+        self.dropped = 0
+        self.rendered = 0
+        self.analysis_ms = 0.0
+        self.analysis_latency_ms = 0.0
+        self.stream_latency_ms = 0.0
+        self.overlay_age_ms = 0.0
+
+    def interval(self):
+        """Minimum seconds between the starts of two analyses under the current limits."""
+        interval = 0.0
+        if self.target_fps:
+            interval = 1.0 / self.target_fps
+        if self.cpu_budget is not None and self._avg_duration is not None:
+            interval = max(interval, self._avg_duration / self.cpu_budget)
+        return interval
+
+    def delay(self, now=None):
+        """Seconds the inference thread should wait before starting the next analysis."""
+        if self._last_start is None:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        return max(0.0, self._last_start + self.interval() - now)
+
+    def start(self, skipped=0, now=None):
+        """
+        Marks the start of an analysis.
+
+        :param skipped: Frames that arrived since the previous analysis and will never be analyzed.
+        """
+        with self._lock:
+            self._last_start = time.monotonic() if now is None else now
+            self.dropped += max(0, skipped)
+
+    def finish(self, duration, latency, frames=1):
+        """
+        :param duration: Seconds spent in inference and overlay drawing.
+        :param latency: Seconds from the (oldest) frame's arrival until its overlays were available.
+        :param frames: Frames analyzed in this round, e.g. one per robot in a batch.
+        """
+        with self._lock:
+            self.processed += frames
+            self._avg_duration = duration if self._avg_duration is None else \
+                self._avg_duration + self.smoothing * (duration - self._avg_duration)
+            self.analysis_ms = self._smooth(self.analysis_ms, duration * 1000)
+            self.analysis_latency_ms = self._smooth(self.analysis_latency_ms, latency * 1000)
+
+    def rendered_frame(self, latency, overlay_age=None):
+        """
+        Records one frame published to the MJPEG stream.
+
+        :param latency: Seconds from the frame's arrival until its JPEG was published.
+        :param overlay_age: Seconds between the analyzed frame the overlays came from and this frame.
+        """
+        with self._lock:
+            self.rendered += 1
+            self.stream_latency_ms = self._smooth(self.stream_latency_ms, latency * 1000)
+            if overlay_age is not None:
+                self.overlay_age_ms = self._smooth(self.overlay_age_ms, overlay_age * 1000)
+
+    def _smooth(self, current, sample):
+        return sample if current == 0.0 else current + self.smoothing * (sample - current)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "analysis_frames_processed": self.processed,
+                "analysis_frames_dropped": self.dropped,
+                "stream_frames_rendered": self.rendered,
+                "analysis_ms": round(self.analysis_ms, 1),
+                "analysis_interval_ms": round(self.interval() * 1000, 1),
+                "analysis_latency_ms": round(self.analysis_latency_ms, 1),
+                "stream_latency_ms": round(self.stream_latency_ms, 1),
+                "overlay_age_ms": round(self.overlay_age_ms, 1),
+            }
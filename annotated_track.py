@@ -0,0 +1,92 @@
+# annotated_track.py
+
+import asyncio
+import fractions
+import time
+
+import av
+from aiortc import MediaStreamTrack
+from aiortc.mediastreams import MediaStreamError
+
+# RTP video clock
+VIDEO_TIME_BASE = fractions.Fraction(1, 90000)
+
+
+def _to_yuv420p(image):
+    return av.VideoFrame.from_ndarray(image, format="bgr24").reformat(format="yuv420p")
+
+
+class AnnotatedFeedTrack(MediaStreamTrack):
+    """
+    One robot's annotated /video_feed picture as a WebRTC video track, for dashboard viewers.
+
+    While the track is live, the robot's render thread publishes a copy of every frame it renders
+    to `stream.video_frames` as (BGR ndarray, time.monotonic() the camera frame arrived), and the
+    offline placeholder when it shows that. Each publish sets an asyncio.Event on the track's
+    event loop (via call_soon_threadsafe), so `recv()` waits for the next frame without holding an
+    executor thread; only the conversion to yuv420p runs off the loop. Frames are stamped on the
+    90 kHz RTP clock from the arrival time, so viewers get the camera's pacing. When nothing new arrives for `idle_timeout` (the robot is
+    offline), the last picture is sent again, so viewers who join meanwhile still get a picture.
+
+    Serve it to viewers through `MediaRelay.subscribe(track, buffered=False)`: the wait and the
+    conversion then happen once however many viewers there are, every encoder gets the same
+    ready-to-encode frame, and a slow viewer skips to the newest frame instead of queueing.
+    """
+
+    kind = "video"
+
+    def __init__(self, stream, idle_timeout=1.0):
+        """
+        :param stream: The RobotStream whose render output is sent.
+        :param idle_timeout: Seconds without a new frame before the last one is sent again.
+        """
+        super().__init__()
+        self.stream = stream
+        self.idle_timeout = idle_timeout
+        self._loop = asyncio.get_running_loop()
+        self._new_frame = asyncio.Event()
+        self._broadcaster = stream.video_frames
+        self._broadcaster.subscribe(self._on_publish)
+        self._seq = 0
+        self._start = None
+        self._last_pts = -1
+
+    def _on_publish(self):
+        # Called on the render thread
+        try:
+            self._loop.call_soon_threadsafe(self._new_frame.set)
+        except RuntimeError:
+            pass  # the event loop has shut down
+
+    async def recv(self):
+        while True:
+            if self.readyState != "live":
+                raise MediaStreamError
+            # Cleared before reading, so a frame published in between still sets it
+            self._new_frame.clear()
+            seq, entry = self._broadcaster.latest()
+            if seq == self._seq:
+                try:
+                    await asyncio.wait_for(self._new_frame.wait(), self.idle_timeout)
+                    continue
+                except asyncio.TimeoutError:
+                    pass  # nothing new: send the last picture again
+            if entry is not None:
+                break
+        image, timestamp = entry
+        if seq == self._seq:
+            timestamp = time.monotonic()
+        self._seq = seq
+        if self._start is None:
+            self._start = timestamp
+        out = await asyncio.to_thread(_to_yuv420p, image)
+        out.pts = max(round((timestamp - self._start) / VIDEO_TIME_BASE), self._last_pts + 1)
+        out.time_base = VIDEO_TIME_BASE
+        self._last_pts = out.pts
+        return out
+
+    def stop(self):
+        if self.readyState == "live":
+            self._broadcaster.unsubscribe(self._on_publish)
+        super().stop()
+        self._new_frame.set()
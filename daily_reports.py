@@ -3,7 +3,9 @@ import csv
 import smtplib
 import shutil
 import threading
+import time
 import base64
+from collections import defaultdict
 from datetime import datetime, timedelta
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -11,13 +13,17 @@ from flask import Flask, jsonify, request
 from dotenv import load_dotenv
 import json
 # ---MODIFIED---
-from report_visualizer import generate_tsne_visualization
+from report_jobs import ReportJobQueue
+from metrics_registry import MetricsRegistry
 
 # === LOAD ENVIRONMENT VARIABLES ===
 load_dotenv()
 
 # === CONFIGURATION ===
 SENSOR_CSV_PATH = "Temi_Sensor_Data/sensor_data_master.csv"
+CSV_METRICS_CHECKPOINT_PATH = "Temi_Sensor_Data/.csv_metrics_checkpoint.json"
+# Counters and gauges of each finished day, so a report for a past date can show that day's figures
+DAILY_METRICS_DIR = "Temi_Sensor_Data/daily_metrics"
 VIDEO_DIR = "Temi_VODs"
 EMAIL_SENDER = os.getenv("TEMI_EMAIL_SENDER")
 EMAIL_PASSWORD = os.getenv("TEMI_EMAIL_PASSWORD")
@@ -28,48 +34,83 @@ REPORT_TIME = os.getenv("TEMI_REPORT_TIME", "20:00")  # Default to 8 PM
 VISUALS_DIR = "visualizations"
 
 # === METRIC TRACKERS ===
-metrics = {
-    "record_triggers_today": 0,
-    "new_csv_rows_today": 0,
-    "total_csv_rows": 0,
-    "frames_processed": 0,
-    "falls_box": 0,
-    "falls_pose": 0,
-    "falls_bottom": 0,
-    "falls_full": 0,
-    "people_detected_today": 0,
-    "stream_offline_count": 0,
-    "stream_frozen_count": 0,
-    "stream_live_seconds": 0,
-    "stream_frozen_seconds": 0,
-    "stream_offline_seconds": 0,
-    "webrtc_connections": 0,
-    "http_api_calls": 0
-}
+# Recorded from the Flask threads, the aiortc event loop, the render/inference threads and the
+# scheduler; the registry shards them per thread so recording never takes a lock
+metrics = MetricsRegistry()
+DAILY_COUNTERS = (
+    "record_triggers_today",
+    "frames_processed",
+    "falls_box",
+    "falls_pose",
+    "falls_bottom",
+    "falls_full",
+    "people_detected_today",
+    "stream_offline_count",
+    "stream_frozen_count",
+    "stream_live_seconds",
+    "stream_frozen_seconds",
+    "stream_offline_seconds",
+    "webrtc_connections",
+    "http_api_calls",
+)
+for name in DAILY_COUNTERS:
+    metrics.counter(name)
+new_csv_rows_today = metrics.gauge("new_csv_rows_today")
+total_csv_rows = metrics.gauge("total_csv_rows")
+# MJPEG frames sent to /video_feed clients: already encoded (hit) or encoded for that client's ?w=&q= (miss)
+jpeg_cache_hits = metrics.counter("jpeg_cache_hits", "MJPEG frames served from an already encoded JPEG")
+jpeg_cache_misses = metrics.counter("jpeg_cache_misses", "MJPEG frame variants encoded on request")
+# Hot-path timing spans, in milliseconds
+decode_time = metrics.histogram("decode_ms", "Frame YUV to BGR conversion (with downscale) per view")
+inference_time = metrics.histogram("inference_ms", "YOLO pose inference per batch")
+overlay_draw_time = metrics.histogram("overlay_draw_ms", "Fall detection overlay drawing per analyzed frame")
+overlay_compose_time = metrics.histogram("overlay_compose_ms", "Laying the overlays over one displayed frame")
+encode_time = metrics.histogram("jpeg_encode_ms", "MJPEG frame encode (cv2.imencode)")
+video_write_time = metrics.histogram("video_write_ms", "Recording encode and mux per frame")
+csv_write_time = metrics.histogram("csv_write_ms", "Sensor CSV batch append")
+classify_time = metrics.histogram("smell_classify_ms", "KNN smell classification per sensor row")
 
 
 # === TRACKER UPDATE FUNCTIONS (called from server.py) ===
-def increment(key):
-    if key in metrics:
-        metrics[key] += 1
+def increment(key, amount=1):
+    counter = metrics.get(key)
+    if counter is not None:
+        counter.inc(amount)
 
 
 def add_time(key, seconds):
-    if key in metrics:
-        metrics[key] += seconds
+    increment(key, seconds)
 
 
 def set_total_csv_rows(count):
-    metrics["total_csv_rows"] = count
+    total_csv_rows.set(count)
 
 
 def reset_daily_metrics():
-    for key in metrics:
-        if key.endswith("today") or key in ["frames_processed", "falls_box", "falls_pose", "falls_bottom", "falls_full",
-                                            "people_detected_today", "stream_offline_count", "stream_frozen_count",
-                                            "stream_live_seconds", "stream_frozen_seconds", "stream_offline_seconds",
-                                            "webrtc_connections", "http_api_calls"]:
-            metrics[key] = 0
+    metrics.reset_counters()
+    new_csv_rows_today.set(0)
+
+
+def save_daily_metrics(date):
+    """Stores the current counters and gauges as the figures of `date` (a datetime.date)."""
+    update_csv_metrics()
+    path = os.path.join(DAILY_METRICS_DIR, f"{date.isoformat()}.json")
+    try:
+        os.makedirs(DAILY_METRICS_DIR, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(metrics.snapshot().values, f)
+    except OSError as e:
+        print(f"⚠️ Failed to save the metrics of {date}: {e}")
+
+
+def load_daily_metrics(date):
+    """The counters and gauges saved for `date`, or None if none were saved."""
+    path = os.path.join(DAILY_METRICS_DIR, f"{date.isoformat()}.json")
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
 
 
 # === METRIC EXTRACTION ===
@@ -82,35 +123,131 @@ def get_disk_space():
     return round(free / (1024 ** 3), 2)  # in GB
 
 
+class CsvRowCounter:
+    """
+    Incremental row counter for the append-only sensor CSV.
+
+    Remembers the byte offset it has counted up to and only reads rows appended since, so
+    each update costs O(new rows) rather than a rescan of the whole file. The offset and counts
+    are checkpointed together to disk, which lets a restart resume without rescanning; a
+    stale checkpoint only means a few rows are re-read, never double counted.
+    """
+
+    def __init__(self, csv_path, checkpoint_path, checkpoint_interval=10.0):
+        self.csv_path = csv_path
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.lock = threading.Lock()
+        self.inode = None
+        self.offset = 0
+        self.total_rows = 0
+        self.today = datetime.now().date().isoformat()
+        self.today_rows = 0
+        self.last_checkpoint = 0
+        self._load_checkpoint()
+
+    def _reset(self, inode=None):
+        self.inode = inode
+        self.offset = 0
+        self.total_rows = 0
+        self.today_rows = 0
+
+    def _load_checkpoint(self):
+        if not os.path.exists(self.checkpoint_path):
+            return
+        try:
+            with open(self.checkpoint_path) as f:
+                state = json.load(f)
+            self.inode = state["inode"]
+            self.offset = state["offset"]
+            self.total_rows = state["total_rows"]
+            if state["today"] == self.today:
+                self.today_rows = state["today_rows"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Ignoring unreadable CSV metrics checkpoint: {e}")
+            self._reset()
+
+    def _save_checkpoint(self):
+        state = {
+            "inode": self.inode,
+            "offset": self.offset,
+            "total_rows": self.total_rows,
+            "today": self.today,
+            "today_rows": self.today_rows,
+        }
+        tmp_path = self.checkpoint_path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.checkpoint_path)
+            self.last_checkpoint = time.time()
+        except OSError as e:
+            print(f"⚠️ Failed to save CSV metrics checkpoint: {e}")
+
+    def update(self):
+        """Counts newly appended rows and returns (total_rows, today_rows)."""
+        with self.lock:
+            today = datetime.now().date().isoformat()
+            if today != self.today:
+                # Midnight rollover: rows already counted belong to the previous day
+                self.today = today
+                self.today_rows = 0
+
+            if not os.path.exists(self.csv_path):
+                self._reset()
+                return self.total_rows, self.today_rows
+
+            stat = os.stat(self.csv_path)
+            if stat.st_ino != self.inode or stat.st_size < self.offset:
+                # File was replaced or truncated; count it again from the start
+                self._reset(stat.st_ino)
+
+            if stat.st_size > self.offset:
+                with open(self.csv_path, "rb") as f:
+                    f.seek(self.offset)
+                    chunk = f.read(stat.st_size - self.offset)
+
+                # Leave a partially written last line for the next update
+                end = chunk.rfind(b"\n") + 1
+                today_prefix = today.encode()
+                for line in chunk[:end].splitlines():
+                    if not line.strip() or line.startswith(b"timestamp"):
+                        continue  # blank line or header
+                    self.total_rows += 1
+                    if line.startswith(today_prefix):
+                        self.today_rows += 1
+                self.offset += end
+
+                if time.time() - self.last_checkpoint >= self.checkpoint_interval:
+                    self._save_checkpoint()
+
+            return self.total_rows, self.today_rows
+
+    def checkpoint(self):
+        with self.lock:
+            self._save_checkpoint()
+
+
+csv_row_counter = CsvRowCounter(SENSOR_CSV_PATH, CSV_METRICS_CHECKPOINT_PATH)
+
+
 def update_csv_metrics():
-    today = datetime.now().date()
-    row_count = 0
-    today_count = 0
-    if os.path.exists(SENSOR_CSV_PATH):
-        with open(SENSOR_CSV_PATH, newline='') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                row_count += 1
-                if 'timestamp' in row:
-                    ts = datetime.strptime(row['timestamp'], "%Y-%m-%d %H:%M:%S")
-                    if ts.date() == today:
-                        today_count += 1
-    metrics["new_csv_rows_today"] = today_count
-    metrics["total_csv_rows"] = row_count
-    import server
-    server.push_metrics_update()
-
-
-def get_video_metrics():
+    total_rows, today_rows = csv_row_counter.update()
+    new_csv_rows_today.set(today_rows)
+    total_csv_rows.set(total_rows)
+
+
+def get_video_metrics(date=None):
+    """:return: (videos saved, videos saved on `date` (today by default), total size in MB)"""
     count_total = 0
     count_today = 0
     total_size = 0
-    today_str = datetime.now().strftime("%Y%m%d")
+    today_str = (date or datetime.now().date()).strftime("%Y%m%d")
 
     if os.path.exists(VIDEO_DIR):
         for f in os.listdir(VIDEO_DIR):
             path = os.path.join(VIDEO_DIR, f)
-            if f.endswith(".mp4") and os.path.isfile(path):
+            if f.endswith((".mp4", ".mkv")) and os.path.isfile(path):
                 count_total += 1
                 total_size += os.path.getsize(path)
 
@@ -124,6 +261,8 @@ def get_video_metrics():
 
 
 def format_seconds(seconds):
+    if not isinstance(seconds, (int, float)):
+        return seconds  # not recorded
     seconds = int(seconds)
     hours = seconds // 3600
     minutes = (seconds % 3600) // 60
@@ -133,47 +272,64 @@ def format_seconds(seconds):
 
 # === EMAIL REPORT GENERATION ===
 # ---MODIFIED---
-def generate_html_report(report_data=None):
-    update_csv_metrics()
-    count_total, count_today, total_size = get_video_metrics()
+def generate_html_report(report_data=None, date=None):
+    """
+    :param report_data: Result of generate_tsne_visualization, or None to use the saved image.
+    :param date: Day the report is for (a datetime.date), today by default. Past days show the
+                 figures saved for them by save_daily_metrics.
+    """
+    date = date or datetime.now().date()
+    count_total, count_today, total_size = get_video_metrics(date)
     disk_free = get_disk_space()
-    date_str = datetime.now().date().isoformat()
+    date_str = date.isoformat()
+    missing_note = ""
+    if date == datetime.now().date():
+        update_csv_metrics()
+        # One snapshot so every figure in the report is from the same moment
+        snapshot = metrics.snapshot().values
+    else:
+        snapshot = load_daily_metrics(date)
+        if snapshot is None:
+            snapshot = {}
+            missing_note = "<p style='color:red;'>No server metrics were saved for this day.</p>"
+        snapshot = defaultdict(lambda: "n/a", snapshot)
 
     html = f"""
     <html>
     <body style='font-family:Arial; background-color:#f4f4f4; padding:20px;'>
         <h2 style='color:#2c3e50;'>🤖 Temi Server Daily Report - {date_str}</h2>
+        {missing_note}
 
         <h3>📊 Data Collection</h3>
         <ul>
-            <li><strong>Sensor recordings triggered:</strong> {metrics['record_triggers_today']}</li>
-            <li><strong>New rows added today:</strong> {metrics['new_csv_rows_today']}</li>
-            <li><strong>Total rows in CSV:</strong> {metrics['total_csv_rows']}</li>
+            <li><strong>Sensor recordings triggered:</strong> {snapshot['record_triggers_today']}</li>
+            <li><strong>New rows added today:</strong> {snapshot['new_csv_rows_today']}</li>
+            <li><strong>Total rows in CSV:</strong> {snapshot['total_csv_rows']}</li>
         </ul>
 
         <h3>🎥 Video & Fall Detection</h3>
         <ul>
-        <li><strong>Frames processed:</strong> {metrics['frames_processed']}</li>
-        <li><strong>Falls (Box):</strong> {metrics['falls_box']}</li>
-        <li><strong>Falls (Pose):</strong> {metrics['falls_pose']}</li>
-        <li><strong>Falls (Bottom):</strong> {metrics['falls_bottom']}</li>
-        <li><strong>Falls (Full Consensus):</strong> {metrics['falls_full']}</li>
-        <li><strong>People detected today:</strong> {metrics['people_detected_today']}</li>
+        <li><strong>Frames processed:</strong> {snapshot['frames_processed']}</li>
+        <li><strong>Falls (Box):</strong> {snapshot['falls_box']}</li>
+        <li><strong>Falls (Pose):</strong> {snapshot['falls_pose']}</li>
+        <li><strong>Falls (Bottom):</strong> {snapshot['falls_bottom']}</li>
+        <li><strong>Falls (Full Consensus):</strong> {snapshot['falls_full']}</li>
+        <li><strong>People detected today:</strong> {snapshot['people_detected_today']}</li>
         </ul>
 
         <h3>📶 Stream/Uptime</h3>
         <ul>
-            <li><strong>Stream offline events:</strong> {metrics['stream_offline_count']}</li>
-            <li><strong>Stream frozen events:</strong> {metrics['stream_frozen_count']}</li>
-            <li><strong>Live time:</strong> {format_seconds(metrics['stream_live_seconds'])}</li>
-            <li><strong>Frozen time:</strong> {format_seconds(metrics['stream_frozen_seconds'])}</li>
-            <li><strong>Offline time:</strong> {format_seconds(metrics['stream_offline_seconds'])}</li>
+            <li><strong>Stream offline events:</strong> {snapshot['stream_offline_count']}</li>
+            <li><strong>Stream frozen events:</strong> {snapshot['stream_frozen_count']}</li>
+            <li><strong>Live time:</strong> {format_seconds(snapshot['stream_live_seconds'])}</li>
+            <li><strong>Frozen time:</strong> {format_seconds(snapshot['stream_frozen_seconds'])}</li>
+            <li><strong>Offline time:</strong> {format_seconds(snapshot['stream_offline_seconds'])}</li>
         </ul>
 
         <h3>🌐 API Activity</h3>
         <ul>
-            <li><strong>WebRTC connections:</strong> {metrics['webrtc_connections']}</li>
-            <li><strong>HTTP API calls:</strong> {metrics['http_api_calls']}</li>
+            <li><strong>WebRTC connections:</strong> {snapshot['webrtc_connections']}</li>
+            <li><strong>HTTP API calls:</strong> {snapshot['http_api_calls']}</li>
         </ul>
 
         <h3>🗂 File & Storage</h3>
@@ -207,16 +363,17 @@ def generate_html_report(report_data=None):
             <img src='data:image/png;base64,{img_base64}' alt='t-SNE Plot' style='max-width:100%; border:1px solid #ccc; padding:5px;'/>
             """
         else:
-            html += "<h3>🔬 Smell Data Visualization (t-SNE)</h3><p style='color:red;'>No t-SNE image available for today.</p>"
+            html += f"<h3>🔬 Smell Data Visualization (t-SNE)</h3><p style='color:red;'>No t-SNE image available for {date_str}.</p>"
 
     html += "</body></html>"
     return html
 
 
 # ---MODIFIED---
-def send_email_report(report_data=None):
-    subject = f"Temi Server Report - {datetime.now().strftime('%Y-%m-%d')}"
-    html = generate_html_report(report_data)
+def send_email_report(report_data=None, date=None):
+    date = date or datetime.now().date()
+    subject = f"Temi Server Report - {date.isoformat()}"
+    html = generate_html_report(report_data, date)
 
     msg = MIMEMultipart("alternative")
     msg["Subject"] = subject
@@ -249,13 +406,17 @@ def schedule_daily_report():
 
 
 def run_and_reschedule():
-    print("⏱ Running t-SNE visualization for daily report...")
-    # For the scheduled run, we always save the image to disk.
-    generate_tsne_visualization(save_file=True)
+    print("⏱ Queueing daily report (t-SNE visualization + email)...")
+    # The scheduled run always saves the image to disk and still emails the metrics without it
+    report_queue.submit(save_file=True, send_without_visualization=True, on_done=_finish_scheduled_report)
 
-    print("📧 Sending report email...")
-    # The send function will load the saved image from disk.
-    send_email_report()
 
+def _finish_scheduled_report(job):
+    print(f"📧 Scheduled report job {job.id} finished with status '{job.status}'.")
+    save_daily_metrics(job.date)
     reset_daily_metrics()
-    schedule_daily_report()
\ No newline at end of file
+    schedule_daily_report()
+
+
+# Reports render in a worker process and are emailed from here once ready
+report_queue = ReportJobQueue(deliver=lambda report_data, date: send_email_report(report_data=report_data, date=date))
@@ -0,0 +1,225 @@
+# fall_clips.py
+
+import fractions
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import av
+
+TIME_BASE = fractions.Fraction(1, 1000)
+# Frames reach the buffer after rendering; wait this long past a clip's end before writing it
+RENDER_GRACE = 0.5
+
+
+class FrameRing:
+    """
+    The last `seconds` of one stream's JPEG frames, never more than `max_bytes` in total.
+
+    Holds the encoded bytes the render thread already produced for /video_feed, so buffering
+    costs no extra encoding and a fraction of the memory of raw frames.
+    """
+
+    def __init__(self, seconds, max_bytes):
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._frames = deque()   # (timestamp, jpeg bytes, (width, height))
+
+    def append(self, timestamp, jpeg, size):
+        self._frames.append((timestamp, jpeg, size))
+        self.bytes += len(jpeg)
+        while self._frames and (self.bytes > self.max_bytes or self._frames[0][0] < timestamp - self.seconds):
+            self.bytes -= len(self._frames.popleft()[1])
+
+    def since(self, start):
+        return [entry for entry in self._frames if entry[0] >= start]
+
+    def __len__(self):
+        return len(self._frames)
+
+
+class PendingClip:
+    def __init__(self, robot_id, event_time, start, end, methods, frames):
+        self.robot_id = robot_id
+        self.event_time = event_time
+        self.started_at = datetime.now()
+        self.start = start
+        self.end = end
+        self.methods = set(methods)
+        self.frames = frames
+
+
+class FallClipWriter:
+    """
+    Saves a clip around every detected fall from a pre-event ring buffer.
+
+    The render threads feed every JPEG they publish into a per-robot FrameRing with `add_frame()`.
+    When `trigger()` reports a fall by one of the configured methods, the frames from
+    `pre_seconds` before the event are taken from the ring and the clip keeps collecting frames
+    until `post_seconds` after it; further falls on the same robot meanwhile extend the clip (up
+    to `max_clip_seconds`) instead of starting another. A background thread then muxes the JPEGs
+    as-is into an MJPEG MP4 in `directory`, so saving a clip decodes and re-encodes nothing.
+    """
+
+    def __init__(self, directory, pre_seconds=5.0, post_seconds=5.0, methods=("full",),
+                 max_bytes_per_robot=32 * 1024 * 1024, max_clip_seconds=30.0):
+        """
+        :param directory: Where clips are written, as fall_clip_<YYYYmmdd_HHMMSS>_<robot>_<methods>.mp4
+                          (with _2, _3, ... appended when that name is taken).
+        :param pre_seconds: Seconds of video kept from before the fall.
+        :param post_seconds: Seconds of video recorded after the (last) fall.
+        :param methods: Fall methods that trigger a clip, e.g. ("full",) or ("box", "full").
+        :param max_bytes_per_robot: Memory cap of each robot's ring buffer.
+        :param max_clip_seconds: Longest clip repeated falls may extend one to.
+        """
+        self.directory = directory
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.methods = frozenset(methods)
+        self.max_bytes_per_robot = max_bytes_per_robot
+        self.max_clip_seconds = max_clip_seconds
+
+        self.clips_written = 0
+        self.clips_failed = 0
+        self.last_clip = None
+
+        self._rings = {}
+        self._pending = {}   # robot id -> PendingClip
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="fall-clips", daemon=True)
+        self._thread.start()
+
+    @property
+    def enabled(self):
+        return bool(self.methods) and self.pre_seconds + self.post_seconds > 0
+
+    def add_frame(self, robot_id, timestamp, jpeg, size):
+        """
+        Buffers one published frame of `robot_id`.
+
+        :param timestamp: time.monotonic() of the frame, on the same clock as trigger().
+        :param jpeg: Encoded JPEG bytes.
+        :param size: (width, height) of the frame.
+        """
+        if not self.enabled:
+            return
+        with self._cond:
+            ring = self._rings.get(robot_id)
+            if ring is None:
+                ring = self._rings[robot_id] = FrameRing(self.pre_seconds, self.max_bytes_per_robot)
+            ring.append(timestamp, jpeg, size)
+            clip = self._pending.get(robot_id)
+            if clip is not None and timestamp <= clip.end:
+                clip.frames.append((timestamp, jpeg, size))
+
+    def trigger(self, robot_id, methods, event_time=None):
+        """
+        Starts (or extends) a clip for `robot_id` if any of `methods` is configured to trigger one.
+
+        :param methods: Fall methods that just confirmed a fall.
+        :param event_time: time.monotonic() of the frame the fall was detected in.
+        :return: True if a clip was started or extended.
+        """
+        methods = self.methods.intersection(methods)
+        if not methods or not self.enabled:
+            return False
+        event_time = time.monotonic() if event_time is None else event_time
+        with self._cond:
+            clip = self._pending.get(robot_id)
+            if clip is not None:
+                clip.end = min(event_time + self.post_seconds, clip.start + self.max_clip_seconds)
+                clip.methods |= methods
+            else:
+                start = event_time - self.pre_seconds
+                ring = self._rings.get(robot_id)
+                frames = ring.since(start) if ring is not None else []
+                self._pending[robot_id] = PendingClip(robot_id, event_time, start,
+                                                      event_time + self.post_seconds, methods, frames)
+            self._cond.notify()
+        return True
+
+    def close(self):
+        """Writes the clips still pending with the frames collected so far."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=10)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "fall_clips_written": self.clips_written,
+                "fall_clips_failed": self.clips_failed,
+                "fall_clips_pending": len(self._pending),
+                "fall_clip_buffer_bytes": sum(ring.bytes for ring in self._rings.values()),
+                "fall_clip_last": self.last_clip,
+            }
+
+    # === WRITER THREAD ===
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    due = [clip for clip in self._pending.values() if self._closed or clip.end + RENDER_GRACE <= now]
+                    if due or self._closed:
+                        break
+                    timeout = min(clip.end for clip in self._pending.values()) + RENDER_GRACE - now \
+                        if self._pending else None
+                    self._cond.wait(timeout)
+                for clip in due:
+                    del self._pending[clip.robot_id]
+                closed = self._closed
+            for clip in due:
+                self._write(clip)
+            if closed:
+                return
+
+    def _write(self, clip):
+        frames = [f for f in clip.frames if clip.start <= f[0] <= clip.end]
+        if not frames:
+            return
+        # A view switch mid-clip changes the frame size; keep the size the fall was seen at
+        size = min(frames, key=lambda f: abs(f[0] - clip.event_time))[2]
+        frames = [f for f in frames if f[2] == size]
+
+        os.makedirs(self.directory, exist_ok=True)
+        methods = "-".join(sorted(clip.methods))
+        name = f"fall_clip_{clip.started_at.strftime('%Y%m%d_%H%M%S')}_{clip.robot_id}_{methods}"
+        path = os.path.join(self.directory, f"{name}.mp4")
+        n = 2
+        while os.path.exists(path):
+            path = os.path.join(self.directory, f"{name}_{n}.mp4")
+            n += 1
+        try:
+            container = av.open(path, "w")
+            try:
+                stream = container.add_stream("mjpeg", rate=30)
+                stream.width, stream.height = size
+                stream.pix_fmt = "yuvj420p"
+                stream.time_base = TIME_BASE
+                last_pts = -1
+                for timestamp, jpeg, _ in frames:
+                    packet = av.Packet(jpeg)
+                    packet.stream = stream
+                    # Every MJPEG frame is intra-coded, so players can seek to any of them
+                    packet.is_keyframe = True
+                    packet.time_base = TIME_BASE
+                    packet.pts = packet.dts = max(round((timestamp - frames[0][0]) / TIME_BASE), last_pts + 1)
+                    last_pts = packet.pts
+                    container.mux(packet)
+            finally:
+                container.close()
+            with self._cond:
+                self.clips_written += 1
+                self.last_clip = path
+            print(f"🎬 Saved fall clip ({methods}) to {path}: {len(frames)} frames, "
+                  f"{frames[-1][0] - frames[0][0]:.1f}s")
+        except Exception as e:
+            with self._cond:
+                self.clips_failed += 1
+            print(f"❌ Failed to save fall clip {path}: {e}")
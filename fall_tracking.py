@@ -1,64 +1,258 @@
 # fall_tracking.py
 
 import time
-import math
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+
+# Per-(track, method) fall states
+NORMAL, ONSET, FALLEN, RECOVERING = 0, 1, 2, 3
+STATE_NAMES = ("normal", "onset", "fallen", "recovering")
+# Fall verdicts tracked per person; "full" is the consensus of the other three
+FALL_METHODS = ("box", "pose", "bottom", "full")
+
+
+class Track:
+    """Read-only snapshot of one tracked person, as returned by FallTracker.active_tracks."""
+
+    __slots__ = ("id", "centroid", "velocity", "last_seen", "states", "last_events")
+
+    def __init__(self, track_id, centroid, velocity, last_seen, states, last_events):
+        self.id = track_id
+        self.centroid = centroid
+        self.velocity = velocity
+        self.last_seen = last_seen
+        self.states = states
+        self.last_events = last_events
+
+    @property
+    def falling(self):
+        """Whether the track is in a confirmed fall by its first method."""
+        return next(iter(self.states.values())) in ("fallen", "recovering")
+
+    def __repr__(self):
+        return f"Track(id={self.id}, centroid={self.centroid}, velocity={self.velocity}, states={self.states})"
+
 
 class FallTracker:
-    def __init__(self, cooldown=1.0, persistence=1.0, match_threshold=50):
+    """
+    Associates per-frame person centroids with persistent tracks and counts falls per person.
+
+    Track state lives in parallel NumPy arrays (one row per track). Each update computes the full
+    track-to-detection distance matrix at once and solves the optimal one-to-one assignment
+    (Hungarian algorithm), so two people can never be merged into one track. Track positions
+    are predicted forward with a smoothed velocity before matching, which keeps fast-moving
+    people on their own track.
+
+    Every track runs one small state machine per detection method:
+
+        normal --fallen--> onset --fallen for confirm_time--> fallen (one event) --upright--> recovering
+        recovering --upright for recovery_time--> normal;  recovering --fallen--> fallen (no event)
+        normal --fallen within `cooldown` of the last event--> fallen (no event)
+
+    so a person whose verdict flickers under jittery keypoints produces a single fall, and a new
+    event for the same person and method needs a full recovery and `cooldown` seconds. As with the
+    original rising-edge tracker, a fall that starts inside the cooldown is not counted, however
+    long it is held.
+    """
+
+    def __init__(self, cooldown=1.0, persistence=1.0, match_threshold=50, velocity_smoothing=0.5,
+                 predict=True, methods=("fall",), confirm_time=0.0, recovery_time=0.0, clock=time.time):
+        """
+        :param cooldown: Minimum seconds between two fall events of the same track and method.
+        :param persistence: Seconds a track survives without being matched.
+        :param match_threshold: Maximum distance (px) between a predicted track position and a detection.
+        :param velocity_smoothing: Weight of the newest velocity measurement (0..1).
+        :param predict: Predict track positions from their velocity before matching.
+        :param methods: Names of the fall verdicts given per person to observe(), one state machine each.
+        :param confirm_time: Seconds a fallen verdict must hold before it counts as a fall.
+        :param recovery_time: Seconds a person must stay upright before a new fall can be counted.
+        :param clock: Time source, injectable for deterministic tests.
+        """
         self.cooldown = cooldown
         self.persistence = persistence
         self.match_threshold = match_threshold
-        self.active_tracks = {}  # {id: {"centroid": (x,y), "last_seen": t, "last_triggered": t, "falling": bool}}
-        self.unique_fallers = set() 
+        self.velocity_smoothing = velocity_smoothing
+        self.predict = predict
+        self.methods = tuple(methods)
+        self.confirm_time = confirm_time
+        self.recovery_time = recovery_time
+        self.clock = clock
+        self.unique_fallers = {method: set() for method in self.methods}
         self.next_id = 0
 
-    def _distance(self, c1, c2):
-        return math.sqrt((c1[0] - c2[0])**2 + (c1[1] - c2[1])**2)
+        n_methods = len(self.methods)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._pos = np.zeros((0, 2), dtype=np.float64)
+        self._vel = np.zeros((0, 2), dtype=np.float64)
+        self._last_seen = np.zeros(0, dtype=np.float64)
+        self._state = np.zeros((0, n_methods), dtype=np.int8)
+        self._since = np.zeros((0, n_methods), dtype=np.float64)
+        self._last_event = np.full((0, n_methods), -np.inf)
+
+    def __len__(self):
+        return len(self._ids)
+
+    @property
+    def active_tracks(self):
+        """{id: Track} snapshot of the live tracks."""
+        return {
+            int(self._ids[i]): Track(
+                int(self._ids[i]), tuple(self._pos[i].tolist()), tuple(self._vel[i].tolist()),
+                float(self._last_seen[i]),
+                {method: STATE_NAMES[self._state[i, m]] for m, method in enumerate(self.methods)},
+                {method: float(self._last_event[i, m]) for m, method in enumerate(self.methods)})
+            for i in range(len(self._ids))
+        }
+
+    def update(self, centroids_fallen, now=None):
+        """
+        Single-verdict form of observe() for a tracker with one method.
+
+        :param centroids_fallen: Iterable of (cx, cy, is_fallen), one per person in the frame.
+        :return: Ids of the tracks whose fall was confirmed in this frame, in detection order.
+        """
+        centroids_fallen = list(centroids_fallen)
+        centroids = [(cx, cy) for cx, cy, _ in centroids_fallen]
+        verdicts = [[bool(f)] * len(self.methods) for _, _, f in centroids_fallen]
+        return self.observe(centroids, verdicts, now)[self.methods[0]]
 
-    def update(self, centroids_fallen):
-        now = time.time()
-        triggered_ids = []
+    def observe(self, centroids, verdicts, now=None):
+        """
+        :param centroids: (N, 2) person centroids in the frame.
+        :param verdicts: (N, len(methods)) bool, whether each method considers each person fallen.
+        :param now: Timestamp of the frame; defaults to the tracker's clock.
+        :return: {method: ids of the tracks whose fall was confirmed in this frame, in detection order}.
+        """
+        now = self.clock() if now is None else now
 
         # Step 1: Remove stale tracks
-        to_remove = [id for id, v in self.active_tracks.items() if now - v["last_seen"] > self.persistence]
-        for id in to_remove:
-            del self.active_tracks[id]
-
-        # Step 2: Match incoming centroids
-        for cx, cy, is_fallen in centroids_fallen:
-            matched_id = None
-            for id, data in self.active_tracks.items():
-                if self._distance((cx, cy), data["centroid"]) < self.match_threshold:
-                    matched_id = id
-                    break
-
-            if matched_id is None:
-                matched_id = self.next_id
-                self.next_id += 1
-
-            # Update or create the track
-            track = self.active_tracks.get(matched_id, {
-                "centroid": (cx, cy),
-                "last_seen": now,
-                "last_triggered": 0,
-                "falling": False
-            })
-
-            track["centroid"] = (cx, cy)
-            track["last_seen"] = now
-
-            if is_fallen:
-                if not track["falling"] and now - track["last_triggered"] > self.cooldown:
-                    triggered_ids.append(matched_id)
-                    self.unique_fallers.add(matched_id)
-                    track["last_triggered"] = now
-                track["falling"] = True
-            else:
-                track["falling"] = False
-
-            self.active_tracks[matched_id] = track
-
-        return triggered_ids  # Only the IDs that caused a fall trigger this frame
-
-    def get_unique_faller_count(self):
-        return len(self.unique_fallers)
+        keep = now - self._last_seen <= self.persistence
+        if not keep.all():
+            self._compress(keep)
+
+        detections = np.asarray(centroids, dtype=np.float64).reshape(-1, 2)
+        fallen = np.asarray(verdicts, dtype=bool).reshape(len(detections), len(self.methods))
+        if len(detections) == 0:
+            return {method: [] for method in self.methods}
+
+        # Step 2: Optimal one-to-one assignment on the full distance matrix
+        rows = self._match(detections, now)
+
+        # Step 3: Update matched tracks (velocity from the measured displacement)
+        matched = rows >= 0
+        det_idx = np.flatnonzero(matched)
+        track_idx = rows[matched]
+        if len(track_idx):
+            dt = (now - self._last_seen[track_idx])[:, None]
+            measured = np.divide(detections[det_idx] - self._pos[track_idx], dt,
+                                 out=np.zeros((len(track_idx), 2)), where=dt > 0)
+            self._vel[track_idx] += self.velocity_smoothing * (measured - self._vel[track_idx])
+            self._pos[track_idx] = detections[det_idx]
+            self._last_seen[track_idx] = now
+
+        # Step 4: Start tracks for unmatched detections
+        new = np.flatnonzero(~matched)
+        if len(new):
+            rows[new] = self._append(detections[new], now)
+
+        # Step 5: Advance every observed person's state machines
+        confirmed = self._advance(rows, fallen, now)
+
+        events = {}
+        for m, method in enumerate(self.methods):
+            ids = self._ids[rows[confirmed[:, m]]].tolist()
+            self.unique_fallers[method].update(ids)
+            events[method] = ids
+        return events
+
+    def get_unique_faller_count(self, method=None):
+        return len(self.unique_fallers[method or self.methods[0]])
+
+    def _advance(self, rows, fallen, now):
+        """Runs the state machines of tracks `rows` on this frame's verdicts; returns the confirmed falls."""
+        state = self._state[rows]
+        since = self._since[rows]
+        last_event = self._last_event[rows]
+
+        start = (state == NORMAL) & fallen
+        cooling_down = now - last_event <= self.cooldown
+        state[start & cooling_down] = FALLEN
+        state[start & ~cooling_down] = ONSET
+        since[start] = now
+
+        onset = state == ONSET
+        confirmed = onset & fallen & (now - since >= self.confirm_time)
+        state[onset & ~fallen] = NORMAL
+        state[confirmed] = FALLEN
+        last_event[confirmed] = now
+
+        stood_up = (state == FALLEN) & ~fallen & ~confirmed
+        state[stood_up] = RECOVERING
+        since[stood_up] = now
+
+        recovering = (state == RECOVERING)
+        state[recovering & fallen] = FALLEN
+        state[recovering & ~fallen & (now - since >= self.recovery_time)] = NORMAL
+
+        self._state[rows] = state
+        self._since[rows] = since
+        self._last_event[rows] = last_event
+        return confirmed
+
+    def _match(self, detections, now):
+        """Track row for each detection, or -1 when it matches no track within match_threshold."""
+        rows = np.full(len(detections), -1, dtype=np.int64)
+        if len(self._ids) == 0:
+            return rows
+        predicted = self._pos
+        if self.predict:
+            predicted = self._pos + self._vel * (now - self._last_seen)[:, None]
+        distances = np.linalg.norm(predicted[:, None, :] - detections[None, :, :], axis=2)
+        # Pairs beyond the threshold are never used, so keep them out of the optimization
+        cost = np.where(distances < self.match_threshold, distances, self.match_threshold * 1e3)
+        track_rows, det_cols = linear_sum_assignment(cost)
+        valid = distances[track_rows, det_cols] < self.match_threshold
+        rows[det_cols[valid]] = track_rows[valid]
+        return rows
+
+    def _append(self, positions, now):
+        count = len(positions)
+        start = len(self._ids)
+        n_methods = len(self.methods)
+        self._ids = np.concatenate([self._ids, np.arange(self.next_id, self.next_id + count)])
+        self.next_id += count
+        self._pos = np.concatenate([self._pos, positions])
+        self._vel = np.concatenate([self._vel, np.zeros((count, 2))])
+        self._last_seen = np.concatenate([self._last_seen, np.full(count, now)])
+        self._state = np.concatenate([self._state, np.zeros((count, n_methods), dtype=np.int8)])
+        self._since = np.concatenate([self._since, np.full((count, n_methods), now)])
+        self._last_event = np.concatenate([self._last_event, np.full((count, n_methods), -np.inf)])
+        return np.arange(start, start + count)
+
+    def _compress(self, keep):
+        self._ids = self._ids[keep]
+        self._pos = self._pos[keep]
+        self._vel = self._vel[keep]
+        self._last_seen = self._last_seen[keep]
+        self._state = self._state[keep]
+        self._since = self._since[keep]
+        self._last_event = self._last_event[keep]
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    methods = ("box", "pose", "bottom", "full")
+    for people in (5, 20, 40):
+        tracker = FallTracker(methods=methods, confirm_time=0.3, recovery_time=1.0)
+        positions = rng.uniform(0, 1920, size=(people, 2)) * [1, 0.5625]
+        frames = []
+        for step in range(200):
+            positions = positions + rng.normal(0, 3, size=positions.shape)
+            frames.append((positions, rng.random((people, len(methods))) < 0.05))
+        start = time.perf_counter()
+        for step, (centroids, verdicts) in enumerate(frames):
+            tracker.observe(centroids, verdicts, now=step / 15)
+        elapsed_ms = (time.perf_counter() - start) * 1000 / len(frames)
+        print(f"{people} people x {len(methods)} methods: {elapsed_ms * 1000:.0f} us/update, {len(tracker)} tracks")
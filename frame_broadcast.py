@@ -0,0 +1,60 @@
+# frame_broadcast.py
+
+import threading
+
+
+class FrameBroadcaster:
+    """
+    Latest-frame broadcast from one producer to any number of subscribers.
+
+    The analysis worker publishes each encoded frame once; every /video_feed client reads the
+    newest one. Slow subscribers never queue up a backlog, they simply skip to the latest frame.
+    Threads block in wait(); subscribers that cannot block (an asyncio task) pass a callback to
+    subscribe() instead, which is called from the publishing thread after every publish.
+    """
+
+    def __init__(self, initial=None):
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._frame = initial
+        self._callbacks = ()
+        self.subscribers = 0
+
+    def publish(self, frame):
+        with self._cond:
+            self._seq += 1
+            self._frame = frame
+            self._cond.notify_all()
+            callbacks = self._callbacks
+        for callback in callbacks:
+            callback()
+
+    def latest(self):
+        with self._cond:
+            return self._seq, self._frame
+
+    def wait(self, last_seq, timeout=None):
+        """
+        Blocks until a frame newer than `last_seq` is published or `timeout` expires.
+
+        :return: (seq, frame) of the newest frame; seq equals last_seq on timeout.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq != last_seq, timeout)
+            return self._seq, self._frame
+
+    def subscribe(self, callback=None):
+        """
+        :param callback: Optional callable without arguments, called on the publishing thread
+                         after each new frame; it must not block.
+        """
+        with self._cond:
+            self.subscribers += 1
+            if callback is not None:
+                self._callbacks = self._callbacks + (callback,)
+
+    def unsubscribe(self, callback=None):
+        with self._cond:
+            self.subscribers -= 1
+            if callback is not None:
+                self._callbacks = tuple(c for c in self._callbacks if c is not callback)
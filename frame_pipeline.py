@@ -0,0 +1,339 @@
+# frame_pipeline.py
+
+"""
+Single-conversion frame pipeline for the analysis path.
+
+Each new decoded frame (identified by its PTS) is converted from YUV to BGR at most once per
+output size, with the downscale folded into the same swscale pass. Pipelines of different threads
+that share a FrameConversions (one per robot stream) also share those conversions. Analyzers get read-only views
+of that conversion; the only copies made are into a preallocated 2x2 grid, and only for the
+quadrants an overlay is actually drawn on. Nothing is reallocated from frame to frame unless
+the stream resolution changes.
+
+Run `python frame_pipeline.py` to compare per-frame allocations against the old
+to_ndarray + copy + resize path.
+"""
+
+import threading
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+DISPLAY_SIZE = (640, 480)
+_local = threading.local()
+
+
+def to_bgr(frame, size=None):
+    """
+    Converts an av.VideoFrame to a BGR ndarray, scaled to `size` (width, height) in the same pass.
+
+    Safe to call on one frame from several threads at once: frame.reformat() and to_ndarray()
+    share a swscale context stored on the frame, which crashes when used concurrently, so each
+    thread uses its own reformatter instead.
+    """
+    reformatter = getattr(_local, "reformatter", None)
+    if reformatter is None:
+        from av.video.reformatter import VideoReformatter
+        reformatter = _local.reformatter = VideoReformatter()
+    width, height = size if size is not None else (None, None)
+    return reformatter.reformat(frame, width=width, height=height, format="bgr24").to_ndarray()
+
+
+def _read_only(img):
+    view = img.view()
+    view.flags.writeable = False
+    return view
+
+
+class FrameConversions:
+    """
+    BGR conversions of a stream's most recent frames, shared by the threads that consume them.
+
+    The first thread to ask for a frame at a given size converts it; any other thread asking for
+    the same frame and size meanwhile waits for that result instead of converting it again. The
+    results are read-only and only the last `keep` frames are held on to.
+    """
+
+    def __init__(self, keep=2):
+        """
+        :param keep: Number of frames whose conversions are kept.
+        """
+        self.keep = keep
+        self.frames_converted = 0
+        self._lock = threading.Lock()
+        self._entries = []  # [(frame, lock, {size: image})], newest last
+
+    def get(self, frame, size, decode_time=None):
+        """
+        :param frame: av.VideoFrame to convert.
+        :param size: (width, height) of the result.
+        :param decode_time: Optional metrics_registry.Histogram observing the conversion in ms.
+        :return: Read-only BGR ndarray.
+        """
+        with self._lock:
+            entry = next((e for e in self._entries if e[0] is frame), None)
+            if entry is None:
+                entry = (frame, threading.Lock(), {})
+                self._entries.append(entry)
+                del self._entries[:-self.keep]
+        _, lock, images = entry
+        with lock:
+            img = images.get(size)
+            if img is None:
+                if decode_time is None:
+                    img = _read_only(to_bgr(frame, size))
+                else:
+                    with decode_time.time():
+                        img = _read_only(to_bgr(frame, size))
+                images[size] = img
+                with self._lock:
+                    self.frames_converted += 1
+        return img
+
+
+class FramePipeline:
+    """
+    Converts frames once per PTS and hands out views.
+
+    Not thread-safe: one pipeline belongs to one consumer thread. Views returned for a frame stay
+    valid until the next `update()` with a different PTS. Threads consuming the same stream
+    (render and inference) each use their own pipeline over a shared FrameConversions, so a frame
+    both of them look at is still converted once.
+    """
+
+    def __init__(self, scale=0.5, display_size=DISPLAY_SIZE, decode_time=None, conversions=None):
+        """
+        :param scale: Analysis resolution relative to the source frame.
+        :param display_size: (width, height) of the fullscreen/glasses views.
+        :param decode_time: Optional metrics_registry.Histogram observing each conversion in ms.
+        :param conversions: FrameConversions shared with other pipelines of the same stream;
+                            a private one is used if None.
+        """
+        self.scale = scale
+        self.display_size = display_size
+        self.decode_time = decode_time
+        self.conversions = conversions if conversions is not None else FrameConversions()
+        self.pts = None
+        self._frame = None
+        self._analysis = None
+        self._display = None
+        self._analysis_buf = None   # only used for ndarray sources
+        self._display_buf = None
+        self._canvas_buf = None
+        self._grid = None
+        self._quadrants = None
+
+    def update(self, frame):
+        """
+        Points the pipeline at `frame` (an av.VideoFrame or a BGR ndarray).
+
+        :return: True if this is a new frame, False if it has the PTS already being served.
+        """
+        pts = getattr(frame, "pts", None)
+        if self._frame is not None and pts is not None and pts == self.pts:
+            return False
+        self._frame = frame
+        self.pts = pts
+        self._analysis = None
+        self._display = None
+        return True
+
+    @property
+    def source_size(self):
+        """(width, height) of the current frame."""
+        if isinstance(self._frame, np.ndarray):
+            return self._frame.shape[1], self._frame.shape[0]
+        return self._frame.width, self._frame.height
+
+    @property
+    def analysis_size(self):
+        width, height = self.source_size
+        return max(1, int(width * self.scale)), max(1, int(height * self.scale))
+
+    @property
+    def frames_converted(self):
+        """Conversions done through this pipeline's FrameConversions (by any pipeline sharing it)."""
+        return self.conversions.frames_converted
+
+    # === VIEWS ===
+    def analysis_view(self):
+        """Read-only BGR image at analysis resolution for the current frame."""
+        if self._analysis is None:
+            self._analysis = self._convert(self.analysis_size, "_analysis_buf")
+        return self._analysis
+
+    def display_view(self):
+        """Read-only BGR image at display_size for the current frame."""
+        if self._display is None:
+            self._display = self._convert(self.display_size, "_display_buf")
+        return self._display
+
+    def display_canvas(self):
+        """Writable copy of display_view() in a reused buffer, for drawing on."""
+        view = self.display_view()
+        if self._canvas_buf is None or self._canvas_buf.shape != view.shape:
+            self._canvas_buf = np.empty_like(view)
+        np.copyto(self._canvas_buf, view)
+        return self._canvas_buf
+
+    def grid(self):
+        """
+        Preallocated 2x2 grid at twice the analysis resolution.
+
+        :return: (grid, (top_left, top_right, bottom_left, bottom_right)), the quadrants being
+                 writable views into the grid. Their contents are left from the previous frame;
+                 use `overlay_canvas()` to seed one with the current frame.
+        """
+        width, height = self.analysis_size
+        if self._grid is None or self._grid.shape[:2] != (height * 2, width * 2):
+            self._grid = np.zeros((height * 2, width * 2, 3), dtype=np.uint8)
+            self._quadrants = (self._grid[:height, :width], self._grid[:height, width:],
+                               self._grid[height:, :width], self._grid[height:, width:])
+        return self._grid, self._quadrants
+
+    def overlay_canvas(self, quadrant):
+        """Copies the analysis view into `quadrant` (a grid view) so an overlay can be drawn on it."""
+        np.copyto(quadrant, self.analysis_view())
+        return quadrant
+
+    def _convert(self, size, buf_attr):
+        frame = self._frame
+        if isinstance(frame, np.ndarray):
+            if self.decode_time is None:
+                return _read_only(self._resize(frame, size, buf_attr))
+            with self.decode_time.time():
+                return _read_only(self._resize(frame, size, buf_attr))
+        # Colour conversion and scaling in one swscale pass, shared with the stream's other pipelines
+        return self.conversions.get(frame, size, self.decode_time)
+
+    def _resize(self, frame, size, buf_attr):
+        buf = getattr(self, buf_attr)
+        if buf is None or buf.shape[:2] != (size[1], size[0]):
+            buf = np.empty((size[1], size[0], 3), dtype=np.uint8)
+            setattr(self, buf_attr, buf)
+        if (frame.shape[1], frame.shape[0]) == size:
+            np.copyto(buf, frame)
+        else:
+            cv2.resize(frame, size, dst=buf)
+        return buf
+
+
+class OverlayLayers:
+    """
+    Overlays for one analyzed frame, drawn on blank canvases so they can be laid over later frames.
+
+    The inference thread draws each view once; the render thread copies the drawn pixels onto
+    every raw frame until the next analysis replaces the layers. Pure black strokes are treated
+    as transparent.
+    """
+
+    def __init__(self, shape, names, pts=None, received_at=None):
+        """
+        :param shape: (height, width) of the analysis view.
+        :param names: Names of the layers to allocate.
+        :param pts: PTS of the analyzed frame.
+        :param received_at: time.monotonic() when the analyzed frame arrived.
+        """
+        self.shape = tuple(shape)
+        self.pts = pts
+        self.received_at = received_at
+        self.images = {name: np.zeros(self.shape + (3,), dtype=np.uint8) for name in names}
+        self.masks = {}
+        self.flags = {}
+
+    def seal(self):
+        """Computes the draw masks; call once drawing is finished and before publishing."""
+        self.masks = {name: img.any(axis=2, keepdims=True) for name, img in self.images.items()}
+        return self
+
+    def apply(self, name, dst):
+        """Copies layer `name` onto `dst` in place; a no-op if the stream resolution has since changed."""
+        mask = self.masks.get(name)
+        if mask is not None and dst.shape[:2] == self.shape:
+            np.copyto(dst, self.images[name], where=mask)
+        return dst
+
+
+# === ALLOCATION BENCHMARK ===
+def _draw_overlays(box_img, pose_img, bottom_img):
+    # Stand-in for the detector overlays: a few primitives per view
+    cv2.rectangle(box_img, (40, 40), (200, 300), (160, 51, 0), 2)
+    cv2.circle(pose_img, (120, 120), 5, (0, 220, 255), -1)
+    cv2.line(bottom_img, (0, bottom_img.shape[0] // 2), (bottom_img.shape[1], bottom_img.shape[0] // 2),
+             (0, 0, 255), 2)
+
+
+def _legacy_frame(frame):
+    img = frame.to_ndarray(format="bgr24")
+    height, width = img.shape[:2]
+    small_img = cv2.resize(img, (width // 2, height // 2))
+    box_img, pose_img, bottom_img = small_img.copy(), small_img.copy(), small_img.copy()
+    _draw_overlays(box_img, pose_img, bottom_img)
+    combined_img = cv2.addWeighted(box_img, 0.33, pose_img, 0.33, 0)
+    combined_img = cv2.addWeighted(combined_img, 1, bottom_img, 0.34, 0)
+    top_row = np.hstack((box_img, pose_img))
+    bottom_row = np.hstack((bottom_img, combined_img))
+    return np.vstack((top_row, bottom_row))
+
+
+def _pipeline_frame(pipeline, frame):
+    pipeline.update(frame)
+    pipeline.analysis_view()
+    grid, (box_q, pose_q, bottom_q, combined_q) = pipeline.grid()
+    box_img = pipeline.overlay_canvas(box_q)
+    pose_img = pipeline.overlay_canvas(pose_q)
+    bottom_img = pipeline.overlay_canvas(bottom_q)
+    _draw_overlays(box_img, pose_img, bottom_img)
+    cv2.addWeighted(box_img, 0.33, pose_img, 0.33, 0, dst=combined_q)
+    cv2.addWeighted(combined_q, 1, bottom_img, 0.34, 0, dst=combined_q)
+    return grid
+
+
+def measure(step, frames):
+    """
+    Runs `step` over `frames`.
+
+    :return: (peak bytes newly allocated by numpy/OpenCV per frame, ms per frame)
+    """
+    step(frames[0])  # warm up buffers
+    tracemalloc.start()
+    allocated = 0
+    start = time.perf_counter()
+    for frame in frames:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        step(frame)
+        _, peak = tracemalloc.get_traced_memory()
+        allocated += peak - base
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+    return allocated / len(frames), elapsed * 1000 / len(frames)
+
+
+if __name__ == '__main__':
+    import av
+
+    rng = np.random.default_rng(0)
+    frames = []
+    for pts in range(60):
+        img = rng.integers(0, 255, size=(720, 1280, 3), dtype=np.uint8)
+        frame = av.VideoFrame.from_ndarray(img, format="bgr24").reformat(format="yuv420p")
+        frame.pts = pts
+        frames.append(frame)
+
+    pipeline = FramePipeline()
+    assert _pipeline_frame(pipeline, frames[0]).shape == _legacy_frame(frames[0]).shape
+
+    legacy_bytes, legacy_ms = measure(_legacy_frame, frames)
+    pipeline_bytes, pipeline_ms = measure(lambda f: _pipeline_frame(pipeline, f), frames)
+    # The YUV->BGR output lives in an FFmpeg buffer that tracemalloc cannot see
+    legacy_convert = 1280 * 720 * 3
+    pipeline_convert = 640 * 360 * 3
+
+    print("1280x720 source, 2x2 grid of 640x360 views, per frame:")
+    print(f"  to_ndarray + copies: {legacy_bytes / 1e6:5.2f} MB numpy + {legacy_convert / 1e6:4.2f} MB conversion, "
+          f"{legacy_ms:5.2f} ms")
+    print(f"  FramePipeline:       {pipeline_bytes / 1e6:5.2f} MB numpy + {pipeline_convert / 1e6:4.2f} MB conversion, "
+          f"{pipeline_ms:5.2f} ms")
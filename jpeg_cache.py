@@ -0,0 +1,79 @@
+# jpeg_cache.py
+
+import threading
+
+import cv2
+import numpy as np
+
+# cv2.imencode's default, used for the full-size JPEG every /video_feed client gets by default
+DEFAULT_QUALITY = 95
+MIN_QUALITY = 10
+MIN_WIDTH = 80
+
+
+class EncodedFrame:
+    """
+    One frame published to /video_feed, with every JPEG variant clients have asked for.
+
+    The render thread encodes the full-size JPEG at DEFAULT_QUALITY once. Smaller or lower-quality
+    variants (`/video_feed?w=320&q=60`) are encoded the first time a client asks for them and
+    cached on the frame, so each (frame, view, width, quality) is encoded once no matter how many
+    clients watch it. A variant is made from `image` when the frame keeps it (the placeholder
+    does), otherwise from the decoded full-size JPEG, so the render thread never copies frames
+    for clients that might not exist.
+    """
+
+    __slots__ = ("jpeg", "image", "idle", "_variants", "_lock")
+
+    def __init__(self, jpeg, image=None, idle=False):
+        """
+        :param jpeg: The full-size JPEG at DEFAULT_QUALITY.
+        :param image: Optional BGR source image; must not be modified afterwards.
+        :param idle: True for the offline placeholder, which clients re-send less often.
+        """
+        self.jpeg = jpeg
+        self.image = image
+        self.idle = idle
+        self._variants = {}
+        self._lock = threading.Lock()
+
+    def variant(self, width=None, quality=None):
+        """
+        JPEG scaled to `width` (keeping the aspect ratio, never upscaled) at `quality`.
+
+        :return: (jpeg bytes, True if this call encoded it or False if it came from the cache)
+        """
+        key = self._key(width, quality)
+        if key is None:
+            return self.jpeg, False
+        jpeg = self._variants.get(key)
+        if jpeg is not None:
+            return jpeg, False
+        with self._lock:
+            jpeg = self._variants.get(key)
+            if jpeg is not None:
+                return jpeg, False
+            jpeg = self._encode(*key)
+            self._variants[key] = jpeg
+            return jpeg, True
+
+    def _key(self, width, quality):
+        quality = DEFAULT_QUALITY if quality is None else max(MIN_QUALITY, min(DEFAULT_QUALITY, quality))
+        if width is not None:
+            width = max(MIN_WIDTH, width)
+        if width is None and quality == DEFAULT_QUALITY:
+            return None
+        return width, quality
+
+    def _encode(self, width, quality):
+        image = self.image
+        if image is None:
+            image = cv2.imdecode(np.frombuffer(self.jpeg, np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                return self.jpeg
+        height, source_width = image.shape[:2]
+        if width is not None and width < source_width:
+            image = cv2.resize(image, (width, max(1, round(height * width / source_width))),
+                               interpolation=cv2.INTER_AREA)
+        ret, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return buffer.tobytes() if ret else self.jpeg
@@ -0,0 +1,300 @@
+# packet_recorder.py
+
+"""
+Passthrough recording: the H.264/VP8 video a robot sends over WebRTC, muxed into MKV files as
+received, without decoding, converting to BGR or re-encoding.
+
+Limits, by design of where the packets come from:
+
+- aiortc has no public hook for encoded frames. `PacketRecorder.tap()` wraps the `put` of the
+  receiver's decoder queue (`RTCRtpReceiver._RTCRtpReceiver__decoder_queue`) and requests
+  keyframes through `RTCRtpReceiver._send_rtcp_pli`. Both are private (checked against aiortc
+  1.x); if they change, `tap()` logs a warning and returns False, and passthrough recordings
+  stay empty instead of breaking the stream.
+- The file is what arrived: frames the jitter buffer gave up on are missing, just as they are
+  from the decoded stream. There are no overlays.
+- A file can only start on a keyframe. WebRTC senders send them rarely, so `start()` asks the
+  robot for one (PLI), as does every restart of the robot's stream mid-recording, and segments
+  are cut at the first keyframe after `segment_seconds`, which can make them longer than that.
+- RTP timestamps are 32 bits and wrap every 13 hours at 90 kHz; the writer unwraps them, so a
+  wrap neither cuts the file nor resets its clock.
+"""
+
+import asyncio
+import fractions
+import logging
+import os
+import queue
+import threading
+from datetime import datetime
+
+import av
+
+logger = logging.getLogger(__name__)
+
+# RTP codec name -> FFmpeg codec name
+PASSTHROUGH_CODECS = {"H264": "h264", "VP8": "vp8"}
+# RTP video clock
+TIME_BASE = fractions.Fraction(1, 90000)
+RTP_TIMESTAMP_MOD = 1 << 32
+_STOP = object()
+
+
+def h264_nal_units(data):
+    """Splits an Annex B access unit (as aiortc reassembles H.264) into its NAL units."""
+    starts = []
+    i = data.find(b"\x00\x00\x01")
+    while i != -1:
+        starts.append(i + 3)
+        i = data.find(b"\x00\x00\x01", i + 3)
+    units = []
+    for k, start in enumerate(starts):
+        if k + 1 < len(starts):
+            # The next start code may be 4 bytes long; its leading zero is not part of this unit
+            units.append(data[start:starts[k + 1] - 3].rstrip(b"\x00"))
+        else:
+            units.append(data[start:])
+    return [unit for unit in units if unit]
+
+
+def is_keyframe(codec, data):
+    if codec == "h264":
+        return any(unit[0] & 0x1F == 5 for unit in h264_nal_units(data))
+    # VP8 frame tag: the lowest bit is 0 on key frames
+    return bool(data) and not data[0] & 0x01
+
+
+class PacketRecorder:
+    """
+    Records one robot's encoded video packets to segmented MKV files from a background thread.
+
+    `submit()` is called on the aiortc event loop for every reassembled frame and never blocks;
+    packets are dropped (and counted) if the writer falls behind.
+    """
+
+    def __init__(self, directory, segment_seconds=300, max_queue=600):
+        """
+        :param directory: Where segments are written, as recorded_video_<YYYYmmdd_HHMMSS>.mkv.
+        :param segment_seconds: Target length of one file; files are cut at the next keyframe.
+        :param max_queue: Packets that may wait for the writer before new ones are dropped.
+        """
+        self.directory = directory
+        self.segment_seconds = segment_seconds
+        self.recording = False
+
+        self.packets_written = 0
+        self.packets_dropped = 0
+        self.packets_skipped = 0
+        self.segments_written = 0
+        self.current_file = None
+
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._request_keyframe = None
+        self._container = None
+        self._stream = None
+        self._codec = None
+        self._segment_start = None
+        self._last_pts = -1
+        self._parameter_sets = b""
+        self._last_rtp_timestamp = None
+        self._timestamp = None
+        self._thread = threading.Thread(target=self._run, name="packet-recorder", daemon=True)
+        self._thread.start()
+
+    def tap(self, receiver):
+        """
+        Forwards every encoded frame `receiver` passes to its decoder into this recorder.
+        Call on the event loop, e.g. from the peer connection's "track" handler.
+
+        :param receiver: The aiortc RTCRtpReceiver of the robot's video track.
+        :return: False if this aiortc version does not expose the decoder queue.
+        """
+        decoder_queue = getattr(receiver, "_RTCRtpReceiver__decoder_queue", None)
+        if decoder_queue is None:
+            logger.warning("aiortc receiver has no decoder queue to tap; passthrough recording unavailable")
+            return False
+        put = decoder_queue.put
+
+        def tapped_put(item, *args, **kwargs):
+            if item is not None and self.recording:
+                codec, encoded_frame = item
+                self.submit(codec.name, encoded_frame.data, encoded_frame.timestamp)
+            return put(item, *args, **kwargs)
+
+        decoder_queue.put = tapped_put
+
+        loop = asyncio.get_running_loop()
+        send_pli = getattr(receiver, "_send_rtcp_pli", None)
+
+        def request_keyframe():
+            if send_pli is None:
+                return
+            for source in receiver.getSynchronizationSources():
+                asyncio.run_coroutine_threadsafe(send_pli(source.source), loop)
+
+        with self._lock:
+            self._request_keyframe = request_keyframe
+        return True
+
+    def start(self):
+        """:return: False if a recording is already running."""
+        with self._lock:
+            if self.recording:
+                return False
+            self.recording = True
+        self._ask_for_keyframe()
+        return True
+
+    def stop(self):
+        """:return: False if nothing was being recorded."""
+        with self._lock:
+            if not self.recording:
+                return False
+            self.recording = False
+        self._queue.put(_STOP)
+        return True
+
+    def submit(self, codec_name, data, timestamp):
+        """
+        Queues one encoded frame.
+
+        :param codec_name: RTP codec name, "H264" or "VP8".
+        :param data: The frame as reassembled by aiortc (Annex B for H.264).
+        :param timestamp: RTP timestamp, in 1/90000 s.
+        """
+        codec = PASSTHROUGH_CODECS.get(codec_name)
+        if codec is None or not self.recording:
+            return False
+        try:
+            self._queue.put_nowait((codec, data, timestamp))
+        except queue.Full:
+            with self._lock:
+                self.packets_dropped += 1
+            return False
+        return True
+
+    def close(self):
+        with self._lock:
+            self.recording = False
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "passthrough_recording": self.recording,
+                "passthrough_file": self.current_file,
+                "passthrough_packets_written": self.packets_written,
+                "passthrough_packets_dropped": self.packets_dropped,
+                "passthrough_packets_skipped": self.packets_skipped,
+                "passthrough_segments": self.segments_written,
+            }
+
+    def _ask_for_keyframe(self):
+        with self._lock:
+            request_keyframe = self._request_keyframe
+        if request_keyframe is not None:
+            try:
+                request_keyframe()
+            except Exception as e:
+                logger.warning(f"Could not request a keyframe for passthrough recording: {e}")
+
+    # === WRITER THREAD ===
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None or item is _STOP:
+                self._close_segment()
+                self._last_rtp_timestamp = None
+                if item is None:
+                    return
+                continue
+            try:
+                self._write(*item)
+            except Exception as e:
+                print(f"❌ PacketRecorder failed to write to {self.current_file}: {e}")
+                self._close_segment()
+
+    def _unwrap(self, timestamp):
+        """Extends a 32-bit RTP timestamp so it keeps counting up across a wrap."""
+        if self._last_rtp_timestamp is None:
+            self._timestamp = timestamp
+        else:
+            delta = (timestamp - self._last_rtp_timestamp) % RTP_TIMESTAMP_MOD
+            if delta >= RTP_TIMESTAMP_MOD // 2:
+                delta -= RTP_TIMESTAMP_MOD  # earlier than the previous frame
+            self._timestamp += delta
+        self._last_rtp_timestamp = timestamp
+        return self._timestamp
+
+    def _write(self, codec, data, timestamp):
+        keyframe = is_keyframe(codec, data)
+        timestamp = self._unwrap(timestamp)
+        if codec == "h264":
+            parameter_sets = [unit for unit in h264_nal_units(data) if unit[0] & 0x1F in (7, 8)]
+            if parameter_sets:
+                self._parameter_sets = b"".join(b"\x00\x00\x00\x01" + unit for unit in parameter_sets)
+
+        if self._container is not None:
+            if codec != self._codec or timestamp < self._segment_start:
+                # The robot's stream restarted; the next file cannot start before its next keyframe
+                self._close_segment()
+                self._ask_for_keyframe()
+            elif keyframe and (timestamp - self._segment_start) * TIME_BASE >= self.segment_seconds:
+                self._close_segment()
+        if self._container is None:
+            if not keyframe or (codec == "h264" and not self._parameter_sets):
+                # Nothing before the first keyframe can be decoded
+                with self._lock:
+                    self.packets_skipped += 1
+                return
+            self._open_segment(codec, timestamp)
+
+        packet = av.Packet(data)
+        packet.stream = self._stream
+        packet.time_base = TIME_BASE
+        packet.pts = packet.dts = max(timestamp - self._segment_start, self._last_pts + 1)
+        packet.is_keyframe = keyframe
+        self._container.mux(packet)
+        self._last_pts = packet.pts
+        with self._lock:
+            self.packets_written += 1
+
+    def _open_segment(self, codec, timestamp):
+        os.makedirs(self.directory, exist_ok=True)
+        name = datetime.now().strftime('recorded_video_%Y%m%d_%H%M%S')
+        path = os.path.join(self.directory, f"{name}.mkv")
+        n = 2
+        while os.path.exists(path):
+            path = os.path.join(self.directory, f"{name}_{n}.mkv")
+            n += 1
+
+        container = av.open(path, "w")
+        stream = container.add_stream(codec)
+        stream.time_base = TIME_BASE
+        if codec == "h264":
+            # The muxer converts the Annex B SPS/PPS into the avcC header MKV needs
+            stream.codec_context.extradata = self._parameter_sets
+
+        self._container, self._stream, self._codec = container, stream, codec
+        self._segment_start = timestamp
+        self._last_pts = -1
+        with self._lock:
+            self.current_file = path
+        print(f"🎥 Recording passthrough {codec} video to {path}")
+
+    def _close_segment(self):
+        if self._container is None:
+            return
+        try:
+            self._container.close()
+            with self._lock:
+                self.segments_written += 1
+        except Exception as e:
+            print(f"❌ PacketRecorder failed to finish {self.current_file}: {e}")
+        finally:
+            self._container = self._stream = self._codec = None
+            with self._lock:
+                self.current_file = None
+
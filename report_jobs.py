@@ -0,0 +1,183 @@
+# report_jobs.py
+
+import base64
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from report_visualizer import VISUALS_DIR, generate_tsne_visualization
+
+
+class ReportJob:
+    """One queued daily report: t-SNE rendering in a worker process, then delivery in this process."""
+
+    def __init__(self, date, save_file, send_without_visualization):
+        self.id = uuid.uuid4().hex[:12]
+        self.date = date
+        self.save_file = save_file
+        self.send_without_visualization = send_without_visualization
+        self.status = "queued"
+        self.created_at = time.time()
+        self.finished_at = None
+        self.metadata = None
+        self.delivered = None
+        self.error = None
+        self.future = None
+        self.callbacks = []
+        self.done = threading.Event()
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    def to_dict(self):
+        status = self.status
+        if status == "queued" and self.future is not None and self.future.running():
+            status = "running"
+        return {
+            "job_id": self.id,
+            "date": self.date.isoformat(),
+            "status": status,
+            "save_file": self.save_file,
+            "created_at": datetime.fromtimestamp(self.created_at).isoformat(timespec="seconds"),
+            "finished_at": datetime.fromtimestamp(self.finished_at).isoformat(timespec="seconds") if self.finished_at else None,
+            "duration_seconds": round(self.finished_at - self.created_at, 2) if self.finished_at else None,
+            "delivered": self.delivered,
+            "metadata": self.metadata,
+            "error": self.error,
+        }
+
+
+class ReportJobQueue:
+    """
+    Runs report jobs off the request thread.
+
+    t-SNE placement and matplotlib rendering are CPU-bound and hold the GIL, so they run in a
+    single worker process; delivery (the email, which needs this process's live metrics) runs on
+    a small thread afterwards. A request for a day that already has a queued or running job
+    joins that job instead of starting another one.
+
+    Workers are spawned rather than forked: this process runs torch/OpenMP and aiortc threads,
+    which are not safe to fork.
+    """
+
+    def __init__(self, deliver, max_workers=1, history_size=100):
+        """
+        :param deliver: Callable taking the visualization result (or None) and the job's date,
+                        returning True on success.
+        :param max_workers: Number of report worker processes.
+        :param history_size: Finished jobs kept for status lookups.
+        """
+        self.deliver = deliver
+        self.max_workers = max_workers
+        self.history_size = history_size
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._pool = None
+        self._delivery = ThreadPoolExecutor(max_workers=1, thread_name_prefix="report-delivery")
+
+    def submit(self, date=None, save_file=False, send_without_visualization=False, on_done=None):
+        """
+        Queues a report for `date` (today by default), or joins the active job for that date.
+
+        :param on_done: Optional callback receiving the finished ReportJob.
+        :return: The ReportJob handling the request.
+        """
+        date = date or datetime.now().date()
+        with self._lock:
+            for job in self._jobs.values():
+                if job.active and job.date == date:
+                    # Coalesce onto the job already in flight
+                    job.save_file |= save_file
+                    job.send_without_visualization |= send_without_visualization
+                    if on_done is not None:
+                        job.callbacks.append(on_done)
+                    return job
+
+            job = ReportJob(date, save_file, send_without_visualization)
+            if on_done is not None:
+                job.callbacks.append(on_done)
+            self._jobs[job.id] = job
+            self._trim_history()
+            self._start(job)
+            return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        self._delivery.shutdown(wait=False)
+
+    def _start(self, job):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        try:
+            job.future = self._pool.submit(_render_report, job.date)
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); replace the pool and retry once
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+            job.future = self._pool.submit(_render_report, job.date)
+        job.future.add_done_callback(lambda future: self._delivery.submit(self._finish, job))
+
+    def _finish(self, job):
+        try:
+            data = job.future.result()
+            job.metadata = data["metadata"] if data else None
+            if data and job.save_file:
+                # Saved here rather than in the worker so coalesced requests can still ask for it
+                save_report_image(data, job.date)
+            if data is None and not job.send_without_visualization:
+                job.delivered = False
+                job.error = "Could not generate visualization."
+                job.status = "failed"
+            else:
+                job.delivered = bool(self.deliver(data, job.date))
+                job.status = "succeeded" if job.delivered else "failed"
+                if not job.delivered:
+                    job.error = "Report delivery failed."
+        except Exception as e:
+            job.status = "failed"
+            job.error = f"{type(e).__name__}: {e}"
+            print(f"❌ Report job {job.id} failed: {job.error}")
+        finally:
+            job.finished_at = time.time()
+            job.done.set()
+
+        for callback in job.callbacks:
+            try:
+                callback(job)
+            except Exception as e:
+                print(f"❌ Report job {job.id} callback failed: {e}")
+
+    def _trim_history(self):
+        while len(self._jobs) > self.history_size:
+            oldest_id = next(iter(self._jobs))
+            if self._jobs[oldest_id].active:
+                break
+            del self._jobs[oldest_id]
+
+
+def _render_report(date):
+    # Runs in the worker process
+    return generate_tsne_visualization(save_file=False, date=date)
+
+
+def save_report_image(data, date):
+    os.makedirs(VISUALS_DIR, exist_ok=True)
+    img_path = os.path.join(VISUALS_DIR, f"tsne_{date.isoformat()}.png")
+    with open(img_path, "wb") as f:
+        f.write(base64.b64decode(data["tsne_image_base64"]))
+    print(f"Saved t-SNE plot to {img_path}")
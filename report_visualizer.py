@@ -1,12 +1,17 @@
 import os
 import json
 import base64
+import hashlib
 import io
+import shutil
 from datetime import datetime
 import numpy as np
 import pandas as pd
 from sklearn.manifold import TSNE
+from sklearn.neighbors import KDTree
 from sklearn.preprocessing import StandardScaler
+from sensor_store import SensorStore, to_dataframe, to_epoch
+from sensor_features import NUM_RAW_VALUES, raw_to_features
 
 # Use a non-GUI backend for Matplotlib
 import matplotlib
@@ -18,11 +23,41 @@ import matplotlib.pyplot as plt
 SENSOR_CSV_PATH = "Temi_Sensor_Data/sensor_data_master.csv"
 TRAINING_DATA_PATH = "static/newSensor_training.csv"  # Path to the data for the KNN classifier
 VISUALS_DIR = "visualizations"
+CACHE_DIR = os.path.join(VISUALS_DIR, "cache")  # Training embeddings and memoized renders
+TSNE_CACHE_VERSION = 1
+OUT_OF_SAMPLE_NEIGHBORS = 5
 
 
 # === HELPER FUNCTIONS ===
 def ensure_dirs():
     os.makedirs(VISUALS_DIR, exist_ok=True)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+
+def store_covers_day(store, date):
+    """
+    True when the sensor store holds every row of `date`: its oldest row is no later than the
+    start of that day. Older days, and the day the store started on, are only complete in the
+    master CSV (unless the CSV was migrated).
+    """
+    first = store.first_timestamp()
+    return first is not None and first <= to_epoch(datetime.combine(date, datetime.min.time()))
+
+
+def load_daily_data(date, store=None):
+    """
+    Returns the rows for the specified date, reading only that day's partition of the sensor store
+    when the store covers the whole day, and scanning the master CSV (which the recorder keeps
+    writing too) otherwise.
+    """
+    store = store or SensorStore()
+    if store_covers_day(store, date):
+        return to_dataframe(store.read_day(date))
+    df = load_and_filter_daily_data(SENSOR_CSV_PATH, date)
+    if df.empty and store.row_count(date):
+        # The CSV was moved away or rotated; the store is all there is
+        return to_dataframe(store.read_day(date))
+    return df
 
 
 def load_and_filter_daily_data(path, date):
@@ -38,104 +73,194 @@ def load_and_filter_daily_data(path, date):
 
 def process_sensor_data(df):
     """
-    Processes raw sensor data into the 17-feature format used for classification.
-    This mimics the logic from SmellClassifier and server.py for consistent processing.
+    Processes raw sensor data into the 17-feature format used for classification,
+    using the same transform as SmellClassifier and server.py.
     """
     if df.empty:
         return pd.DataFrame()
 
-    # Keep only the value columns
+    # Recorded data names its raw columns value_0..value_65; the training CSV has them as its first 66 columns
     value_cols = [col for col in df.columns if col.startswith("value_")]
-    if len(value_cols) != 66:
-        print(f"Warning: Expected 66 'value_*' columns, but found {len(value_cols)}. Skipping processing.")
+    if value_cols:
+        data = df[value_cols]
+    else:
+        data = df.iloc[:, :NUM_RAW_VALUES]
+    if data.shape[1] != NUM_RAW_VALUES:
+        print(f"Warning: Expected {NUM_RAW_VALUES} raw sensor columns, but found {data.shape[1]}. Skipping processing.")
         return pd.DataFrame()
 
-    data = df[value_cols]
+    averaged_values = raw_to_features(data.to_numpy(dtype=np.float64))
 
-    # Averaging logic based on the channel map concept
-    # These are the indices of the 15 sensor groups (3 sensors per group) + 2 for temp/humidity
-    indices_to_keep = [
-        2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13,  # SGP/NOx sensors
-        21, 22, 23, 24, 25, 26, 27, 28, 29,  # MICS sensors part 1
-        34, 35, 36, 37, 38, 39, 40, 41, 42, 43, 44, 45,  # MICS sensors part 2
-        50, 51, 52, 53, 54, 55, 56, 57, 58, 59, 60, 61,  # MICS sensors part 3
-        64, 65  # Temp/Humidity
-    ]
+    # Create a new DataFrame with meaningful names
+    feature_names = [f'sensor_avg_{i + 1}' for i in range(15)] + ['humidity', 'temperature']
+    processed_df = pd.DataFrame(averaged_values, columns=feature_names)
+    return processed_df
 
-    raw_values = data.iloc[:, indices_to_keep].values
 
-    # Average in groups of 3 for the first 15 sensors
-    num_sensor_groups = 15
-    averaged_values = np.zeros((raw_values.shape[0], num_sensor_groups + 2))
-    for i in range(num_sensor_groups):
-        start_col = i * 3
-        end_col = start_col + 3
-        averaged_values[:, i] = raw_values[:, start_col:end_col].mean(axis=1)
+# === CACHING ===
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
 
-    # Add temperature and humidity
-    averaged_values[:, num_sensor_groups] = raw_values[:, -2]
-    averaged_values[:, num_sensor_groups + 1] = raw_values[:, -1]
 
-    # Create a new DataFrame with meaningful names
-    feature_names = [f'sensor_avg_{i + 1}' for i in range(15)] + ['temperature', 'humidity']
-    processed_df = pd.DataFrame(averaged_values, columns=feature_names)
-    return processed_df
+def load_training_embedding():
+    """
+    Returns the standardized training features, their labels and their 2-D t-SNE embedding.
+
+    The embedding only depends on the training CSV, so it is computed once and cached on disk
+    under a key derived from the CSV's hash; later reports reuse it instead of re-running t-SNE.
+    """
+    training_hash = file_sha256(TRAINING_DATA_PATH)
+    cache_path = os.path.join(CACHE_DIR, f"tsne_training_v{TSNE_CACHE_VERSION}_{training_hash[:16]}.npz")
+
+    if os.path.exists(cache_path):
+        try:
+            with np.load(cache_path, allow_pickle=False) as cached:
+                return {
+                    "hash": training_hash,
+                    "scaler_mean": cached["scaler_mean"],
+                    "scaler_scale": cached["scaler_scale"],
+                    "scaled": cached["scaled"],
+                    "labels": cached["labels"].tolist(),
+                    "embedding": cached["embedding"],
+                }
+        except Exception as e:
+            print(f"Warning: ignoring unreadable t-SNE cache {cache_path}: {e}")
+
+    training_df_raw = pd.read_csv(TRAINING_DATA_PATH)
+    training_df_processed = process_sensor_data(training_df_raw)
+    scaler = StandardScaler()
+    training_scaled = scaler.fit_transform(training_df_processed)
+
+    tsne = TSNE(n_components=2, random_state=42, perplexity=min(30, len(training_scaled) - 1))
+    embedding = tsne.fit_transform(training_scaled)
+
+    training = {
+        "hash": training_hash,
+        "scaler_mean": scaler.mean_,
+        "scaler_scale": scaler.scale_,
+        "scaled": training_scaled,
+        "labels": training_df_raw['class'].astype(str).tolist(),
+        "embedding": embedding,
+    }
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = cache_path + ".tmp.npz"
+    np.savez(tmp_path, scaler_mean=training["scaler_mean"], scaler_scale=training["scaler_scale"],
+             scaled=training_scaled, labels=np.array(training["labels"]), embedding=embedding)
+    os.replace(tmp_path, cache_path)
+    return training
+
+
+def embed_out_of_sample(training, points_scaled, k=OUT_OF_SAMPLE_NEIGHBORS):
+    """
+    Places new points into an existing t-SNE map without re-running t-SNE: each point goes to the
+    inverse-distance weighted mean of the embedding of its k nearest training points.
+    """
+    if len(points_scaled) == 0:
+        return np.zeros((0, 2))
+    k = min(k, len(training["scaled"]))
+    tree = KDTree(training["scaled"])
+    distances, neighbors = tree.query(points_scaled, k=k)
+    weights = 1.0 / np.maximum(distances, 1e-9)
+    weights /= weights.sum(axis=1, keepdims=True)
+    return np.einsum('nk,nkd->nd', weights, training["embedding"][neighbors])
+
+
+def daily_data_version(store, date):
+    """
+    Identifies the state of a day's data without loading it. Partitions are append-only, so the
+    row count changes whenever new readings arrive. None when the day is read from the CSV.
+    """
+    if not store_covers_day(store, date):
+        return None
+    return str(store.row_count(date))
+
+
+def _render_cache_paths(date_str, data_version, training_hash):
+    stem = f"tsne_{date_str}_{data_version}_{training_hash[:16]}"
+    return os.path.join(CACHE_DIR, stem + ".png"), os.path.join(CACHE_DIR, stem + ".json")
+
+
+def _prune_render_cache(date_str, keep_png):
+    for name in os.listdir(CACHE_DIR):
+        path = os.path.join(CACHE_DIR, name)
+        if name.startswith(f"tsne_{date_str}_") and path not in (keep_png, os.path.splitext(keep_png)[0] + ".json"):
+            os.remove(path)
 
 
 # === MAIN VISUALIZATION PIPELINE ===
-def generate_tsne_visualization(save_file=False):
+def generate_tsne_visualization(save_file=False, date=None):
     """
-    Generates a t-SNE plot comparing today's sensor data with the KNN training data.
+    Generates a t-SNE plot comparing a day's sensor data (today by default) with the KNN training data.
+
+    The training embedding is cached on disk and daily readings are placed into it out-of-sample,
+    and for days the sensor store covers the rendered PNG is memoized per (date, data version), so
+    repeating a report for a day whose data has not changed only reads the cached image back.
     """
     ensure_dirs()
-    today = datetime.now().date()
+    today = date or datetime.now().date()
     date_str = today.isoformat()
 
-    # 1. Load and process today's data
-    daily_df_raw = load_and_filter_daily_data(SENSOR_CSV_PATH, today)
-    daily_df_processed = process_sensor_data(daily_df_raw)
-
-    # 2. Load and process training data
     if not os.path.exists(TRAINING_DATA_PATH):
         print(f"Error: Training data not found at {TRAINING_DATA_PATH}")
         return None
 
-    training_df_raw = pd.read_csv(TRAINING_DATA_PATH)
-    training_labels = training_df_raw['class']
-    training_df_processed = process_sensor_data(training_df_raw)
+    # 1. Serve a memoized render when neither the day's data nor the training data changed
+    store = SensorStore()
+    training_hash = file_sha256(TRAINING_DATA_PATH)
+    data_version = daily_data_version(store, today)
+    img_path = os.path.join(VISUALS_DIR, f"tsne_{date_str}.png")
+    if data_version is not None:
+        png_path, meta_path = _render_cache_paths(date_str, data_version, training_hash)
+        if os.path.exists(png_path) and os.path.exists(meta_path):
+            with open(png_path, 'rb') as f:
+                png_bytes = f.read()
+            with open(meta_path) as f:
+                metadata = json.load(f)
+            if save_file:
+                shutil.copyfile(png_path, img_path)
+                print(f"Saved t-SNE plot to {img_path}")
+            return {
+                "tsne_image_base64": base64.b64encode(png_bytes).decode('utf-8'),
+                "metadata": metadata
+            }
+
+    # 2. Load and process the day's data
+    daily_df_raw = load_daily_data(today, store)
+    daily_df_processed = process_sensor_data(daily_df_raw)
 
-    # 3. Combine data for t-SNE
+    # 3. Place daily readings into the cached training embedding
+    training = load_training_embedding()
+    training_labels = training["labels"]
     if daily_df_processed.empty:
         print("No daily data to plot.")
-        combined_data = training_df_processed
-        labels = training_labels.tolist()
+        daily_embedding = np.zeros((0, 2))
     else:
-        # Standardize features before combining
-        scaler = StandardScaler()
-        training_scaled = scaler.fit_transform(training_df_processed)
-        daily_scaled = scaler.transform(daily_df_processed)
-
-        combined_data = np.vstack([daily_scaled, training_scaled])
-        labels = ['Daily Reading'] * len(daily_df_processed) + training_labels.tolist()
+        daily_scaled = (daily_df_processed.to_numpy() - training["scaler_mean"]) / training["scaler_scale"]
+        daily_embedding = embed_out_of_sample(training, daily_scaled)
 
-    # 4. Run t-SNE
-    tsne = TSNE(n_components=2, random_state=42, perplexity=min(30, len(combined_data) - 1))
-    tsne_result = tsne.fit_transform(combined_data)
+    tsne_result = np.vstack([daily_embedding, training["embedding"]])
+    labels = ['Daily Reading'] * len(daily_embedding) + training_labels
 
-    # 5. Plot the results
+    # 4. Plot the results
     plt.figure(figsize=(12, 8))
     unique_labels = sorted(list(set(labels)))
-    colors = plt.cm.get_cmap('tab20', len(unique_labels))
+    colors = plt.get_cmap('tab20', len(unique_labels))
+    labels_array = np.array(labels)
 
     for i, label in enumerate(unique_labels):
-        ix = [j for j, l in enumerate(labels) if l == label]
+        ix = labels_array == label
         plt.scatter(
             tsne_result[ix, 0],
             tsne_result[ix, 1],
             label=label,
             alpha=0.8,
             color=colors(i),
-            s=50 if label != 'Daily Reading' else 25  # Make training points bigger
+            s=50 if label != 'Daily Reading' else 25,  # Make training points bigger
+            zorder=3 if label == 'Daily Reading' else 2  # Keep daily readings visible on top
         )
 
     plt.legend(bbox_to_anchor=(1.04, 1), loc="upper left")
@@ -144,28 +269,37 @@ def generate_tsne_visualization(save_file=False):
     plt.ylabel("t-SNE Component 2")
     plt.tight_layout(rect=[0, 0, 0.85, 1])  # Adjust layout to make room for legend
 
-    # 6. Prepare output
-    img_path = os.path.join(VISUALS_DIR, f"tsne_{date_str}.png")
-
+    # 5. Prepare output
     buf = io.BytesIO()
     plt.savefig(buf, format='png', bbox_inches='tight')
-    buf.seek(0)
-    img_base64 = base64.b64encode(buf.read()).decode('utf-8')
-    buf.close()
-
-    if save_file:
-        plt.savefig(img_path, bbox_inches='tight')
-        print(f"Saved t-SNE plot to {img_path}")
-
     plt.close()
+    png_bytes = buf.getvalue()
+    buf.close()
+    img_base64 = base64.b64encode(png_bytes).decode('utf-8')
 
     metadata = {
         "date": date_str,
         "daily_readings_count": len(daily_df_processed),
-        "training_samples_count": len(training_df_processed),
+        "training_samples_count": len(training["embedding"]),
+        "data_version": data_version,
         "plot_generated": True
     }
 
+    # Days read from the master CSV are not memoized: the recorder appends to it every few seconds,
+    # so no cheap version of it would ever match again
+    if data_version is not None:
+        png_path, meta_path = _render_cache_paths(date_str, data_version, training_hash)
+        with open(png_path, 'wb') as f:
+            f.write(png_bytes)
+        with open(meta_path, 'w') as f:
+            json.dump(metadata, f)
+        _prune_render_cache(date_str, png_path)
+
+    if save_file:
+        with open(img_path, 'wb') as f:
+            f.write(png_bytes)
+        print(f"Saved t-SNE plot to {img_path}")
+
     return {
         "tsne_image_base64": img_base64,
         "metadata": metadata
@@ -0,0 +1,154 @@
+# robot_streams.py
+
+import threading
+import time
+
+from fall_tracking import FALL_METHODS, FallTracker
+from frame_broadcast import FrameBroadcaster
+from frame_pipeline import FrameConversions
+
+DEFAULT_ROBOT_ID = "temi"
+# A fallen verdict must hold this long to count, and the person must be upright this long before
+# the same method can count them again
+FALL_CONFIRM_TIME = 0.3
+FALL_RECOVERY_TIME = 1.0
+
+
+class RobotStream:
+    """
+    Per-robot video state: the latest decoded frame, the annotated output published to that
+    robot's /video_feed clients, and the render/inference bookkeeping for its stream.
+    """
+
+    def __init__(self, robot_id, offline_frame=None, frame_ready=None):
+        """
+        :param robot_id: Id used in /video_feed/<robot_id>.
+        :param offline_frame: jpeg_cache.EncodedFrame shown before the first frame arrives.
+        :param frame_ready: Optional threading.Event set whenever a new decoded frame arrives.
+        """
+        self.robot_id = robot_id
+        self.raw_frames = FrameBroadcaster()
+        self.frame_broadcaster = FrameBroadcaster(initial=offline_frame)
+        # Rendered frames for WebRTC viewers, only published while an AnnotatedFeedTrack subscribes
+        self.video_frames = FrameBroadcaster()
+        self.webrtc_viewers = 0
+        self.frame_ready = frame_ready
+        self.connected = False
+        self.connected_at = None
+        self.render_thread = None
+        # BGR conversions of the newest frames, shared by render_loop and inference_loop
+        self.conversions = FrameConversions()
+
+        # Render thread state
+        self.last_pts = None
+        self.freeze_detected_time = None
+        self.duplicate_frame_count = 0
+        self.last_frame_time = "N/A"
+        self.frames_rendered = 0
+
+        # Inference thread state
+        self.latest_overlays = None
+        # FrameAnalysis of the display view while glasses mode is on, for render_loop to draw from
+        self.latest_glasses = None
+        self.fall_tracker = FallTracker(cooldown=1.0, persistence=1.0, methods=FALL_METHODS,
+                                        confirm_time=FALL_CONFIRM_TIME, recovery_time=FALL_RECOVERY_TIME)
+        self.analyzed_seq = 0
+        self.frames_analyzed = 0
+        self.frames_dropped = 0
+        self.analysis_latency_ms = 0.0
+        self.last_person_count = 0
+        self.last_person_increment_time = 0
+
+    def publish_frame(self, frame):
+        """Stores a decoded av.VideoFrame as this robot's newest frame, stamped with its arrival time."""
+        self.raw_frames.publish((frame, time.monotonic()))
+        if self.frame_ready is not None:
+            self.frame_ready.set()
+
+    def latest_frame(self):
+        """The newest decoded frame, or None if the robot has not sent one yet."""
+        _, entry = self.raw_frames.latest()
+        return entry[0] if entry is not None else None
+
+    def take_new_frame(self):
+        """
+        Claims the newest frame for analysis if it has not been analyzed yet.
+
+        :return: (frame, received_at, skipped) or None, `skipped` being the frames that arrived
+                 since the previous analysis and were never analyzed.
+        """
+        seq, entry = self.raw_frames.latest()
+        if entry is None or seq == self.analyzed_seq:
+            return None
+        skipped = seq - self.analyzed_seq - 1 if self.analyzed_seq else 0
+        self.analyzed_seq = seq
+        self.frames_dropped += skipped
+        return entry[0], entry[1], skipped
+
+    def stats(self):
+        return {
+            "robot_id": self.robot_id,
+            "connected": self.connected,
+            "connected_at": self.connected_at,
+            "last_frame_time": self.last_frame_time,
+            "frames_rendered": self.frames_rendered,
+            "frames_analyzed": self.frames_analyzed,
+            "frames_dropped": self.frames_dropped,
+            "analysis_latency_ms": round(self.analysis_latency_ms, 1),
+            "video_feed_clients": self.frame_broadcaster.subscribers,
+            "webrtc_viewers": self.webrtc_viewers,
+        }
+
+
+class RobotRegistry:
+    """
+    The RobotStream of every robot that has connected, keyed by robot id.
+
+    A robot may name itself in its WebRTC offer; otherwise the first one gets DEFAULT_ROBOT_ID
+    (so a single-robot setup keeps using /video_feed) and later ones `temi-2`, `temi-3`, ...
+    A robot that reconnects under the same id gets its previous stream back.
+    """
+
+    def __init__(self, offline_frame=None):
+        self.offline_frame = offline_frame
+        self.frame_ready = threading.Event()
+        self._lock = threading.Lock()
+        self._streams = {}
+
+    def connect(self, requested_id=None):
+        """Returns the RobotStream for a new peer connection and marks it connected."""
+        with self._lock:
+            robot_id = requested_id
+            if not robot_id:
+                robot_id, n = DEFAULT_ROBOT_ID, 2
+                while robot_id in self._streams and self._streams[robot_id].connected:
+                    robot_id = f"{DEFAULT_ROBOT_ID}-{n}"
+                    n += 1
+            stream = self._get_or_create(robot_id)
+            stream.connected = True
+            stream.connected_at = time.strftime('%Y-%m-%d %H:%M:%S')
+            return stream
+
+    def disconnect(self, stream):
+        with self._lock:
+            stream.connected = False
+
+    def get(self, robot_id):
+        with self._lock:
+            return self._streams.get(robot_id)
+
+    def primary(self):
+        """The stream behind /video_feed, created (offline) before any robot connects."""
+        with self._lock:
+            return self._get_or_create(DEFAULT_ROBOT_ID)
+
+    def streams(self):
+        with self._lock:
+            return list(self._streams.values())
+
+    def _get_or_create(self, robot_id):
+        stream = self._streams.get(robot_id)
+        if stream is None:
+            stream = RobotStream(robot_id, self.offline_frame, self.frame_ready)
+            self._streams[robot_id] = stream
+        return stream
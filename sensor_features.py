@@ -0,0 +1,108 @@
+# sensor_features.py
+
+"""
+Raw-to-feature transform shared by the server, the smell classifier and the reports.
+
+The robot sends 66 raw readings per sample. Channels marked 999 in CHANNEL_MAP are inactive;
+the 45 active gas channels come in groups of 3 redundant readings that are averaged, and the
+last two readings (humidity, then temperature, as in the training CSV's `humidity,temperature`
+columns) pass through unchanged, giving 17 features.
+"""
+
+import time
+
+import numpy as np
+
+NUM_RAW_VALUES = 66
+NUM_SENSOR_GROUPS = 15
+NUM_FEATURES = NUM_SENSOR_GROUPS + 2
+
+CHANNEL_MAP = [999, 999, 11, 11, 11, 3, 3, 3, 2, 2, 2, 1, 1, 1, 999, 999,
+               999, 999, 999, 999, 999, 9, 9, 9, 6, 6, 6, 5, 5, 5, 999, 999,
+               999, 999, 14, 14, 14, 10, 10, 10, 7, 7, 7, 4, 4, 4, 999, 999,
+               999, 999, 15, 15, 15, 13, 13, 13, 12, 12, 12, 8, 8, 8, 999, 999,
+               16, 17]
+
+# Precomputed gather index: the 45 active gas readings (in group order) followed by humidity, temperature
+GATHER_INDEX = np.array([idx for idx, ch in enumerate(CHANNEL_MAP) if ch != 999])
+
+FEATURE_NAMES = [f'channel_{i + 1}_avg' for i in range(NUM_SENSOR_GROUPS)] + ['humidity', 'temperature']
+
+# The same layout as plain indices, for row_to_features
+_GROUP_INDICES = [tuple(int(i) for i in GATHER_INDEX[g * 3:g * 3 + 3]) for g in range(NUM_SENSOR_GROUPS)]
+_HUMIDITY_INDEX, _TEMPERATURE_INDEX = (int(i) for i in GATHER_INDEX[-2:])
+
+
+def raw_to_features(raw):
+    """
+    Reduces raw readings to the 17-feature format.
+
+    :param raw: Array-like of shape (66,) or (N, 66).
+    :return: float64 array of shape (17,) or (N, 17).
+    """
+    raw = np.asarray(raw, dtype=np.float64)
+    single = raw.ndim == 1
+    if single:
+        raw = raw[np.newaxis, :]
+    if raw.shape[1] != NUM_RAW_VALUES:
+        raise ValueError(f"Expected {NUM_RAW_VALUES} raw sensor values, got {raw.shape[1]}")
+
+    kept = raw[:, GATHER_INDEX]
+    features = np.empty((len(raw), NUM_FEATURES), dtype=np.float64)
+    features[:, :NUM_SENSOR_GROUPS] = kept[:, :-2].reshape(len(raw), NUM_SENSOR_GROUPS, 3).mean(axis=2)
+    features[:, NUM_SENSOR_GROUPS:] = kept[:, -2:]
+    return features[0] if single else features
+
+
+def row_to_features(row):
+    """
+    raw_to_features for a single row, in plain Python. For one reading at a time (the robot's
+    DataChannel messages) this beats building and gathering a NumPy array; use raw_to_features
+    for batches.
+
+    :param row: Sequence of 66 numbers.
+    :return: List of 17 floats, equal to raw_to_features(row).
+    """
+    if len(row) != NUM_RAW_VALUES:
+        raise ValueError(f"Expected {NUM_RAW_VALUES} raw sensor values, got {len(row)}")
+    features = [(row[a] + row[b] + row[c]) / 3 for a, b, c in _GROUP_INDICES]
+    features.append(float(row[_HUMIDITY_INDEX]))
+    features.append(float(row[_TEMPERATURE_INDEX]))
+    return features
+
+
+def _reference_features(row):
+    """Per-row Python version of the transform (the old server.format_data loop), for the benchmark."""
+    filtered = [x for x, ch in zip(row, CHANNEL_MAP) if ch != 999]
+    averaged = [sum(filtered[i * 3:i * 3 + 3]) / 3 for i in range((len(filtered) - 2) // 3)]
+    return averaged + [filtered[-2], filtered[-1]]
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    raw = rng.uniform(1000, 2_500_000, size=(100_000, NUM_RAW_VALUES))
+
+    rows = raw[:2000].tolist()
+    start = time.perf_counter()
+    for row in rows:
+        _reference_features(row)
+    loop_rate = len(rows) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for row in rows:
+        raw_to_features(row)
+    single_rate = len(rows) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for row in rows:
+        row_to_features(row)
+    row_rate = len(rows) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    raw_to_features(raw)
+    batch_rate = len(raw) / (time.perf_counter() - start)
+
+    print(f"per-row Python loop: {loop_rate:,.0f} rows/s")
+    print(f"raw_to_features, one row per call: {single_rate:,.0f} rows/s")
+    print(f"row_to_features: {row_rate:,.0f} rows/s")
+    print(f"raw_to_features, (N, 66) batch: {batch_rate:,.0f} rows/s")
@@ -0,0 +1,145 @@
+# sensor_recorder.py
+
+import csv
+import os
+import threading
+import time
+
+SENSOR_CSV_HEADER = ['timestamp'] + [f'value_{i}' for i in range(66)] + ['x_position', 'y_position', 'frame_filename']
+
+
+class SensorRecorder:
+    """
+    Buffered writer for the master sensor CSV (and, optionally, the columnar SensorStore).
+
+    Rows are appended to an in-memory batch (no syscalls on the caller's thread) and written by a
+    background thread through one long-lived file handle, either when the batch reaches
+    `batch_size` rows or every `flush_interval` seconds. With `fsync=True` every flush is also
+    forced to disk. `close()` flushes whatever is still buffered.
+    """
+
+    def __init__(self, csv_path, header=SENSOR_CSV_HEADER, batch_size=50, max_pending=5000,
+                 flush_interval=2.0, fsync=False, store=None, on_flush=None, write_time=None):
+        """
+        :param csv_path: Path of the CSV file to append to.
+        :param header: Header row written when the file is new or empty.
+        :param batch_size: Pending rows that trigger an immediate flush.
+        :param max_pending: Hard cap on buffered rows; the oldest are dropped if the disk stalls.
+        :param flush_interval: Maximum seconds a row waits before being written.
+        :param fsync: Force each flush to disk with os.fsync.
+        :param store: Optional SensorStore that receives every flushed batch as well.
+        :param on_flush: Optional callback run on the writer thread after rows are written.
+        :param write_time: Optional metrics_registry.Histogram observing each CSV write in ms.
+        """
+        self.csv_path = csv_path
+        self.header = header
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.store = store
+        self.on_flush = on_flush
+        self.write_time = write_time
+
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.flushes = 0
+
+        self._pending = []
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._file = None
+        self._writer = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="sensor-recorder", daemon=True)
+        self._thread.start()
+
+    def record(self, row):
+        """Queues one row for writing. Safe to call from the event loop."""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("SensorRecorder is closed")
+            if len(self._pending) >= self.max_pending:
+                self._pending.pop(0)
+                self.rows_dropped += 1
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def flush(self):
+        """Writes all pending rows now, on the calling thread."""
+        with self._cond:
+            rows, self._pending = self._pending, []
+        if rows:
+            self._write(rows)
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=5)
+        self.flush()
+        with self._write_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _open(self):
+        directory = os.path.dirname(self.csv_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.csv_path, 'a', newline='')
+        self._writer = csv.writer(self._file)
+        if self._file.tell() == 0 and self.header:
+            self._writer.writerow(self.header)
+
+    def _write(self, rows):
+        with self._write_lock:
+            start = time.perf_counter()
+            if self._file is None:
+                self._open()
+            self._writer.writerows(rows)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self.rows_written += len(rows)
+            self.flushes += 1
+            if self.write_time is not None:
+                self.write_time.observe((time.perf_counter() - start) * 1000)
+
+        if self.store is not None:
+            try:
+                stored = self.store.append_rows(rows)
+                if stored < len(rows):
+                    print(f"⚠️ SensorRecorder skipped {len(rows) - stored} malformed rows in the sensor store")
+            except Exception as e:
+                print(f"❌ SensorRecorder failed to append {len(rows)} rows to the sensor store: {e}")
+
+        if self.on_flush is not None:
+            try:
+                self.on_flush()
+            except Exception as e:
+                print(f"⚠️ SensorRecorder on_flush callback failed: {e}")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or len(self._pending) >= self.batch_size,
+                                    self.flush_interval)
+                if self._closed:
+                    return
+                rows, self._pending = self._pending, []
+            if rows:
+                try:
+                    self._write(rows)
+                except OSError as e:
+                    print(f"❌ SensorRecorder failed to write {len(rows)} rows: {e}")
+                    with self._write_lock:
+                        if self._file is not None:
+                            self._file.close()
+                        self._file = None  # reopen on the next attempt
+                    with self._cond:
+                        self._pending[:0] = rows
+                    time.sleep(self.flush_interval)
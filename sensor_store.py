@@ -0,0 +1,319 @@
+# sensor_store.py
+
+"""
+Day-partitioned columnar store for sensor readings.
+
+Each day gets its own directory under the store root holding fixed-width binary columns:
+
+    <root>/YYYY-MM-DD/timestamps.i8     int64, seconds since 1970-01-01 in local wall-clock time
+    <root>/YYYY-MM-DD/values.f8         float64, 66 raw sensor values per row
+    <root>/YYYY-MM-DD/positions.f8      float64, robot x/y per row (NaN when unknown)
+    <root>/YYYY-MM-DD/frames.txt        one frame snapshot filename per line ('' when none)
+
+Columns are appended in place and read back with np.memmap, so a time-range query only opens
+the partitions it covers and never parses text. Timestamps are stored as naive local time
+(the same wall-clock the CSV uses), which keeps day boundaries aligned with partitions.
+
+Migrate an existing master CSV with:
+
+    python sensor_store.py migrate [Temi_Sensor_Data/sensor_data_master.csv]
+"""
+
+import argparse
+import calendar
+import os
+import shutil
+import threading
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+SENSOR_STORE_DIR = "Temi_Sensor_Data/store"
+SENSOR_CSV_PATH = "Temi_Sensor_Data/sensor_data_master.csv"
+NUM_VALUES = 66
+SECONDS_PER_DAY = 86400
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_COLUMNS = {
+    "timestamps": ("timestamps.i8", np.int64, ()),
+    "values": ("values.f8", np.float64, (NUM_VALUES,)),
+    "positions": ("positions.f8", np.float64, (2,)),
+}
+_FRAMES_FILE = "frames.txt"
+
+
+def to_epoch(timestamp):
+    """Converts a 'YYYY-MM-DD HH:MM:SS' string or naive datetime to store seconds."""
+    if isinstance(timestamp, str):
+        timestamp = datetime.strptime(timestamp, TIMESTAMP_FORMAT)
+    return calendar.timegm(timestamp.timetuple())
+
+
+def from_epoch(seconds):
+    return datetime(1970, 1, 1) + timedelta(seconds=int(seconds))
+
+
+def partition_name(seconds):
+    return (date(1970, 1, 1) + timedelta(days=int(seconds) // SECONDS_PER_DAY)).isoformat()
+
+
+class SensorStore:
+    """Appends and queries sensor readings in day-partitioned binary columns."""
+
+    def __init__(self, root=SENSOR_STORE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._partition_rows = {}  # rows per partition we have appended to, so appends never rescan
+
+    # === WRITING ===
+    def append_rows(self, rows):
+        """
+        Appends rows in the master CSV layout:
+        [timestamp, value_0 .. value_65, x_position, y_position, frame_filename].
+        Rows whose timestamp or sensor values do not parse are skipped; the rest are still stored.
+
+        :return: Number of rows appended.
+        """
+        try:
+            timestamps, values = _parse_rows(rows)
+        except (TypeError, ValueError, IndexError):
+            # One malformed row must not cost the whole batch
+            rows = [row for row in rows if _row_parses(row)]
+            timestamps, values = _parse_rows(rows)
+        if not rows:
+            return 0
+        positions = np.array([[_to_float(row[1 + NUM_VALUES]), _to_float(row[2 + NUM_VALUES])] for row in rows],
+                             dtype=np.float64)
+        frames = [row[3 + NUM_VALUES] or "" for row in rows]
+        self.append_arrays(timestamps, values, positions, frames)
+        return len(rows)
+
+    def append_arrays(self, timestamps, values, positions=None, frames=None):
+        """
+        Appends N rows given as arrays, splitting them across day partitions.
+
+        :param timestamps: (N,) int64 store seconds (see to_epoch).
+        :param values: (N, 66) raw sensor values.
+        :param positions: Optional (N, 2) robot positions, NaN when unknown.
+        :param frames: Optional list of N frame filenames.
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64).reshape(-1, NUM_VALUES)
+        if positions is None:
+            positions = np.full((len(timestamps), 2), np.nan)
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        if frames is None:
+            frames = [""] * len(timestamps)
+
+        days = timestamps // SECONDS_PER_DAY
+        with self._lock:
+            for day in np.unique(days):
+                idx = np.flatnonzero(days == day)
+                part_dir = os.path.join(self.root, partition_name(day * SECONDS_PER_DAY))
+                os.makedirs(part_dir, exist_ok=True)
+                if part_dir not in self._partition_rows:
+                    # Align the columns first in case an earlier append was interrupted part-way
+                    self._partition_rows[part_dir] = self._trim_partition(part_dir)
+                for name, column in (("timestamps", timestamps), ("values", values), ("positions", positions)):
+                    filename, dtype, _ = _COLUMNS[name]
+                    with open(os.path.join(part_dir, filename), "ab") as f:
+                        f.write(np.ascontiguousarray(column[idx], dtype=dtype).tobytes())
+                with open(os.path.join(part_dir, _FRAMES_FILE), "a") as f:
+                    f.write("".join(f"{frames[i]}\n" for i in idx))
+                self._partition_rows[part_dir] += len(idx)
+
+    def _trim_partition(self, part_dir):
+        counts = [self._column_rows(part_dir, name) for name in _COLUMNS]
+        frames_path = os.path.join(part_dir, _FRAMES_FILE)
+        frame_lines = _count_lines(frames_path)
+        count = min(counts + [frame_lines])
+        if any(c != count for c in counts) or frame_lines != count:
+            for name, (filename, dtype, shape) in _COLUMNS.items():
+                path = os.path.join(part_dir, filename)
+                if os.path.exists(path):
+                    os.truncate(path, count * np.dtype(dtype).itemsize * int(np.prod(shape, dtype=int)))
+            if os.path.exists(frames_path):
+                with open(frames_path) as f:
+                    lines = f.readlines()[:count]
+                with open(frames_path, "w") as f:
+                    f.writelines(lines)
+        return count
+
+    # === READING ===
+    def partitions(self):
+        """Sorted list of partition dates (ISO strings) present in the store."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d for d in os.listdir(self.root) if _is_partition_name(d))
+
+    def first_timestamp(self):
+        """
+        Store seconds of the oldest row, or None if the store is empty. Rows recorded before the
+        store was first written to (and never migrated) are only in the master CSV.
+        """
+        for day in self.partitions():
+            timestamps = self.read_day(day)["timestamps"]
+            if len(timestamps):
+                return int(timestamps.min())
+        return None
+
+    def row_count(self, day):
+        part_dir = os.path.join(self.root, _day_str(day))
+        if not os.path.isdir(part_dir):
+            return 0
+        return min(self._column_rows(part_dir, name) for name in _COLUMNS)
+
+    def read_day(self, day):
+        """All rows for one day; numeric columns are read-only memory maps."""
+        part_dir = os.path.join(self.root, _day_str(day))
+        count = self.row_count(day)
+        result = {"timestamps": None, "values": None, "positions": None}
+        for name, (filename, dtype, shape) in _COLUMNS.items():
+            if count == 0:
+                result[name] = np.zeros((0,) + shape, dtype=dtype)
+            else:
+                result[name] = np.memmap(os.path.join(part_dir, filename), dtype=dtype, mode="r",
+                                         shape=(count,) + shape)
+        result["frames"] = _read_lines(os.path.join(part_dir, _FRAMES_FILE), count)
+        return result
+
+    def query(self, start, end):
+        """
+        Rows with start <= timestamp < end, touching only the partitions in that range.
+
+        :param start: datetime or store seconds.
+        :param end: datetime or store seconds.
+        :return: dict of 'timestamps', 'values', 'positions' arrays and a 'frames' list.
+        """
+        start_s = start if isinstance(start, (int, np.integer)) else to_epoch(start)
+        end_s = end if isinstance(end, (int, np.integer)) else to_epoch(end)
+        first, last = partition_name(start_s), partition_name(max(start_s, end_s - 1))
+
+        parts = {"timestamps": [], "values": [], "positions": [], "frames": []}
+        for day in self.partitions():
+            if day < first or day > last:
+                continue
+            data = self.read_day(day)
+            mask = (data["timestamps"] >= start_s) & (data["timestamps"] < end_s)
+            for name in _COLUMNS:
+                parts[name].append(np.asarray(data[name][mask]))
+            parts["frames"].extend(f for f, keep in zip(data["frames"], mask) if keep)
+
+        result = {}
+        for name, (_, dtype, shape) in _COLUMNS.items():
+            result[name] = np.concatenate(parts[name]) if parts[name] else np.zeros((0,) + shape, dtype=dtype)
+        result["frames"] = parts["frames"]
+        return result
+
+    def _column_rows(self, part_dir, name):
+        filename, dtype, shape = _COLUMNS[name]
+        path = os.path.join(part_dir, filename)
+        if not os.path.exists(path):
+            return 0
+        row_bytes = np.dtype(dtype).itemsize * int(np.prod(shape, dtype=int))
+        return os.path.getsize(path) // row_bytes
+
+
+def to_dataframe(data):
+    """Builds a DataFrame in the master CSV layout (timestamp, value_0..value_65, ...) from query results."""
+    import pandas as pd
+
+    df = pd.DataFrame(np.asarray(data["values"]), columns=[f"value_{i}" for i in range(NUM_VALUES)])
+    df.insert(0, "timestamp", pd.to_datetime(np.asarray(data["timestamps"]), unit="s"))
+    df["x_position"] = np.asarray(data["positions"])[:, 0]
+    df["y_position"] = np.asarray(data["positions"])[:, 1]
+    df["frame_filename"] = [f or None for f in data["frames"]]
+    return df
+
+
+def migrate_csv(csv_path=SENSOR_CSV_PATH, root=SENSOR_STORE_DIR, chunksize=100_000, overwrite=False):
+    """
+    One-shot import of a master CSV into the columnar store.
+
+    :return: Number of rows migrated.
+    """
+    import pandas as pd
+
+    store = SensorStore(root)
+    if store.partitions():
+        if not overwrite:
+            raise RuntimeError(f"{root} already holds data; pass overwrite=True (--overwrite) to rebuild it")
+        shutil.rmtree(root)
+        store = SensorStore(root)
+
+    value_cols = [f"value_{i}" for i in range(NUM_VALUES)]
+    migrated = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        chunk["timestamp"] = pd.to_datetime(chunk["timestamp"], format=TIMESTAMP_FORMAT, errors="coerce")
+        chunk = chunk.dropna(subset=["timestamp"])
+        if chunk.empty:
+            continue
+        timestamps = chunk["timestamp"].to_numpy(dtype="datetime64[s]").astype(np.int64)
+        positions = chunk[["x_position", "y_position"]].apply(pd.to_numeric, errors="coerce").to_numpy()
+        frames = chunk["frame_filename"].fillna("").astype(str).tolist()
+        store.append_arrays(timestamps, chunk[value_cols].to_numpy(dtype=np.float64), positions, frames)
+        migrated += len(chunk)
+        print(f"Migrated {migrated} rows...")
+    return migrated
+
+
+def _parse_rows(rows):
+    """(timestamps, values) arrays of master-CSV-layout rows; raises ValueError or TypeError on a bad row."""
+    timestamps = np.array([to_epoch(row[0]) for row in rows], dtype=np.int64)
+    values = np.array([row[1:1 + NUM_VALUES] for row in rows], dtype=np.float64).reshape(-1, NUM_VALUES)
+    if len(values) != len(rows):
+        raise ValueError(f"expected {NUM_VALUES} sensor values per row")
+    return timestamps, values
+
+
+def _row_parses(row):
+    try:
+        _parse_rows([row])
+    except (TypeError, ValueError, IndexError):
+        return False
+    return True
+
+
+def _to_float(value):
+    return float(value) if isinstance(value, (int, float)) else np.nan
+
+
+def _day_str(day):
+    return day.isoformat() if isinstance(day, (date, datetime)) else str(day)
+
+
+def _is_partition_name(name):
+    try:
+        datetime.strptime(name, "%Y-%m-%d")
+        return True
+    except ValueError:
+        return False
+
+
+def _count_lines(path):
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb") as f:
+        return sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 20), b""))
+
+
+def _read_lines(path, count):
+    if count == 0 or not os.path.exists(path):
+        return [""] * count
+    with open(path) as f:
+        lines = [line.rstrip("\n") for _, line in zip(range(count), f)]
+    return lines + [""] * (count - len(lines))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sensor store tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subparsers.add_parser("migrate", help="Import a master CSV into the columnar store")
+    migrate_parser.add_argument("csv_path", nargs="?", default=SENSOR_CSV_PATH)
+    migrate_parser.add_argument("--root", default=SENSOR_STORE_DIR)
+    migrate_parser.add_argument("--overwrite", action="store_true", help="Rebuild the store if it already has data")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        total = migrate_csv(args.csv_path, args.root, overwrite=args.overwrite)
+        print(f"Done: {total} rows written to {args.root}")
@@ -1,55 +1,67 @@
 import asyncio
+import atexit
 import cv2
 import logging
 from aiohttp import web
-from aiortc import MediaStreamTrack, RTCPeerConnection, RTCSessionDescription, RTCConfiguration, RTCIceServer
+from aiortc import MediaStreamTrack, RTCPeerConnection, RTCSessionDescription
 from aiortc.contrib.media import MediaRelay
 from flask import Flask, Response, render_template, jsonify, request
-from flask import Flask
 # from flask_cors import CORSt
 
 import threading
 import time
-from datetime import datetime, timedelta
-import numpy as np
+from datetime import datetime
 import os
 import json
-import time
 import random  # <-- ADDED IMPORT
-from aiortc.sdp import candidate_from_sdp, candidate_to_sdp, SessionDescription as SDPDescription
+from metrics_registry import exposition
 from daily_reports import (
-    send_email_report,
+    report_queue,
     schedule_daily_report,
     increment,
     add_time,
     update_csv_metrics,
     metrics,
+    decode_time,
+    inference_time,
+    overlay_draw_time,
+    overlay_compose_time,
+    encode_time,
+    video_write_time,
+    csv_write_time,
+    classify_time,
+    jpeg_cache_hits,
+    jpeg_cache_misses,
 )
-# ---MODIFIED---
-from report_visualizer import generate_tsne_visualization
-from yolo_fall_detection import FallDetector  # Import the FallDetector class
 from smell_classifier import SmellClassifier
-from queue import Queue
+from sensor_features import row_to_features
+from frame_pipeline import DISPLAY_SIZE, FramePipeline, OverlayLayers
+from analysis_scheduler import AnalysisScheduler
+from robot_streams import DEFAULT_ROBOT_ID, RobotRegistry
+from sensor_recorder import SensorRecorder
+from sensor_store import SensorStore
+from snapshot_writer import SnapshotWriter
+from video_recorder import RECORDING_MODES, VideoRecorder
+from packet_recorder import PacketRecorder
+from fall_clips import FallClipWriter
+from jpeg_cache import EncodedFrame
+from annotated_track import AnnotatedFeedTrack
+from sse_broker import SSEBroker, parse_last_event_id
 import schedule
 
-sse_queue = Queue()
+# Fan-out of dashboard events; each /stream-updates connection gets its own bounded buffer
+sse_broker = SSEBroker()
+sse_keepalive_interval = 15.0
 
-# Set logging to INFO level
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger("temi-stream")
 
 # WebRTC globals
 relay = MediaRelay()
 pcs = set()
-frame_holder = {'frame': None}
 
 # Frame processing globals
-last_pts = None
-freeze_detected_time = None
-duplicate_frame_count = 0
 duplicate_threshold = 5
 freeze_threshold = 5.0
-last_frame_time = "N/A"
 last_should_record = False
 vision_mode = {"glasses": False, "fullscreen": False, "last_toggle": 0}
 
@@ -71,23 +83,104 @@ else:
         else:
             offline_bytes = buffer.tobytes()
             logger.info(f"Loaded filler image from {filler_image_path}, size={len(offline_bytes)} bytes")
-
-# Instantiate FallDetector and SmellClassifier globally
-fall_detector = FallDetector()
+# Keeps the filler image so /video_feed?w=&q= variants of the placeholder skip decoding it
+offline_frame = EncodedFrame(offline_bytes, image=filler_img if offline_bytes != b"..." else None, idle=True)
+# WebRTC viewers get the placeholder at the live view's size rather than the image's own resolution
+offline_video_image = None
+if offline_frame.image is not None:
+    filler_h, filler_w = filler_img.shape[:2]
+    filler_scale = min(DISPLAY_SIZE[0] / filler_w, DISPLAY_SIZE[1] / filler_h)
+    offline_video_image = cv2.resize(filler_img, (int(filler_w * filler_scale) // 2 * 2, int(filler_h * filler_scale) // 2 * 2),
+                                     interpolation=cv2.INTER_AREA)
+
+# Instantiate SmellClassifier globally (its model loads on first use). The FallDetector is created by
+# the analysis worker when it starts, so importing this module (e.g. in report worker processes) stays cheap.
+fall_detector = None
 smell_classifier = SmellClassifier()
 
 # Store classified smell data
 classified_data = []
 
+# Default /start-recording mode and file length; settings only, the recorders are created by init()
+recording_mode = os.getenv("TEMI_RECORDING_MODE", "annotated")
+recording_segment_seconds = int(os.getenv("TEMI_RECORDING_SEGMENT_SECONDS", "300"))
+
+# Recorders and writers run their own threads, so init() creates them when the server starts rather
+# than on import: spawned report workers re-import this module as __mp_main__
+sensor_recorder = None
+snapshot_writer = None
+video_recorder = None
+packet_recorder = None
+fall_clips = None
+
+
+def init():
+    """Creates the sensor recorder, snapshot writer, video recorders and fall clip writer and registers their shutdown."""
+    global sensor_recorder, snapshot_writer, video_recorder, packet_recorder, fall_clips
+    # Sensor rows are batched and written by a background thread; row metrics refresh after each flush
+    sensor_recorder = SensorRecorder(
+        os.path.join("Temi_Sensor_Data", "sensor_data_master.csv"),
+        fsync=os.getenv("TEMI_SENSOR_FSYNC", "false").lower() == "true",
+        store=SensorStore(),
+        on_flush=update_csv_metrics,
+        write_time=csv_write_time,
+    )
+    atexit.register(sensor_recorder.close)
+
+    # Frame snapshots referenced by sensor rows are written off the event loop
+    snapshot_writer = SnapshotWriter(os.path.join("Temi_Sensor_Data", "frames"))
+    atexit.register(snapshot_writer.shutdown)
+
+    # Recordings are encoded on their own thread, timed by the camera PTS and split into segments;
+    # "passthrough" recordings skip decoding and encoding and save the robot's own H.264/VP8 packets
+    video_recorder = VideoRecorder(
+        "Temi_VODs",
+        segment_seconds=recording_segment_seconds,
+        mode=recording_mode if recording_mode in RECORDING_MODES else "annotated",
+        write_time=video_write_time,
+    )
+    packet_recorder = PacketRecorder("Temi_VODs", segment_seconds=recording_segment_seconds)
+    atexit.register(video_recorder.close)
+    atexit.register(packet_recorder.close)
+
+    # The last few seconds of every robot's feed stay in memory as JPEGs so a fall can be saved
+    # with the moments leading up to it, without anyone having pressed record
+    fall_clips = FallClipWriter(
+        "Temi_VODs",
+        pre_seconds=float(os.getenv("TEMI_CLIP_PRE_SECONDS", "5")),
+        post_seconds=float(os.getenv("TEMI_CLIP_POST_SECONDS", "5")),
+        methods=[m.strip() for m in os.getenv("TEMI_CLIP_METHODS", "full").split(",") if m.strip()],
+    )
+    atexit.register(fall_clips.close)
 
-# --- SSE CHANGE: Helper function to push metric updates ---
-def push_metrics_update():
-    """Puts the current metrics onto the SSE queue."""
-    metrics_payload = {
-        "event": "metrics_update",
-        "data": metrics
-    }
-    sse_queue.put(json.dumps(metrics_payload))
+
+# One RobotStream per connected robot: its decoded frames in, its annotated /video_feed frames out
+robots = RobotRegistry(offline_frame=offline_frame)
+# Inference runs on its own thread, batching every robot's newest frame into one model call
+# whenever the scheduler allows; the streams themselves are never throttled
+analysis_scheduler = AnalysisScheduler(
+    target_fps=float(os.getenv("TEMI_ANALYSIS_FPS", "0")) or None,
+    cpu_budget=float(os.getenv("TEMI_ANALYSIS_CPU_BUDGET", "0")) or None,
+)
+inference_thread = None
+analysis_thread_lock = threading.Lock()
+fall_detector_lock = threading.Lock()
+mjpeg_keepalive_interval = 1.0
+# The offline placeholder never changes, so idle clients only need it re-sent to keep the connection open
+mjpeg_idle_interval = 10.0
+metrics_publish_interval = 1.0
+
+
+# --- SSE CHANGE: Metric updates go out on a fixed cadence, not on every increment ---
+def publish_metrics_loop():
+    """Publishes a metrics snapshot to all SSE subscribers every second, whenever anything changed."""
+    last_published = None
+    while True:
+        values = metrics.snapshot().flat()
+        if values != last_published:
+            sse_broker.publish("metrics_update", values)
+            last_published = values
+        time.sleep(metrics_publish_interval)
 
 
 # -------- aiohttp WebRTC server ----------
@@ -97,18 +190,19 @@ app = web.Application()
 class VideoProcessorTrack(MediaStreamTrack):
     kind = "video"
 
-    def __init__(self, track):
+    def __init__(self, track, stream):
         super().__init__()
         self.track = track
+        self.stream = stream
         self.first_frame_logged = False  # Add a flag to log the first frame only once
 
     async def recv(self):
         frame = await self.track.recv()
-        frame_holder['frame'] = frame
+        self.stream.publish_frame(frame)
 
         # --- DEBUG LOGGING START ---
         if not self.first_frame_logged:
-            logger.info(f"🎉🎉🎉 FIRST video frame received! PTS: {frame.pts}, Size: {len(frame.to_ndarray())} bytes 🎉🎉🎉")
+            logger.info(f"🎉🎉🎉 FIRST video frame received from {self.stream.robot_id}! PTS: {frame.pts}, Size: {frame.width}x{frame.height} {frame.format.name} 🎉🎉🎉")
             self.first_frame_logged = True
         else:
             logger.debug(f"Received subsequent video frame with pts={frame.pts}")
@@ -117,7 +211,7 @@ class VideoProcessorTrack(MediaStreamTrack):
         return frame
 
 
-async def create_peer_connection():
+async def create_peer_connection(stream):
     # --- CORRECT STUN SERVER CONFIGURATION ---
     # configuration = RTCConfiguration(iceServers=[
     #     RTCIceServer("stun:stun.l.google.com:19302")
@@ -135,8 +229,15 @@ async def create_peer_connection():
         if track.kind == "video":
             logger.info("Video track detected. Subscribing to the relay to process frames.")
 
-            video_track = VideoProcessorTrack(relay.subscribe(track))
+            video_track = VideoProcessorTrack(relay.subscribe(track), stream)
             peer.addTrack(video_track)
+            start_analysis_worker(stream)
+
+            # Passthrough recordings, like the others, are of the primary robot
+            if stream.robot_id == DEFAULT_ROBOT_ID:
+                receiver = next((r for r in peer.getReceivers() if r.track is track), None)
+                if receiver is not None:
+                    packet_recorder.tap(receiver)
 
             async def consume_track():
                 try:
@@ -178,7 +279,7 @@ async def create_peer_connection():
                             "event": "robot_position_update",
                             "data": {"x": x_position, "y": y_position}
                         }
-                        sse_queue.put(json.dumps(position_event_payload))
+                        sse_broker.publish(position_event_payload["event"], position_event_payload["data"])
                         logger.info(f"Pushed position update: x={x_position}, y={y_position}")
 
                 if 'values' in data_payload:
@@ -205,34 +306,27 @@ async def create_peer_connection():
                                 "values": formatted_values
                             }
                         }
-                        sse_queue.put(json.dumps(sensor_event_payload))
+                        sse_broker.publish(sensor_event_payload["event"], sensor_event_payload["data"])
 
                     frame_filename = None
                     if should_record_from_payload:
                         if not last_should_record:
                             increment("record_triggers_today")
-                            push_metrics_update()
-
-                        if frame_holder['frame'] is not None and not isinstance(frame_holder['frame'], bytes):
-                            image_dir = os.path.join("Temi_Sensor_Data", "frames")
-                            os.makedirs(image_dir, exist_ok=True)
-                            frame_timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]
-                            frame_filename = f"frame_{frame_timestamp}.jpg"
-                            frame_path = os.path.join(image_dir, frame_filename)
-                            try:
-                                img_to_save = frame_holder['frame'].to_ndarray(format="bgr24")
-                                cv2.imwrite(frame_path, img_to_save)
-                                logger.info(f"Saved frame: {frame_path}")
-                            except Exception as e:
-                                logger.error(f"Error saving frame: {e}")
-                                frame_filename = None
+
+                        snapshot_frame = stream.latest_frame()
+                        if snapshot_frame is not None:
+                            # Conversion and disk write happen on snapshot_writer's pool, not the event loop
+                            frame_filename = snapshot_writer.submit(snapshot_frame)
+                            if frame_filename is None:
+                                logger.warning("Snapshot writer is backed up, frame snapshot dropped")
 
                         latest_sensor_data['frame_filename'] = frame_filename
+                        # Row counters are refreshed by sensor_recorder after each flush
                         record_sensor_data_to_csv(sensor_values, timestamp, x_position, y_position, frame_filename)
-                        update_csv_metrics()
 
                         if x_position is not None and y_position is not None and formatted_values:
-                            classification = smell_classifier.classify_sensor_data(formatted_values)
+                            with classify_time.time():
+                                classification = smell_classifier.classify_sensor_data(formatted_values)
                             logger.info(f"[{timestamp}] DataChannel: Classified smell data: {classification}")
 
                             map_dot_payload = {
@@ -244,7 +338,7 @@ async def create_peer_connection():
                                     'timestamp': timestamp
                                 }
                             }
-                            sse_queue.put(json.dumps(map_dot_payload))
+                            sse_broker.publish(map_dot_payload["event"], map_dot_payload["data"])
 
                     last_should_record = should_record_from_payload
 
@@ -253,9 +347,15 @@ async def create_peer_connection():
             except Exception as e:
                 logger.error(f"Failed to process DataChannel message: {e}")
 
+    @peer.on("connectionstatechange")
+    async def on_connectionstatechange():
+        if peer.connectionState in ("failed", "closed"):
+            logger.info(f"Peer connection for {stream.robot_id} {peer.connectionState}")
+            robots.disconnect(stream)
+            pcs.discard(peer)
+
     pcs.add(peer)
     increment("webrtc_connections")
-    push_metrics_update()
     return peer
 
 
@@ -264,28 +364,8 @@ def format_data(data):
     if (len(data) != 66) or any(not isinstance(x, (int, float)) for x in data):
         return None
 
-    # Define the channel map
-    channel_map = [999, 999, 11, 11, 11, 3, 3, 3, 2, 2, 2, 1, 1, 1, 999, 999,
-                   999, 999, 999, 999, 999, 9, 9, 9, 6, 6, 6, 5, 5, 5, 999, 999,
-                   999, 999, 14, 14, 14, 10, 10, 10, 7, 7, 7, 4, 4, 4, 999, 999,
-                   999, 999, 15, 15, 15, 13, 13, 13, 12, 12, 12, 8, 8, 8, 999, 999,
-                   16, 17]
-
-    # Filter out entries in data where the corresponding channel_map value is 999
-    filtered_data = [x for x, ch in zip(data, channel_map) if ch != 999]
-    num_groups = (len(filtered_data) - 2) // 3  # Calculate number of groups of 3, excluding temp and humidity
-    averaged_data = []
-    # Average every three values together, excluding the last two (temp and humidity)
-    for i in range(num_groups):
-        start = i * 3
-        end = start + 3
-        group_average = sum(filtered_data[start:end]) / 3
-        averaged_data.append(group_average)
-
-    # Add the last two values (temperature and humidity) without averaging
-    averaged_data.append(filtered_data[-2])  # Temperature
-    averaged_data.append(filtered_data[-1])  # Humidity
-    return averaged_data
+    # Drop inactive channels, average each group of three, keep humidity and temperature as-is
+    return row_to_features(data)
 
 
 async def offer(request):
@@ -299,7 +379,10 @@ async def offer(request):
     # --- DEBUG LOGGING END ---
 
     offer = RTCSessionDescription(sdp=original_offer_sdp, type=offer_type)
-    peer = await create_peer_connection()
+    # Robots may name themselves (in the body or ?robot_id=); unnamed ones get temi, temi-2, ...
+    stream = robots.connect(params.get("robot_id") or request.query.get("robot_id"))
+    logger.info(f"Offer is for robot {stream.robot_id}")
+    peer = await create_peer_connection(stream)
     await peer.setRemoteDescription(offer)
     answer = await peer.createAnswer()
     await peer.setLocalDescription(answer)
@@ -310,36 +393,104 @@ async def offer(request):
 
     # REPORT: increment every api call
     increment("http_api_calls")
-    push_metrics_update()
 
     return web.json_response({
         "sdp": peer.localDescription.sdp,
-        "type": peer.localDescription.type
+        "type": peer.localDescription.type,
+        "robot_id": stream.robot_id
     })
 
 
 app.router.add_post("/offer", offer)
+
+# The dashboard (port 8133) calls /viewer-offer across origins
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "POST, OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type",
+}
+# robot id -> AnnotatedFeedTrack relayed to every WebRTC viewer of that robot; stopped when the last one leaves
+annotated_tracks = {}
+
+
+async def viewer_offer(request):
+    """
+    WebRTC alternative to /video_feed: answers a dashboard's offer with a send-only video track of
+    the robot's annotated feed. Body: {"sdp", "type", optional "robot_id"} (or ?robot_id=).
+    """
+    increment("http_api_calls")
+    try:
+        params = await request.json()
+        sdp, sdp_type = params["sdp"], params["type"]
+    except (json.JSONDecodeError, KeyError, TypeError):
+        return web.json_response({"status": "invalid offer", "error": "expected JSON with sdp and type"},
+                                 status=400, headers=CORS_HEADERS)
+    robot_id = params.get("robot_id") or request.query.get("robot_id")
+    stream = robots.primary() if robot_id is None else robots.get(robot_id)
+    if stream is None:
+        return web.json_response({"status": "unknown robot", "robot_id": robot_id}, status=404, headers=CORS_HEADERS)
+    start_analysis_worker(stream)
+
+    track = annotated_tracks.get(stream.robot_id)
+    if track is None:
+        track = annotated_tracks[stream.robot_id] = AnnotatedFeedTrack(stream)
+    peer = RTCPeerConnection()
+    pcs.add(peer)
+    stream.webrtc_viewers += 1
+    logger.info(f"WebRTC viewer connected to {stream.robot_id} ({stream.webrtc_viewers} watching)")
+
+    @peer.on("connectionstatechange")
+    async def on_connectionstatechange():
+        if peer.connectionState in ("failed", "closed") and peer in pcs:
+            pcs.discard(peer)
+            stream.webrtc_viewers -= 1
+            logger.info(f"WebRTC viewer of {stream.robot_id} {peer.connectionState} ({stream.webrtc_viewers} watching)")
+            if stream.webrtc_viewers == 0 and annotated_tracks.get(stream.robot_id) is track:
+                del annotated_tracks[stream.robot_id]
+                track.stop()
+            await peer.close()
+
+    try:
+        await peer.setRemoteDescription(RTCSessionDescription(sdp=sdp, type=sdp_type))
+        # Unbuffered: a viewer that cannot keep up skips to the newest frame instead of falling behind
+        peer.addTrack(relay.subscribe(track, buffered=False))
+        answer = await peer.createAnswer()
+        await peer.setLocalDescription(answer)
+    except Exception:
+        await peer.close()  # its "closed" state releases the viewer
+        raise
+    return web.json_response({
+        "sdp": peer.localDescription.sdp,
+        "type": peer.localDescription.type,
+        "robot_id": stream.robot_id
+    }, headers=CORS_HEADERS)
+
+
+async def viewer_offer_preflight(request):
+    return web.Response(headers=CORS_HEADERS)
+
+
+app.router.add_post("/viewer-offer", viewer_offer)
+app.router.add_route("OPTIONS", "/viewer-offer", viewer_offer_preflight)
 # -------- Flask video feed server ----------
 flask_app = Flask(__name__)
 
 
 # CORS(flask_app)  # <-- Enable CORS for all routes
 
+def get_stream_status(stream):
+    if stream.last_pts is not None and stream.freeze_detected_time and (
+            stream.duplicate_frame_count > duplicate_threshold or
+            time.time() - stream.freeze_detected_time > freeze_threshold):
+        return "Frozen"
+    return "Live"
+
+
 @flask_app.route('/')
 def index():
-    frame = frame_holder.get('frame', offline_bytes)
-    current_time = time.time()
-    if isinstance(frame, bytes):
-        stream_status = "Offline"
-    else:
-        if last_pts is None:
-            stream_status = "Live"
-        elif freeze_detected_time and (duplicate_frame_count > duplicate_threshold or
-                                       current_time - freeze_detected_time > freeze_threshold):
-            stream_status = "Frozen"
-        else:
-            stream_status = "Live"
-    return render_template('index.html', stream_status=stream_status, last_frame_time=last_frame_time)
+    stream = robots.primary()
+    return render_template('index.html', stream_status=get_stream_status(stream),
+                           last_frame_time=stream.last_frame_time)
 
 
 @flask_app.route('/set-vision-mode', methods=['POST'])
@@ -365,92 +516,90 @@ def set_vision_mode():
 # --- SSE CHANGE: Create the new streaming endpoint ---
 @flask_app.route('/stream-updates')
 def stream_updates():
+    # EventSource sends Last-Event-ID on its own reconnects; our manual reconnect passes it as a query arg
+    last_event_id = parse_last_event_id(
+        request.headers.get('Last-Event-ID', request.args.get('lastEventId')))
+    subscription = sse_broker.subscribe(last_event_id)
+
     def event_stream():
-        while True:
-            # Block until a message is available
-            message = sse_queue.get()
-            # The message should be a JSON string with 'event' and 'data' keys
-            # We need to parse it to format the SSE message correctly
-            try:
-                payload = json.loads(message)
-                event_type = payload.get('event', 'message')
-                event_data = json.dumps(payload.get('data'))
-                yield f"event: {event_type}\ndata: {event_data}\n\n"
-            except (json.JSONDecodeError, TypeError):
-                logger.error(f"Could not format SSE message from queue item: {message}")
+        try:
+            while True:
+                messages = subscription.get(timeout=sse_keepalive_interval)
+                if not messages:
+                    # Comment line keeps proxies from timing out and surfaces dead connections
+                    yield ": keepalive\n\n"
+                for message in messages:
+                    yield message.format()
+        finally:
+            subscription.close()
 
     return Response(event_stream(), mimetype='text/event-stream')
 
 
 @flask_app.route('/status')
 def get_status():
-    frame = frame_holder.get('frame', offline_bytes)
-    current_time = time.time()
-    if isinstance(frame, bytes):
-        stream_status = "Offline"
-    else:
-        if last_pts is None:
-            stream_status = "Live"
-        elif freeze_detected_time and (duplicate_frame_count > duplicate_threshold or
-                                       current_time - freeze_detected_time > freeze_threshold):
-            stream_status = "Frozen"
-        else:
-            stream_status = "Live"
+    stream = robots.primary()
 
     # REPORT: increment every api call
     increment("http_api_calls")
 
-    return jsonify({'stream_status': stream_status, 'last_frame_time': last_frame_time})
+    return jsonify({'stream_status': get_stream_status(stream), 'last_frame_time': stream.last_frame_time})
+
+
+@flask_app.route('/robots')
+def get_robots():
+    return jsonify([{**stream.stats(), 'stream_status': get_stream_status(stream)}
+                    for stream in robots.streams()])
 
 
 @flask_app.route('/video_feed')
-def video_feed():
+@flask_app.route('/video_feed/<robot_id>')
+def video_feed(robot_id=None):
     # REPORT: increment every api call
     increment("http_api_calls")
 
-    return Response(gen_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    stream = robots.primary() if robot_id is None else robots.get(robot_id)
+    if stream is None:
+        return jsonify({"status": "unknown robot", "robot_id": robot_id}), 404
+    start_analysis_worker(stream)
+    # Optional ?w=<width>&q=<JPEG quality> for low-bandwidth viewers, e.g. /video_feed?w=320&q=60
+    width = request.args.get('w', type=int)
+    quality = request.args.get('q', type=int)
+    return Response(gen_frames(stream, width, quality), mimetype='multipart/x-mixed-replace; boundary=frame')
 
 
 # Global variable to hold latest sensor data
 latest_sensor_data = {"data": None, "timestamp": None, "should_record": False, "current_position": None,
                       "frame_filename": None}
 
-video_writer = None
-recording = False
-record_lock = threading.Lock()
-
 
 @flask_app.route('/start-recording', methods=['POST'])
 def start_recording():
-    global video_writer, recording
-
-    with record_lock:
-        if recording:
-            return jsonify({'status': 'already recording'}), 200
-
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"Temi_VODs/recorded_video_{timestamp}.mp4"
-        video_writer = cv2.VideoWriter(filename, fourcc, 12.0, (640, 480))  # changed to 12 fps
-        recording = True
+    # Optional ?mode=annotated|raw|passthrough (or {"mode": ...}) overrides TEMI_RECORDING_MODE
+    mode = request.args.get('mode') or (request.get_json(silent=True) or {}).get('mode') or recording_mode
+    if mode not in RECORDING_MODES + ('passthrough',):
+        return jsonify({'status': f"unknown recording mode '{mode}'"}), 400
+    if video_recorder.recording or packet_recorder.recording:
+        return jsonify({'status': 'already recording',
+                        'mode': 'passthrough' if packet_recorder.recording else video_recorder.mode}), 200
+    if mode == 'passthrough':
+        packet_recorder.start()
+    else:
+        video_recorder.start(mode)
 
     # REPORT: increment every api call
     increment("http_api_calls")
 
-    return jsonify({'status': 'recording started', 'filename': filename}), 200
+    return jsonify({'status': 'recording started', 'mode': mode,
+                    'segment_seconds': recording_segment_seconds}), 200
 
 
 @flask_app.route('/stop-recording', methods=['POST'])
 def stop_recording():
-    global video_writer, recording
-
-    with record_lock:
-        if not recording:
-            return jsonify({'status': 'not recording'}), 200
-
-        recording = False
-        video_writer.release()
-        video_writer = None
+    stopped = video_recorder.stop()
+    stopped = packet_recorder.stop() or stopped
+    if not stopped:
+        return jsonify({'status': 'not recording'}), 200
 
     # REPORT: increment every api call
     increment("http_api_calls")
@@ -459,31 +608,44 @@ def stop_recording():
 
 
 # === MANUAL TRIGGER ROUTE ===
-# ---MODIFIED---
-@flask_app.route("/send-report-now", methods=["GET"])
+@flask_app.route("/send-report-now", methods=["GET", "POST"])
 def trigger_report():
-    # `skip_save` is now `save_file`. If the param is "true", we want to save.
+    """Queues a report job and returns at once; poll /report-jobs/<job_id> for the outcome."""
+    # `save` controls whether the t-SNE image is also written to disk; `date` defaults to today
     save = request.args.get("save", "false").lower() == "true"
-    print(f"🚀 Running t-SNE visualization for report (save_file={save})...")
+    date_arg = request.args.get("date")
+    try:
+        date = datetime.strptime(date_arg, "%Y-%m-%d").date() if date_arg else None
+    except ValueError:
+        return jsonify({"status": "failed", "reason": "date must be YYYY-MM-DD"}), 400
 
-    # The new function returns a dict with the image and metadata
-    data = generate_tsne_visualization(save_file=save)
+    job = report_queue.submit(date=date, save_file=save)
+    print(f"🚀 Report job {job.id} queued for {job.date} (save_file={save})")
 
-    if data is None:
-        return jsonify({"status": "failed", "reason": "Could not generate visualization."})
+    increment("http_api_calls")
 
-    print("📧 Sending report email...")
-    # Pass the in-memory data directly to the report sender
-    success = send_email_report(report_data=data)
+    response = job.to_dict()
+    response["status_url"] = f"/report-jobs/{job.id}"
+    return jsonify(response), 202
 
-    increment("http_api_calls")
 
-    return jsonify({"status": "sent" if success else "failed"})
+@flask_app.route("/report-jobs/<job_id>", methods=["GET"])
+def get_report_job(job_id):
+    job = report_queue.get(job_id)
+    if job is None:
+        return jsonify({"status": "not found", "job_id": job_id}), 404
+    return jsonify(job.to_dict())
 
 
 @flask_app.route('/metrics', methods=['GET'])
 def get_metrics():
-    return jsonify(metrics)
+    """JSON by default; Prometheus text exposition with ?format=prometheus."""
+    snapshot = metrics.snapshot()
+    stats = {**snapshot_writer.stats(), **analysis_scheduler.stats(), **video_recorder.stats(),
+             **packet_recorder.stats(), **fall_clips.stats()}
+    if request.args.get('format') == 'prometheus':
+        return Response(exposition(snapshot, extra=stats), content_type='text/plain; version=0.0.4; charset=utf-8')
+    return jsonify({**snapshot.flat(), **stats})
 
 
 # ===============================================
@@ -546,31 +708,31 @@ def debug_stream():
     return Response(event_stream(), mimetype='text/event-stream')
 
 
-def gen_frames():
-    global last_pts, freeze_detected_time, duplicate_frame_count, last_frame_time, video_writer, recording
-
+def render_loop(stream):
+    """
+    Render thread for one robot: publishes every new camera frame to that robot's /video_feed
+    subscribers at full rate, laid over with the latest overlays from inference_loop, and tracks
+    the stream's live/frozen/offline state.
+    """
     last_state = None
     last_state_change_time = time.time()
-    last_person_count = 0
-    last_person_increment_time = 0
-    fall_cooldown = .5
-    person_cooldown = .5
-    fall_persistence_time = 1.0
-
-    prev_falls = {"box": False, "pose": False, "bottom": False, "full": False}
-    last_fall_times = {"box": 0, "pose": 0, "bottom": 0, "full": 0}
-    last_seen_fallen = {"box": 0, "pose": 0, "bottom": 0, "full": 0}
+    current = offline_frame
+    published = None
+    pipeline = FramePipeline(decode_time=decode_time, conversions=stream.conversions)
+    no_overlays = OverlayLayers((0, 0), ())
+    seq = 0
 
     while True:
-        time.sleep(0.02)
-        frame = frame_holder.get('frame', offline_bytes)
+        # Wakes as soon as a frame arrives; the 20 ms timeout keeps the freeze detection ticking
+        seq, entry = stream.raw_frames.wait(seq, timeout=0.02)
+        frame, received_at = entry if entry is not None else (None, None)
 
         current_state = "live"
         if isinstance(frame, bytes) or frame is None:
             current_state = "frozen"
-        elif freeze_detected_time and (
-                duplicate_frame_count > duplicate_threshold or
-                time.time() - freeze_detected_time > freeze_threshold):
+        elif stream.freeze_detected_time and (
+                stream.duplicate_frame_count > duplicate_threshold or
+                time.time() - stream.freeze_detected_time > freeze_threshold):
             current_state = "offline"
 
         if current_state != last_state:
@@ -579,7 +741,6 @@ def gen_frames():
                 add_time(f"stream_{last_state}_seconds", elapsed)
             if current_state in ["frozen", "offline"]:
                 increment(f"stream_{current_state}_count")
-                push_metrics_update()
             last_state = current_state
             last_state_change_time = time.time()
         else:
@@ -589,179 +750,294 @@ def gen_frames():
                 last_state_change_time = time.time()
 
         if isinstance(frame, bytes):
-            frame_bytes = frame
-            if last_pts is not None:
+            current = offline_frame
+            if stream.last_pts is not None:
                 logger.info("Stream switched to offline, yielding placeholder")
         elif frame is None:
-            frame_bytes = offline_bytes
+            current = offline_frame
         else:
-            if last_pts is None or frame.pts != last_pts:
-                last_pts = frame.pts
-                last_frame_time = datetime.now().strftime('%H:%M:%S')
-                freeze_detected_time = None
-                duplicate_frame_count = 0
-                img = frame.to_ndarray(format="bgr24")
+            if stream.last_pts is None or frame.pts != stream.last_pts:
+                stream.last_pts = frame.pts
+                stream.last_frame_time = datetime.now().strftime('%H:%M:%S')
+                stream.freeze_detected_time = None
+                stream.duplicate_frame_count = 0
+                # Converted lazily, once per PTS and only at the size the current view needs
+                pipeline.update(frame)
+                overlay_age = None
 
                 if vision_mode['glasses']:
-                    grid_img = fall_detector.draw_glasses_mustache(cv2.resize(img.copy(), (640, 480)))
+                    # Face keypoints come from inference_loop, which analyzes the display view in this mode
+                    grid_img = pipeline.display_canvas()
+                    if stream.latest_glasses is not None:
+                        fall_detector.draw_glasses_mustache(grid_img, stream.latest_glasses)
                     if time.time() - vision_mode['last_toggle'] > 30:
                         vision_mode['glasses'] = False
                 elif vision_mode['fullscreen']:
-                    grid_img = cv2.resize(img.copy(), (640, 480))
+                    grid_img = pipeline.display_view()
                     if time.time() - vision_mode['last_toggle'] > 60:
                         vision_mode['fullscreen'] = False
                 else:
-                    height, width = img.shape[:2]
-                    half_w, half_h = width // 2, height // 2
-
-                    box_img, box_fallen, person_count, unique_fallers = fall_detector.test_process_frame_box(
-                        cv2.resize(img.copy(), (half_w, half_h)))
-                    pose_img, pose_fallen = fall_detector.test_process_frame_pose_fall(
-                        cv2.resize(img.copy(), (half_w, half_h)))
-                    bottom_img, bottom_fallen = fall_detector.bottom_frac_fall_detection(
-                        cv2.resize(img.copy(), (half_w, half_h)))
-                    combined_img, combined_fallen = fall_detector.combined_frame(
-                        cv2.resize(img.copy(), (half_w, half_h)))
-
-                    now = time.time()
-                    if person_count > last_person_count and now - last_person_increment_time > person_cooldown:
-                        increment("people_detected_today")
-                        last_person_increment_time = now
-                        push_metrics_update()
-                    last_person_count = person_count
-
-                    if box_fallen and now - last_fall_times["box"] > fall_cooldown:
-                        increment("falls_box")
-                        last_fall_times["box"] = now
-                        push_metrics_update()
-                    if pose_fallen and not prev_falls["pose"] and now - last_fall_times["pose"] > fall_cooldown:
-                        increment("falls_pose")
-                        last_fall_times["pose"] = now
-                        push_metrics_update()
-                    if bottom_fallen and not prev_falls["bottom"] and now - last_fall_times["bottom"] > fall_cooldown:
-                        increment("falls_bottom")
-                        last_fall_times["bottom"] = now
-                        push_metrics_update()
-                    if combined_fallen and not prev_falls["full"] and now - last_fall_times["full"] > fall_cooldown:
-                        increment("falls_full")
-                        last_fall_times["full"] = now
-                        push_metrics_update()
-
-                    prev_falls["box"] = box_fallen
-                    prev_falls["pose"] = pose_fallen
-                    prev_falls["bottom"] = bottom_fallen
-                    prev_falls["full"] = combined_fallen
-
-                    top_row = np.hstack((box_img, pose_img))
-                    bottom_row = np.hstack((bottom_img, combined_img))
-                    grid_img = np.vstack((top_row, bottom_row))
+                    # Raw frame in every quadrant with the most recent overlays laid on top
+                    overlays = stream.latest_overlays or no_overlays
+                    if overlays.received_at is not None:
+                        overlay_age = received_at - overlays.received_at
+                    grid_img, (box_q, pose_q, bottom_q, combined_q) = pipeline.grid()
+                    pipeline.analysis_view()  # decoded outside the compose span
+                    with overlay_compose_time.time():
+                        box_img = overlays.apply("box", pipeline.overlay_canvas(box_q))
+                        pose_img = overlays.apply("pose", pipeline.overlay_canvas(pose_q))
+                        bottom_img = overlays.apply("bottom", pipeline.overlay_canvas(bottom_q))
+                        fall_detector.combine_overlays(
+                            box_img, pose_img, bottom_img, overlays.flags.get("box", False),
+                            overlays.flags.get("pose", False), overlays.flags.get("bottom", False), out=combined_q)
 
                 increment("frames_processed")
-                push_metrics_update()
 
-                if recording and video_writer is not None:
-                    resized_frame = cv2.resize(grid_img, (640, 480))
-                    video_writer.write(resized_frame)
+                # Recordings are of the primary robot's feed; the recorder thread does the encoding
+                if video_recorder.recording and stream.robot_id == DEFAULT_ROBOT_ID:
+                    video_recorder.submit(frame if video_recorder.mode == "raw" else grid_img,
+                                          frame.time if frame.pts is not None else received_at)
 
-                ret, buffer = cv2.imencode('.jpg', grid_img)
+                with encode_time.time():
+                    ret, buffer = cv2.imencode('.jpg', grid_img)
                 frame_bytes = buffer.tobytes()
+                current = EncodedFrame(frame_bytes)
+                # grid_img is reused for the next frame, so WebRTC viewers get a copy, made only while they watch
+                if stream.video_frames.subscribers:
+                    stream.video_frames.publish((grid_img.copy(), received_at))
+                fall_clips.add_frame(stream.robot_id, received_at, frame_bytes, (grid_img.shape[1], grid_img.shape[0]))
+                stream.frames_rendered += 1
+                analysis_scheduler.rendered_frame(time.monotonic() - received_at, overlay_age)
             else:
-                if freeze_detected_time is None:
-                    freeze_detected_time = time.time()
-                elif duplicate_frame_count > duplicate_threshold or time.time() - freeze_detected_time > freeze_threshold:
-                    frame_bytes = offline_bytes
+                if stream.freeze_detected_time is None:
+                    stream.freeze_detected_time = time.time()
+                elif stream.duplicate_frame_count > duplicate_threshold or time.time() - stream.freeze_detected_time > freeze_threshold:
+                    current = offline_frame
                     logger.info(
-                        f"Stream frozen, switching to placeholder after {duplicate_frame_count} duplicates, time elapsed={time.time() - freeze_detected_time:.2f}s")
+                        f"Stream {stream.robot_id} frozen, switching to placeholder after {stream.duplicate_frame_count} duplicates, time elapsed={time.time() - stream.freeze_detected_time:.2f}s")
                 else:
-                    duplicate_frame_count += 1
-                    if duplicate_frame_count == duplicate_threshold:
-                        logger.warning(f"Duplicate frames detected, count={duplicate_frame_count}")
+                    stream.duplicate_frame_count += 1
+                    if stream.duplicate_frame_count == duplicate_threshold:
+                        logger.warning(f"Duplicate frames detected on {stream.robot_id}, count={stream.duplicate_frame_count}")
+
+        # Only wake subscribers when there is something new to show
+        if current is not published:
+            stream.frame_broadcaster.publish(current)
+            published = current
+            if current.idle and offline_video_image is not None:
+                stream.video_frames.publish((offline_video_image, time.monotonic()))
+
+
+def inference_loop():
+    """
+    Inference thread shared by all robots: whenever analysis_scheduler allows, gathers the newest
+    unanalyzed frame of every robot (skipping frames that arrived meanwhile), runs them through
+    the pose model as one batch and hands each robot's overlays to its render_loop.
+    """
+    person_cooldown = .5
+    pipelines = {}
 
-        yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+    while True:
+        delay = analysis_scheduler.delay()
+        if delay > 0:
+            time.sleep(delay)
+
+        robots.frame_ready.wait(timeout=1.0)
+        robots.frame_ready.clear()
+        batch = []
+        for stream in robots.streams():
+            taken = stream.take_new_frame()
+            if taken is not None:
+                batch.append((stream,) + taken)
+        if not batch or vision_mode['fullscreen']:
+            continue  # Nothing new, or no grid to draw overlays on
+        # Glasses mode draws on the display view, so its keypoints must come from that view
+        glasses = vision_mode['glasses']
+
+        analysis_scheduler.start(sum(skipped for _, _, _, skipped in batch))
+        started = time.perf_counter()
+
+        # One forward pass per round for all robots, each on a read-only view of its frame
+        views = []
+        for stream, frame, _, _ in batch:
+            pipeline = pipelines.get(stream.robot_id)
+            if pipeline is None:
+                # Shares the stream's conversions, so a frame render_loop already converted is reused
+                pipeline = pipelines[stream.robot_id] = FramePipeline(decode_time=decode_time,
+                                                                      conversions=stream.conversions)
+            pipeline.update(frame)
+            views.append(pipeline.display_view() if glasses else pipeline.analysis_view())
+        with inference_time.time():
+            analyses = fall_detector.analyze_batch(views)
+
+        if glasses:
+            latencies = []
+            for (stream, _, received_at, _), analysis in zip(batch, analyses):
+                stream.latest_glasses = analysis
+                latencies.append(time.monotonic() - received_at)
+                stream.frames_analyzed += 1
+            analysis_scheduler.finish(time.perf_counter() - started, max(latencies), frames=len(batch))
+            continue
+
+        latencies = []
+        for (stream, frame, received_at, _), analysis in zip(batch, analyses):
+            stream.latest_glasses = None  # not drawn over frames once glasses mode is back on
+            # Each view's overlay is drawn once on a blank layer that render_loop lays over every
+            # frame of this robot until its next analysis
+            with overlay_draw_time.time():
+                overlays = OverlayLayers(analysis.shape, ("box", "pose", "bottom"), frame.pts, received_at)
+                _, _, person_count, _ = fall_detector.test_process_frame_box(
+                    overlays.images["box"], analysis, track=False)
+                _, pose_fallen = fall_detector.test_process_frame_pose_fall(overlays.images["pose"], analysis)
+                _, bottom_fallen = fall_detector.bottom_frac_fall_detection(overlays.images["bottom"], analysis)
+                box_fallen = bool(fall_detector.box_falls(analysis).any())
+                overlays.flags = {"box": box_fallen, "pose": pose_fallen, "bottom": bottom_fallen}
+            stream.latest_overlays = overlays.seal()
+
+            latency = time.monotonic() - received_at
+            latencies.append(latency)
+            stream.frames_analyzed += 1
+            stream.analysis_latency_ms = latency * 1000
+            # Fall events come from the robot's tracker: one per person, per method, per fall
+            fall_events = fall_detector.track_falls(analysis, stream.fall_tracker)
+            record_detections(stream, person_count, fall_events, person_cooldown)
+            fall_clips.trigger(stream.robot_id, [method for method, ids in fall_events.items() if ids], received_at)
+
+        analysis_scheduler.finish(time.perf_counter() - started, max(latencies), frames=len(batch))
+
+
+def record_detections(stream, person_count, fall_events, person_cooldown):
+    """
+    Counts new people and confirmed falls seen by one robot into the shared daily metrics.
+
+    :param fall_events: {method: track ids} from FallDetector.track_falls; each id is one new fall.
+    """
+    now = time.time()
+    if person_count > stream.last_person_count and now - stream.last_person_increment_time > person_cooldown:
+        increment("people_detected_today")
+        stream.last_person_increment_time = now
+    stream.last_person_count = person_count
+
+    for method, track_ids in fall_events.items():
+        if track_ids:
+            increment(f"falls_{method}", len(track_ids))
+
+
+def load_fall_detector():
+    global fall_detector
+    with fall_detector_lock:
+        if fall_detector is None:
+            # Imported here so that only the analysis worker loads torch/ultralytics
+            from yolo_fall_detection import FallDetector
+            fall_detector = FallDetector(backend=os.getenv("TEMI_YOLO_BACKEND", "torch"),
+                                         int8=os.getenv("TEMI_YOLO_INT8", "false").lower() == "true")
+    return fall_detector
+
+
+def run_worker(loop, *args):
+    """Runs `loop(*args)` on the current thread, restarting it if it crashes."""
+    load_fall_detector()
+    while True:
+        try:
+            loop(*args)
+        except Exception as e:
+            logger.error(f"{threading.current_thread().name} crashed, restarting: {e}", exc_info=True)
+            time.sleep(1)
 
 
-import csv
-import os
-from datetime import datetime
+def start_analysis_worker(stream=None):
+    """Starts the shared inference thread and the render thread of `stream` (idempotent)."""
+    global inference_thread
+    stream = stream or robots.primary()
+    with analysis_thread_lock:
+        if stream.render_thread is None or not stream.render_thread.is_alive():
+            stream.render_thread = threading.Thread(target=run_worker, args=(render_loop, stream),
+                                                    name=f"render-{stream.robot_id}", daemon=True)
+            stream.render_thread.start()
+        if inference_thread is None or not inference_thread.is_alive():
+            inference_thread = threading.Thread(target=run_worker, args=(inference_loop,),
+                                                name="inference-worker", daemon=True)
+            inference_thread.start()
+
+
+def gen_frames(stream, width=None, quality=None):
+    """
+    MJPEG generator for one /video_feed client; re-sends the latest frame as a keepalive when idle.
+
+    :param width: Scale frames down to this width, or None for full size.
+    :param quality: JPEG quality (10-95), or None for the render thread's default.
+    """
+    broadcaster = stream.frame_broadcaster
+    broadcaster.subscribe()
+    try:
+        seq, frame = broadcaster.latest()
+        while True:
+            if frame is not None:
+                # Each variant of a frame is encoded once, by whichever client asks for it first
+                jpeg, encoded = frame.variant(width, quality)
+                (jpeg_cache_misses if encoded else jpeg_cache_hits).inc()
+                yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+            idle = frame is None or frame.idle
+            seq, frame = broadcaster.wait(seq, timeout=mjpeg_idle_interval if idle else mjpeg_keepalive_interval)
+    finally:
+        broadcaster.unsubscribe()
 
 
 def record_sensor_data_to_csv(sensor_data, timestamp, x_position=None, y_position=None, frame_filename=None):
-    """Record sensor data to a master CSV file for long-term accumulation"""
+    """Queue sensor data for the master CSV file; sensor_recorder writes it in batches off the event loop."""
     if not sensor_data:
         return
 
-    # Create directory if it doesn't exist
-    csv_dir = "Temi_Sensor_Data"
-    os.makedirs(csv_dir, exist_ok=True)
-
-    # Master file path
-    csv_path = os.path.join(csv_dir, "sensor_data_master.csv")
-
-    # Check if file exists to determine if we need to write headers
-    file_exists = os.path.isfile(csv_path)
-
-    with open(csv_path, 'a', newline='') as csvfile:
-        if isinstance(sensor_data, list):
-            if len(sensor_data) != 66:
-                logger.warning(f"Invalid sensor data length: {len(sensor_data)} (expected 66). Data not saved.")
-                return  # Skip saving invalid data
-
-            writer = csv.writer(csvfile)
-
-            if not file_exists:
-                writer.writerow(
-                    ['timestamp'] + [f'value_{i}' for i in range(66)] + ['x_position', 'y_position', 'frame_filename'])
-
-            writer.writerow([timestamp] + sensor_data + [x_position, y_position, frame_filename])
-
-            # increment("new_csv_rows_today")
-            update_csv_metrics()
+    if isinstance(sensor_data, list):
+        if len(sensor_data) != 66:
+            logger.warning(f"Invalid sensor data length: {len(sensor_data)} (expected 66). Data not saved.")
+            return  # Skip saving invalid data
+        values = sensor_data
 
-        elif isinstance(sensor_data, dict):
-            if len(sensor_data) != 66:
-                logger.warning(f"Invalid sensor data length (dict): {len(sensor_data)} (expected 66). Data not saved.")
-                return  # Skip saving invalid data
+    elif isinstance(sensor_data, dict):
+        if len(sensor_data) != 66:
+            logger.warning(f"Invalid sensor data length (dict): {len(sensor_data)} (expected 66). Data not saved.")
+            return  # Skip saving invalid data
+        values = list(sensor_data.values())
 
-            fieldnames = ['timestamp'] + list(sensor_data.keys()) + ['x_position', 'y_position', 'frame_filename']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
-            if not file_exists:
-                writer.writeheader()
-
-            row_data = sensor_data.copy()
-            row_data['timestamp'] = timestamp
-            row_data['x_position'] = x_position
-            row_data['y_position'] = y_position
-            row_data['frame_filename'] = frame_filename
-            writer.writerow(row_data)
+    else:
+        logger.warning(f"Unexpected sensor data format: {type(sensor_data)}. Data not saved.")
+        return
 
-            # increment("new_csv_rows_today")
-            update_csv_metrics()
+    if any(not isinstance(x, (int, float)) for x in values):
+        logger.warning("Non-numeric sensor values. Data not saved.")
+        return
 
-        else:
-            logger.warning(f"Unexpected sensor data format: {type(sensor_data)}. Data not saved.")
+    sensor_recorder.record([timestamp] + values + [x_position, y_position, frame_filename])
 
 
 def trigger_daily_map_clear():
-    """Puts a clear map event onto the SSE queue for all clients."""
+    """Publishes a clear map event to all SSE clients."""
     clear_event_payload = {
         "event": "clear_map_dots",
         "data": {"message": "Clearing dots for the new day."}
     }
-    sse_queue.put(json.dumps(clear_event_payload))
+    sse_broker.publish(clear_event_payload["event"], clear_event_payload["data"])
     logger.info("Triggered daily map clear event for all clients.")
 
 
 # -------- Main Execution ----------
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG)
+    init()
+
     flask_thread = threading.Thread(
         target=lambda: flask_app.run(host='0.0.0.0', port=8133, debug=False, use_reloader=False, threaded=True),
         daemon=True
     )
     flask_thread.start()
 
+    # Frames are analyzed in the background whether or not a dashboard is open
+    start_analysis_worker()
+
     # Initial metrics update on startup
     update_csv_metrics()
+    threading.Thread(target=publish_metrics_loop, name="metrics-publisher", daemon=True).start()
 
 
     # CHANGE: Consolidate all scheduled tasks into one background thread
@@ -1,64 +1,120 @@
+import hashlib
+import os
+import threading
+import time
+import joblib
+import numpy as np
 import pandas as pd
-from sklearn.neighbors import KNeighborsClassifier
+from sklearn.neighbors import KDTree
+from sensor_features import FEATURE_NAMES, NUM_RAW_VALUES, raw_to_features
+
+
+MODEL_CACHE_DIR = "model_cache"
+# Bump whenever the artifact layout or feature processing changes so stale artifacts are rebuilt
+ARTIFACT_VERSION = 3
 
 
 class SmellClassifier:
-    def __init__(self, dataset_path='Temi_Sensor_Data/newSensor_training.csv'):
+    def __init__(self, dataset_path='Temi_Sensor_Data/newSensor_training.csv', cache_dir=MODEL_CACHE_DIR):
+        """
+        The fitted model is loaded lazily on first use, from a cached artifact keyed by a hash of
+        the training CSV; it is only refitted when the CSV (or ARTIFACT_VERSION) changes.
+
+        :param dataset_path: Training CSV with 66 raw channels and a 'class' column.
+        :param cache_dir: Directory holding the serialized model artifacts.
+        """
+        self.dataset_path = dataset_path
+        self.cache_dir = cache_dir
+        self.n_neighbors = 3
+        self.index = None
+        self.classes = None
+        self.labels = None
+        self.feature_names = None
+        self.scaler = None
+        self._load_lock = threading.Lock()
+        self._sample_lock = threading.Lock()
+
+    def ensure_model(self):
+        """Loads the cached model artifact, or fits and caches a new one if the training CSV changed."""
+        if self.index is not None:
+            return
+        with self._load_lock:
+            if self.index is not None:
+                return
+            training_hash = self._training_hash()
+            artifact_path = os.path.join(self.cache_dir, f"smell_knn_v{ARTIFACT_VERSION}_{training_hash[:16]}.joblib")
+
+            artifact = None
+            if os.path.exists(artifact_path):
+                try:
+                    artifact = joblib.load(artifact_path)
+                    if artifact.get("version") != ARTIFACT_VERSION or artifact.get("training_sha256") != training_hash:
+                        artifact = None
+                except Exception as e:
+                    print(f"⚠️ Ignoring unreadable smell model artifact {artifact_path}: {e}")
+                    artifact = None
+
+            if artifact is None:
+                artifact = self._fit_artifact(training_hash)
+                self._save_artifact(artifact, artifact_path)
+
+            self.feature_names = artifact["feature_names"]
+            self.scaler = artifact["scaler"]
+            self.n_neighbors = artifact["n_neighbors"]
+            self.classes = artifact["classes"]
+            self.labels = artifact["labels"]
+            # Reused by the single-sample path in classify_sensor_data
+            self._sample = np.empty((1, len(self.feature_names)), dtype=np.float64)
+            self.index = artifact["index"]
+
+    def _training_hash(self):
+        digest = hashlib.sha256()
+        with open(self.dataset_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _fit_artifact(self, training_hash):
         # Load the dataset
-        dataset = pd.read_csv(dataset_path)
-        self.dataset = self.process_dataframe(dataset)
+        dataset = self.process_dataframe(pd.read_csv(self.dataset_path))
         # Separate features and target
-        X = self.dataset.drop('class', axis=1)
-        y = self.dataset['class']
-        # Initialize and train the KNN classifier
-        self.knn = KNeighborsClassifier(n_neighbors=3)
-        self.knn.fit(X, y)
-        # Store the feature names used during training
-        self.feature_names = X.columns.tolist()
-
-    channel_map = [999, 999, 11, 11, 11, 3, 3, 3, 2, 2, 2, 1, 1, 1, 999, 999,
-                   999, 999, 999, 999, 999, 9, 9, 9, 6, 6, 6, 5, 5, 5, 999, 999,
-                   999, 999, 14, 14, 14, 10, 10, 10, 7, 7, 7, 4, 4, 4, 999, 999,
-                   999, 999, 15, 15, 15, 13, 13, 13, 12, 12, 12, 8, 8, 8, 999, 999,
-                   16, 17, 0]
+        X = dataset.drop('class', axis=1)
+        y = dataset['class']
+        # The KNN "model" is the KD-tree over the training points plus their encoded labels
+        classes, labels = np.unique(y.to_numpy(), return_inverse=True)
+        return {
+            "version": ARTIFACT_VERSION,
+            "training_sha256": training_hash,
+            "training_path": self.dataset_path,
+            "feature_names": X.columns.tolist(),
+            "scaler": None,
+            "n_neighbors": 3,
+            "classes": classes,
+            "labels": labels,
+            "index": KDTree(X.to_numpy(dtype=np.float64)),
+        }
+
+    def _save_artifact(self, artifact, artifact_path):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Drop artifacts built from older versions of the training data
+            for name in os.listdir(self.cache_dir):
+                if name.startswith("smell_knn_") and name.endswith(".joblib"):
+                    os.remove(os.path.join(self.cache_dir, name))
+            tmp_path = artifact_path + ".tmp"
+            joblib.dump(artifact, tmp_path)
+            os.replace(tmp_path, artifact_path)
+        except OSError as e:
+            print(f"⚠️ Could not cache smell model artifact: {e}")
 
     def process_dataframe(self, df):
-        # Drop channels that are not active
-        drop_list = []
-        for idx, x in enumerate(self.channel_map):
-            if x == 999 and idx < len(df.columns):  # Ensure index is valid
-                colname = df.columns[idx]
-                drop_list.append(colname)
-
-        df = df.drop(columns=drop_list, errors='ignore')  # Ignore missing columns
-
-        num_cols = df.shape[1]
-        # The last three columns (temp, humidity, and class) remain unchanged
-        num_groups = (num_cols - 3) // 3 if 'class' in df.columns else (num_cols - 2) // 3
-        averaged_data = []
-        col_names = []
-
-        for i in range(num_groups):
-            cols = df.iloc[:, i * 3:(i + 1) * 3]
-            averaged_col = cols.mean(axis=1)
-            averaged_data.append(averaged_col)
-            col_names.append(f'channel_{i + 1}_avg')
-
-        # Add the last columns unchanged
-        if 'temperature' in df.columns:
-            averaged_data.append(df['temperature'])
-            col_names.append('temperature')
-        if 'humidity' in df.columns:
-            averaged_data.append(df['humidity'])
-            col_names.append('humidity')
+        """
+        Reduces a training DataFrame (66 raw channel columns, then 'class') to the 17 features plus 'class'.
+        """
+        features = raw_to_features(df.iloc[:, :NUM_RAW_VALUES].to_numpy(dtype=np.float64))
+        result_df = pd.DataFrame(features, columns=FEATURE_NAMES, index=df.index)
         if 'class' in df.columns:
-            averaged_data.append(df['class'])
-            col_names.append('class')
-
-        # Combine into a new DataFrame
-        result_df = pd.concat(averaged_data, axis=1)
-        result_df.columns = col_names
-
+            result_df['class'] = df['class']
         return result_df
 
     def classify_sensor_data(self, formatted_values):
@@ -66,10 +122,72 @@ class SmellClassifier:
         if len(formatted_values) != 17:
             raise ValueError(f"Expected 17 sensor values, got {len(formatted_values)}")
 
-        new_data_df = pd.DataFrame([formatted_values], columns=self.feature_names)
-        # Reorder columns to match training data
-        new_data_df = new_data_df[self.feature_names]
+        self.ensure_model()
+        # Single-sample fast path: fill the preallocated row instead of building a DataFrame
+        with self._sample_lock:
+            self._sample[0] = formatted_values
+            prediction = self._predict(self._sample)[0]
+        return prediction
+
+    def classify_batch(self, values):
+        """
+        Classifies many readings in one call.
+
+        :param values: Array-like of shape (N, 66) raw readings, (N, 17) formatted readings,
+                       or a single 1-D reading of either length.
+        :return: Array of N predicted class labels.
+        """
+        self.ensure_model()
+        X = np.asarray(values, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        if X.shape[1] == NUM_RAW_VALUES:
+            X = raw_to_features(X)
+        elif X.shape[1] != len(self.feature_names):
+            raise ValueError(f"Expected 66 raw or {len(self.feature_names)} formatted sensor values, got {X.shape[1]}")
+        return self._predict(X)
+
+    def _predict(self, X):
+        """Majority vote of the k nearest training points; ties go to the first class, as in KNeighborsClassifier."""
+        if self.scaler is not None:
+            X = self.scaler.transform(X)
+        neighbors = self.index.query(X, k=self.n_neighbors, return_distance=False)
+        votes = np.zeros((len(X), len(self.classes)), dtype=np.int64)
+        np.add.at(votes, (np.arange(len(X))[:, np.newaxis], self.labels[neighbors]), 1)
+        return self.classes[votes.argmax(axis=1)]
+
+
+def benchmark(classifier, iterations=2000, batch_size=1000):
+    """Per-reading latency of the DataFrame path, the single-sample fast path and classify_batch."""
+    rng = np.random.default_rng(0)
+    raw = rng.uniform(1000, 50000, size=(batch_size, 66))
+    formatted = raw_to_features(raw)
+    sample = formatted[0].tolist()
+    classifier.ensure_model()
+
+    def dataframe_path():
+        df = pd.DataFrame([sample], columns=classifier.feature_names)[classifier.feature_names]
+        classifier.classify_batch(df.to_numpy())
+
+    timings = {}
+    for name, fn, n in (("dataframe_single", dataframe_path, iterations),
+                        ("fast_single", lambda: classifier.classify_sensor_data(sample), iterations)):
+        start = time.perf_counter()
+        for _ in range(n):
+            fn()
+        timings[name] = (time.perf_counter() - start) * 1e6 / n
+
+    for name, batch in (("batch_formatted", formatted), ("batch_raw", raw)):
+        start = time.perf_counter()
+        classifier.classify_batch(batch)
+        timings[name] = (time.perf_counter() - start) * 1e6 / batch_size
+    return timings
+
 
-        # Predict using the KNN model
-        prediction = self.knn.predict(new_data_df)[0]
-        return prediction
\ No newline at end of file
+if __name__ == '__main__':
+    start = time.perf_counter()
+    classifier = SmellClassifier()
+    classifier.ensure_model()
+    print(f"model load: {(time.perf_counter() - start) * 1000:.1f} ms")
+    for name, us in benchmark(classifier).items():
+        print(f"{name}: {us:.1f} us/reading")
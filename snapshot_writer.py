@@ -0,0 +1,104 @@
+# snapshot_writer.py
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import cv2
+
+from frame_pipeline import to_bgr
+
+
+class SnapshotWriter:
+    """
+    Saves frame snapshots as JPEG files on a small thread pool.
+
+    `submit()` never blocks: it picks the filename, hands the frame conversion and disk write to
+    a worker and returns straight away, so the aiortc event loop keeps servicing RTP and ICE.
+    At most `max_pending` snapshots may be queued or in flight; beyond that new snapshots are
+    dropped (and counted) rather than piling up behind a slow disk.
+    """
+
+    def __init__(self, directory, max_workers=2, max_pending=8):
+        self.directory = directory
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="snapshot")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.last_write_ms = 0.0
+        self.max_write_ms = 0.0
+        self._last_timestamp = None
+        self._same_timestamp_count = 0
+
+    def submit(self, frame, prefix="frame"):
+        """
+        Queues a snapshot of `frame` (an av.VideoFrame or a BGR ndarray).
+
+        :return: The filename the snapshot will be written to, or None if it was dropped.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.dropped += 1
+            return None
+
+        frame_timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]
+        with self._lock:
+            self.submitted += 1
+            # Keep names unique when several snapshots land in the same millisecond
+            if frame_timestamp == self._last_timestamp:
+                self._same_timestamp_count += 1
+                frame_timestamp = f"{frame_timestamp}_{self._same_timestamp_count}"
+            else:
+                self._last_timestamp = frame_timestamp
+                self._same_timestamp_count = 0
+        filename = f"{prefix}_{frame_timestamp}.jpg"
+        try:
+            self._executor.submit(self._write, frame, os.path.join(self.directory, filename))
+        except RuntimeError:
+            # Executor already shut down
+            self._slots.release()
+            with self._lock:
+                self.submitted -= 1
+                self.dropped += 1
+            return None
+        return filename
+
+    def _write(self, frame, path):
+        start = time.perf_counter()
+        try:
+            # The render and inference threads may be converting the same frame right now
+            img = to_bgr(frame) if hasattr(frame, "to_ndarray") else frame
+            os.makedirs(self.directory, exist_ok=True)
+            if not cv2.imwrite(path, img):
+                raise IOError(f"cv2.imwrite returned False for {path}")
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.written += 1
+                self.last_write_ms = elapsed_ms
+                self.max_write_ms = max(self.max_write_ms, elapsed_ms)
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            print(f"❌ Failed to save snapshot {path}: {e}")
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "snapshots_written": self.written,
+                "snapshots_dropped": self.dropped,
+                "snapshots_failed": self.failed,
+                "snapshots_pending": self.submitted - self.written - self.failed,
+                "snapshot_write_ms": round(self.last_write_ms, 1),
+                "snapshot_write_max_ms": round(self.max_write_ms, 1),
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,148 @@
+# sse_broker.py
+
+import json
+import threading
+import time
+from collections import deque
+
+
+class SSEMessage:
+    __slots__ = ("id", "event", "data")
+
+    def __init__(self, id, event, data):
+        self.id = id
+        self.event = event
+        self.data = data  # already JSON-encoded
+
+    def format(self):
+        return f"id: {self.id}\nevent: {self.event}\ndata: {self.data}\n\n"
+
+
+class EventBuffer:
+    """
+    Bounded ring buffer of SSE messages.
+
+    Regular events are kept in arrival order and the oldest is dropped once `maxlen` is reached.
+    Events listed in `coalesce_events` (high-rate state updates such as metrics or robot position)
+    only ever keep their newest message, since an older value is useless once a newer one exists.
+    """
+
+    def __init__(self, maxlen, coalesce_events=()):
+        self._events = deque(maxlen=maxlen)
+        self._latest = {}
+        self._coalesce_events = frozenset(coalesce_events)
+        self.dropped = 0
+
+    def put(self, message):
+        if message.event in self._coalesce_events:
+            if message.event in self._latest:
+                self.dropped += 1
+            self._latest[message.event] = message
+        else:
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+            self._events.append(message)
+
+    def since(self, last_id):
+        """Messages with an id greater than `last_id`, oldest first."""
+        messages = [m for m in self._events if m.id > last_id]
+        messages.extend(m for m in self._latest.values() if m.id > last_id)
+        messages.sort(key=lambda m: m.id)
+        return messages
+
+    def drain(self):
+        messages = self.since(-1)
+        self._events.clear()
+        self._latest.clear()
+        return messages
+
+    def __len__(self):
+        return len(self._events) + len(self._latest)
+
+
+class Subscription:
+    """One /stream-updates connection: a private EventBuffer filled by the broker."""
+
+    def __init__(self, broker, buffer):
+        self._broker = broker
+        self._buffer = buffer
+
+    def get(self, timeout=None):
+        """
+        Blocks until at least one message is pending or `timeout` expires.
+
+        :return: List of pending messages (empty on timeout).
+        """
+        with self._broker._cond:
+            self._broker._cond.wait_for(lambda: len(self._buffer) > 0, timeout)
+            return self._buffer.drain()
+
+    @property
+    def dropped(self):
+        return self._buffer.dropped
+
+    def close(self):
+        self._broker.unsubscribe(self)
+
+
+class SSEBroker:
+    """
+    Publish/subscribe fan-out for Server-Sent Events.
+
+    Every subscriber gets every event through its own bounded buffer, so memory stays capped
+    no matter how many (or how few) dashboards are connected. A shared replay window lets a
+    reconnecting EventSource resume from its Last-Event-ID. Event ids start at the boot time
+    in milliseconds so they keep increasing across server restarts.
+    """
+
+    def __init__(self, buffer_size=256, replay_size=512,
+                 coalesce_events=("metrics_update", "robot_position_update")):
+        self._cond = threading.Condition()
+        self._buffer_size = buffer_size
+        self._coalesce_events = coalesce_events
+        self._history = EventBuffer(replay_size, coalesce_events)
+        self._subscribers = set()
+        self._next_id = int(time.time() * 1000)
+
+    def publish(self, event, data):
+        payload = json.dumps(data)
+        with self._cond:
+            message = SSEMessage(self._next_id, event, payload)
+            self._next_id += 1
+            self._history.put(message)
+            for subscription in self._subscribers:
+                subscription._buffer.put(message)
+            self._cond.notify_all()
+        return message.id
+
+    def subscribe(self, last_event_id=None):
+        """
+        Registers a new subscriber.
+
+        :param last_event_id: Id of the last event the client saw; newer events still in the
+            replay window are queued for it immediately.
+        """
+        buffer = EventBuffer(self._buffer_size, self._coalesce_events)
+        subscription = Subscription(self, buffer)
+        with self._cond:
+            if last_event_id is not None:
+                for message in self._history.since(last_event_id):
+                    buffer.put(message)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._cond:
+            self._subscribers.discard(subscription)
+
+    @property
+    def subscriber_count(self):
+        with self._cond:
+            return len(self._subscribers)
+
+
+def parse_last_event_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
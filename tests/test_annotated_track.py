@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+import types
+
+import numpy as np
+import pytest
+
+pytest.importorskip("aiortc")
+
+from aiortc.mediastreams import MediaStreamError
+
+from annotated_track import VIDEO_TIME_BASE, AnnotatedFeedTrack
+from frame_broadcast import FrameBroadcaster
+
+
+def make_image(value):
+    return np.full((48, 64, 3), value, dtype=np.uint8)
+
+
+def executor_threads():
+    return [t.name for t in threading.enumerate() if t.name.startswith("asyncio_")]
+
+
+def publish_later(broadcaster, entry, delay):
+    timer = threading.Timer(delay, broadcaster.publish, args=(entry,))
+    timer.start()
+    return timer
+
+
+def test_broadcaster_calls_subscriber_callbacks_until_unsubscribed():
+    broadcaster = FrameBroadcaster()
+    calls = []
+    callback = lambda: calls.append(broadcaster.latest()[0])
+    broadcaster.subscribe(callback)
+    broadcaster.publish("a")
+    broadcaster.unsubscribe(callback)
+    broadcaster.publish("b")
+    assert calls == [1]
+    assert broadcaster.subscribers == 0
+
+
+def test_recv_waits_on_the_event_loop_and_wakes_on_publish():
+    async def scenario():
+        stream = types.SimpleNamespace(video_frames=FrameBroadcaster())
+        track = AnnotatedFeedTrack(stream, idle_timeout=5.0)
+        try:
+            recv = asyncio.ensure_future(track.recv())
+            await asyncio.sleep(0.2)
+            # Waiting for the first frame occupies no executor thread
+            assert not recv.done()
+            assert executor_threads() == []
+
+            started = time.monotonic()
+            publish_later(stream.video_frames, (make_image(7), time.monotonic()), 0.05)
+            frame = await asyncio.wait_for(recv, 2.0)
+            assert time.monotonic() - started < 1.0
+            assert frame.format.name == "yuv420p"
+            assert (frame.width, frame.height) == (64, 48)
+            assert frame.time_base == VIDEO_TIME_BASE
+        finally:
+            track.stop()
+
+    asyncio.run(scenario())
+
+
+def test_recv_resends_the_last_frame_when_idle():
+    async def scenario():
+        stream = types.SimpleNamespace(video_frames=FrameBroadcaster())
+        stream.video_frames.publish((make_image(7), time.monotonic()))
+        track = AnnotatedFeedTrack(stream, idle_timeout=0.1)
+        try:
+            first = await track.recv()
+            second = await asyncio.wait_for(track.recv(), 1.0)
+            assert second.pts > first.pts
+            assert np.array_equal(first.to_ndarray(), second.to_ndarray())
+        finally:
+            track.stop()
+
+    asyncio.run(scenario())
+
+
+def test_stop_ends_a_pending_recv():
+    async def scenario():
+        stream = types.SimpleNamespace(video_frames=FrameBroadcaster())
+        track = AnnotatedFeedTrack(stream, idle_timeout=5.0)
+        recv = asyncio.ensure_future(track.recv())
+        await asyncio.sleep(0.05)
+        track.stop()
+        with pytest.raises(MediaStreamError):
+            await asyncio.wait_for(recv, 1.0)
+        assert stream.video_frames.subscribers == 0
+        stream.video_frames.publish((make_image(1), time.monotonic()))  # no callback left to call
+
+    asyncio.run(scenario())
+
+
+def test_viewer_offer_rejects_malformed_offers_with_cors_headers():
+    pytest.importorskip("flask")
+    pytest.importorskip("schedule")
+    from aiohttp.test_utils import TestClient, TestServer
+
+    import server
+
+    async def scenario():
+        async with TestClient(TestServer(server.app)) as client:
+            for body in ("not json", '{"type": "offer"}', "[]"):
+                response = await client.post("/viewer-offer", data=body,
+                                             headers={"Content-Type": "application/json"})
+                assert response.status == 400, body
+                assert response.headers["Access-Control-Allow-Origin"] == "*"
+                assert (await response.json())["status"] == "invalid offer"
+        assert server.pcs == set()
+
+    asyncio.run(scenario())
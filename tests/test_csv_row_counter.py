@@ -0,0 +1,131 @@
+import datetime as dt
+import os
+
+import pytest
+
+import daily_reports
+from daily_reports import CsvRowCounter
+
+HEADER = "timestamp,value_0\n"
+
+
+class FakeDatetime(dt.datetime):
+    current = dt.datetime(2025, 6, 1, 23, 59, 0)
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    monkeypatch.setattr(daily_reports, "datetime", FakeDatetime)
+    FakeDatetime.current = dt.datetime(2025, 6, 1, 23, 59, 0)
+    return FakeDatetime
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / "sensor.csv"), str(tmp_path / "checkpoint.json")
+
+
+def append(path, *lines):
+    with open(path, "a") as f:
+        f.write("".join(lines))
+
+
+def rows(day, count):
+    return [f"{day} 12:00:{i:02d},1.0\n" for i in range(count)]
+
+
+def test_counts_only_complete_rows_and_skips_the_header(clock, paths):
+    csv_path, checkpoint_path = paths
+    append(csv_path, HEADER, *rows("2025-06-01", 3), "2025-06-01 12:00:59,1")
+    counter = CsvRowCounter(csv_path, checkpoint_path)
+    assert counter.update() == (3, 3)
+    append(csv_path, ".5\n", *rows("2025-05-31", 2))
+    assert counter.update() == (6, 4)
+    assert counter.offset == os.path.getsize(csv_path)
+
+
+def test_midnight_rollover_restarts_the_daily_count(clock, paths):
+    csv_path, checkpoint_path = paths
+    append(csv_path, HEADER, *rows("2025-06-01", 4))
+    counter = CsvRowCounter(csv_path, checkpoint_path)
+    assert counter.update() == (4, 4)
+
+    clock.current = dt.datetime(2025, 6, 2, 0, 0, 1)
+    assert counter.update() == (4, 0)
+    append(csv_path, *rows("2025-06-02", 2))
+    assert counter.update() == (6, 2)
+
+
+def test_truncated_file_is_counted_again(clock, paths):
+    csv_path, checkpoint_path = paths
+    append(csv_path, HEADER, *rows("2025-06-01", 5))
+    counter = CsvRowCounter(csv_path, checkpoint_path)
+    assert counter.update() == (5, 5)
+
+    with open(csv_path, "w") as f:
+        f.write(HEADER + "".join(rows("2025-06-01", 2)))
+    assert counter.update() == (2, 2)
+
+
+def test_rotated_file_is_counted_again_even_when_larger(clock, paths, tmp_path):
+    csv_path, checkpoint_path = paths
+    append(csv_path, HEADER, *rows("2025-06-01", 2))
+    counter = CsvRowCounter(csv_path, checkpoint_path)
+    assert counter.update() == (2, 2)
+
+    replacement = str(tmp_path / "replacement.csv")
+    append(replacement, HEADER, *rows("2025-05-31", 6), *rows("2025-06-01", 1))
+    os.replace(replacement, csv_path)
+    assert counter.update() == (7, 1)
+
+    os.remove(csv_path)
+    assert counter.update() == (0, 0)
+
+
+def test_restart_resumes_from_the_checkpoint(clock, paths):
+    csv_path, checkpoint_path = paths
+    append(csv_path, HEADER, *rows("2025-06-01", 3))
+    counter = CsvRowCounter(csv_path, checkpoint_path)
+    counter.update()
+    counter.checkpoint()
+    append(csv_path, *rows("2025-06-01", 2))
+
+    restarted = CsvRowCounter(csv_path, checkpoint_path)
+    assert (restarted.offset, restarted.total_rows, restarted.today_rows) == (counter.offset, 3, 3)
+    assert restarted.update() == (5, 5)
+
+
+def test_stale_checkpoint_never_double_counts(clock, paths):
+    csv_path, checkpoint_path = paths
+    append(csv_path, HEADER, *rows("2025-06-01", 3))
+    counter = CsvRowCounter(csv_path, checkpoint_path, checkpoint_interval=3600)
+    counter.update()
+    counter.checkpoint()
+    append(csv_path, *rows("2025-06-01", 4))
+    assert counter.update() == (7, 7)  # counted, but not checkpointed yet
+
+    assert CsvRowCounter(csv_path, checkpoint_path).update() == (7, 7)
+
+
+def test_checkpoint_from_an_earlier_day_keeps_the_total_only(clock, paths):
+    csv_path, checkpoint_path = paths
+    append(csv_path, HEADER, *rows("2025-06-01", 3))
+    counter = CsvRowCounter(csv_path, checkpoint_path)
+    counter.update()
+    counter.checkpoint()
+
+    clock.current = dt.datetime(2025, 6, 2, 8, 0, 0)
+    append(csv_path, *rows("2025-06-02", 1))
+    assert CsvRowCounter(csv_path, checkpoint_path).update() == (4, 1)
+
+
+def test_unreadable_checkpoint_is_ignored(clock, paths):
+    csv_path, checkpoint_path = paths
+    append(csv_path, HEADER, *rows("2025-06-01", 2))
+    with open(checkpoint_path, "w") as f:
+        f.write("{not json")
+    assert CsvRowCounter(csv_path, checkpoint_path).update() == (2, 2)
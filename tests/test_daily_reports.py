@@ -0,0 +1,81 @@
+import datetime as dt
+
+import pytest
+
+import daily_reports
+from daily_reports import generate_html_report, increment, load_daily_metrics, save_daily_metrics
+
+PAST = dt.date(2025, 6, 1)
+
+
+@pytest.fixture
+def report_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "Temi_VODs").mkdir()
+    for name in ("recorded_video_20250601_120000.mp4", "recorded_video_20250601_130000.mp4",
+                 f"recorded_video_{dt.date.today():%Y%m%d}_120000.mp4"):
+        (tmp_path / "Temi_VODs" / name).write_bytes(b"\0")
+    daily_reports.reset_daily_metrics()
+    yield tmp_path
+    daily_reports.reset_daily_metrics()
+
+
+def falls_box(html):
+    return html.split("Falls (Box):</strong> ")[1].split("<")[0]
+
+
+def test_daily_metrics_round_trip(report_dir):
+    increment("falls_box", 3)
+    save_daily_metrics(PAST)
+    assert load_daily_metrics(PAST)["falls_box"] == 3
+    assert load_daily_metrics(dt.date(2025, 6, 2)) is None
+
+
+def test_past_report_shows_the_figures_saved_for_that_day(report_dir):
+    increment("falls_box", 3)
+    save_daily_metrics(PAST)
+    daily_reports.reset_daily_metrics()
+    increment("falls_box", 7)
+
+    html = generate_html_report(date=PAST)
+    assert "Daily Report - 2025-06-01" in html
+    assert falls_box(html) == "3"
+    assert "Videos saved today:</strong> 2<" in html
+    assert "No t-SNE image available for 2025-06-01" in html
+
+    today = generate_html_report()
+    assert f"Daily Report - {dt.date.today().isoformat()}" in today
+    assert falls_box(today) == "7"
+    assert "Videos saved today:</strong> 1<" in today
+
+
+def test_past_report_without_saved_figures_says_so(report_dir):
+    increment("stream_live_seconds", 90)
+    html = generate_html_report(date=PAST)
+    assert "No server metrics were saved for this day" in html
+    assert falls_box(html) == "n/a"
+    assert "Live time:</strong> n/a<" in html
+
+
+def test_email_subject_and_body_use_the_report_date(report_dir, monkeypatch):
+    sent = []
+
+    class FakeSMTP:
+        def __init__(self, host, port):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def login(self, user, password):
+            pass
+
+        def sendmail(self, sender, recipients, message):
+            sent.append(message)
+
+    monkeypatch.setattr(daily_reports.smtplib, "SMTP_SSL", FakeSMTP)
+    assert daily_reports.send_email_report(date=PAST)
+    assert "Subject: Temi Server Report - 2025-06-01" in sent[0]
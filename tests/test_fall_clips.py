@@ -0,0 +1,45 @@
+import os
+
+import av
+import cv2
+import numpy as np
+
+from fall_clips import FallClipWriter, PendingClip
+
+
+def make_clip(robot_id="temi", frames=10):
+    image = np.zeros((48, 64, 3), dtype=np.uint8)
+    jpegs = []
+    for i in range(frames):
+        image[:] = i * 20
+        jpegs.append((i / 10, cv2.imencode(".jpg", image)[1].tobytes(), (64, 48)))
+    return PendingClip(robot_id, event_time=0.5, start=0.0, end=1.0, methods=["full"], frames=jpegs)
+
+
+def test_clips_started_in_the_same_second_get_their_own_files(tmp_path):
+    writer = FallClipWriter(str(tmp_path))
+    try:
+        first, second = make_clip(), make_clip()
+        second.started_at = first.started_at
+        writer._write(first)
+        writer._write(second)
+    finally:
+        writer.close()
+
+    name = f"fall_clip_{first.started_at.strftime('%Y%m%d_%H%M%S')}_temi_full"
+    assert sorted(os.listdir(tmp_path)) == [f"{name}.mp4", f"{name}_2.mp4"]
+    assert writer.clips_written == 2
+    assert writer.last_clip == str(tmp_path / f"{name}_2.mp4")
+
+
+def test_every_clip_frame_is_a_keyframe(tmp_path):
+    writer = FallClipWriter(str(tmp_path))
+    try:
+        writer._write(make_clip(frames=10))
+    finally:
+        writer.close()
+
+    with av.open(writer.last_clip) as container:
+        packets = [p for p in container.demux(video=0) if p.size]
+    assert len(packets) == 10
+    assert all(packet.is_keyframe for packet in packets)
@@ -0,0 +1,206 @@
+import math
+
+import numpy as np
+import pytest
+
+from fall_tracking import FallTracker
+
+
+# === BASELINE IMPLEMENTATION (the greedy tracker FallTracker replaced; `now` added for determinism) ===
+class GreedyFallTracker:
+    def __init__(self, cooldown=1.0, persistence=1.0, match_threshold=50):
+        self.cooldown = cooldown
+        self.persistence = persistence
+        self.match_threshold = match_threshold
+        self.active_tracks = {}
+        self.unique_fallers = set()
+        self.next_id = 0
+
+    def _distance(self, c1, c2):
+        return math.sqrt((c1[0] - c2[0])**2 + (c1[1] - c2[1])**2)
+
+    def update(self, centroids_fallen, now):
+        triggered_ids = []
+
+        to_remove = [id for id, v in self.active_tracks.items() if now - v["last_seen"] > self.persistence]
+        for id in to_remove:
+            del self.active_tracks[id]
+
+        for cx, cy, is_fallen in centroids_fallen:
+            matched_id = None
+            for id, data in self.active_tracks.items():
+                if self._distance((cx, cy), data["centroid"]) < self.match_threshold:
+                    matched_id = id
+                    break
+
+            if matched_id is None:
+                matched_id = self.next_id
+                self.next_id += 1
+
+            track = self.active_tracks.get(matched_id, {
+                "centroid": (cx, cy),
+                "last_seen": now,
+                "last_triggered": 0,
+                "falling": False
+            })
+
+            track["centroid"] = (cx, cy)
+            track["last_seen"] = now
+
+            if is_fallen:
+                if not track["falling"] and now - track["last_triggered"] > self.cooldown:
+                    triggered_ids.append(matched_id)
+                    self.unique_fallers.add(matched_id)
+                    track["last_triggered"] = now
+                track["falling"] = True
+            else:
+                track["falling"] = False
+
+            self.active_tracks[matched_id] = track
+
+        return triggered_ids
+
+    def get_unique_faller_count(self):
+        return len(self.unique_fallers)
+
+
+# Two people walking towards each other along neighbouring lines, passing at step 2-3
+CROSSING = [((100 + 20 * step, 100), (200 - 20 * step, 110)) for step in range(6)]
+
+
+# === ASSOCIATION ===
+def test_close_neighbours_keep_their_own_tracks():
+    tracker = FallTracker(match_threshold=50)
+    tracker.update([(100, 100, False), (130, 100, False)], now=0.0)
+    tracker.update([(105, 100, False), (135, 100, False)], now=0.1)
+    assert sorted(tracker.active_tracks) == [0, 1]
+    assert tracker.active_tracks[0].centroid == (105.0, 100.0)
+    assert tracker.active_tracks[1].centroid == (135.0, 100.0)
+
+
+@pytest.mark.parametrize("order", [1, -1])
+def test_crossing_tracks_keep_their_identity(order):
+    tracker = FallTracker(match_threshold=50)
+    for step, (a, b) in enumerate(CROSSING):
+        tracker.update([(*p, False) for p in (a, b)[::order]], now=step * 0.1)
+        assert sorted(tracker.active_tracks) == [0, 1]
+        assert tracker.active_tracks[0 if order == 1 else 1].centroid == a
+        assert tracker.active_tracks[1 if order == 1 else 0].centroid == b
+
+
+def test_greedy_baseline_merges_crossing_tracks():
+    # What the optimal assignment fixes: the first track in range took both people
+    tracker = GreedyFallTracker(match_threshold=50)
+    owners = []
+    for step, (a, b) in enumerate(CROSSING[:3]):
+        tracker.update([(*a, False), (*b, False)], now=step * 0.1)
+        owners.append(next(i for i, t in tracker.active_tracks.items() if t["centroid"] == b))
+    assert owners == [1, 1, 0]
+
+
+def test_optimal_assignment_beats_first_come_matching():
+    tracker = FallTracker(match_threshold=50, predict=False)
+    tracker.update([(100, 100, False), (140, 100, False)], now=0.0)
+    tracker.update([(130, 100, False), (175, 100, False)], now=0.1)
+    assert tracker.active_tracks[0].centroid == (130.0, 100.0)
+    assert tracker.active_tracks[1].centroid == (175.0, 100.0)
+
+    greedy = GreedyFallTracker(match_threshold=50)
+    greedy.update([(100, 100, False), (140, 100, False)], now=0.0)
+    greedy.update([(130, 100, False), (175, 100, False)], now=0.1)
+    assert greedy.active_tracks[0]["centroid"] == (175, 100)
+
+
+@pytest.mark.parametrize("predict, expected_tracks", [(True, [0]), (False, [0, 1])])
+def test_velocity_prediction_follows_a_walker_who_speeds_up(predict, expected_tracks):
+    tracker = FallTracker(match_threshold=50, velocity_smoothing=1.0, predict=predict)
+    for step, x in enumerate((0, 40, 80, 150)):
+        tracker.update([(x, 200, False)], now=step * 0.1)
+    assert list(tracker.active_tracks) == expected_tracks
+
+
+# === EXPIRY ===
+def test_tracks_expire_after_persistence():
+    tracker = FallTracker(persistence=1.0)
+    tracker.update([(10, 10, False)], now=0.0)
+    tracker.update([], now=1.0)
+    assert list(tracker.active_tracks) == [0]
+    tracker.update([], now=2.5)
+    assert len(tracker) == 0
+
+
+def test_person_returning_after_expiry_gets_a_new_track():
+    tracker = FallTracker(persistence=1.0)
+    tracker.update([(10, 10, False)], now=0.0)
+    tracker.update([(12, 10, False)], now=0.9)
+    assert list(tracker.active_tracks) == [0]
+    tracker.update([(12, 10, False)], now=2.0)
+    assert list(tracker.active_tracks) == [1]
+
+
+def test_unmatched_tracks_expire_while_others_are_seen():
+    tracker = FallTracker(persistence=1.0)
+    tracker.update([(10, 10, False), (300, 300, False)], now=0.0)
+    for step in range(1, 16):
+        tracker.update([(10, 10, False)], now=step * 0.1)
+    assert list(tracker.active_tracks) == [0]
+
+
+# === COOLDOWN ===
+def test_fall_counts_once_and_rearms_after_the_cooldown():
+    tracker = FallTracker(cooldown=1.0, persistence=5.0)
+    assert tracker.update([(50, 50, True)], now=0.0) == [0]
+    assert tracker.update([(50, 50, True)], now=0.5) == []  # still fallen
+    tracker.update([(50, 50, False)], now=0.6)
+    assert tracker.update([(50, 50, True)], now=1.5) == [0]
+    assert tracker.get_unique_faller_count() == 1
+
+
+def test_fall_starting_inside_the_cooldown_is_not_counted_when_held():
+    tracker = FallTracker(cooldown=1.0, persistence=5.0)
+    assert tracker.update([(50, 50, True)], now=0.0) == [0]
+    tracker.update([(50, 50, False)], now=0.1)
+    assert tracker.update([(50, 50, True)], now=0.5) == []  # inside the cooldown
+    assert tracker.update([(50, 50, True)], now=1.6) == []  # held past it: still the same fall
+    assert tracker.active_tracks[0].states["fall"] == "fallen"
+    tracker.update([(50, 50, False)], now=1.7)
+    assert tracker.update([(50, 50, True)], now=1.8) == [0]  # a new fall after standing up
+
+
+def test_cooldown_is_per_track():
+    tracker = FallTracker(cooldown=1.0, persistence=5.0)
+    assert tracker.update([(50, 50, True), (400, 50, False)], now=0.0) == [0]
+    assert tracker.update([(50, 50, True), (400, 50, True)], now=0.1) == [1]
+
+
+def test_single_person_matches_the_greedy_baseline():
+    rng = np.random.default_rng(0)
+    verdicts = rng.random(400) < 0.3
+    tracker = FallTracker(cooldown=1.0, persistence=1.0)
+    baseline = GreedyFallTracker(cooldown=1.0, persistence=1.0)
+    for step, fallen in enumerate(verdicts):
+        now = 100 + step * 0.1
+        person = [(50 + step % 3, 50, bool(fallen))]
+        assert tracker.update(person, now=now) == baseline.update(person, now=now), step
+    assert tracker.get_unique_faller_count() == baseline.get_unique_faller_count()
+
+
+# === PER-METHOD STATE MACHINES ===
+def test_jittery_verdicts_need_confirm_and_recovery_time():
+    tracker = FallTracker(methods=("box", "pose"), confirm_time=0.3, recovery_time=1.0, persistence=5.0)
+    box_events = pose_events = 0
+    for step in range(40):  # 4 s at 10 fps; pose flickers every frame while box holds steady
+        events = tracker.observe([(80, 80)], [[step >= 10, step % 2 == 0]], now=step * 0.1)
+        box_events += len(events["box"])
+        pose_events += len(events["pose"])
+    assert box_events == 1
+    assert pose_events == 0  # never fallen for 0.3 s in a row
+    assert tracker.active_tracks[0].states["box"] == "fallen"
+
+    for step in range(40, 45):
+        tracker.observe([(80, 80)], [[False, False]], now=step * 0.1)
+    assert tracker.active_tracks[0].states["box"] == "recovering"
+    tracker.observe([(80, 80)], [[True, False]], now=4.5)  # relapse before recovery: no new event
+    assert tracker.active_tracks[0].states["box"] == "fallen"
+    assert tracker.get_unique_faller_count("box") == 1
+    assert tracker.get_unique_faller_count("pose") == 0
@@ -0,0 +1,69 @@
+import threading
+
+import numpy as np
+import pytest
+
+av = pytest.importorskip("av")
+
+from frame_pipeline import FrameConversions, FramePipeline
+
+
+def make_frame(pts, value=100, size=(64, 48)):
+    img = np.full((size[1], size[0], 3), value, dtype=np.uint8)
+    frame = av.VideoFrame.from_ndarray(img, format="bgr24").reformat(format="yuv420p")
+    frame.pts = pts
+    return frame
+
+
+def test_pipelines_sharing_conversions_convert_a_frame_once():
+    conversions = FrameConversions()
+    render, inference = FramePipeline(conversions=conversions), FramePipeline(conversions=conversions)
+    frame = make_frame(1)
+    render.update(frame)
+    inference.update(frame)
+    assert inference.analysis_view() is render.analysis_view()
+    assert conversions.frames_converted == 1
+    # A different size is a separate conversion, then shared as well
+    render.display_view()
+    inference.display_view()
+    assert conversions.frames_converted == 2
+    assert not inference.analysis_view().flags.writeable
+
+
+def test_separate_pipelines_convert_on_their_own():
+    render, inference = FramePipeline(), FramePipeline()
+    frame = make_frame(1)
+    for pipeline in (render, inference):
+        pipeline.update(frame)
+        pipeline.analysis_view()
+    assert render.frames_converted == inference.frames_converted == 1
+
+
+def test_concurrent_requests_wait_for_one_conversion():
+    conversions = FrameConversions()
+    frame = make_frame(1, size=(1280, 720))
+    barrier = threading.Barrier(4)
+    results = []
+
+    def convert():
+        barrier.wait()
+        results.append(conversions.get(frame, (640, 360)))
+
+    threads = [threading.Thread(target=convert) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert conversions.frames_converted == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_only_the_newest_frames_are_kept():
+    conversions = FrameConversions(keep=2)
+    frames = [make_frame(pts) for pts in range(3)]
+    first = [conversions.get(frame, (32, 24)) for frame in frames]
+    assert conversions.get(frames[2], (32, 24)) is first[2]
+    assert conversions.get(frames[1], (32, 24)) is first[1]
+    assert conversions.frames_converted == 3
+    assert conversions.get(frames[0], (32, 24)) is not first[0]  # dropped, converted again
+    assert conversions.frames_converted == 4
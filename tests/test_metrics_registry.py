@@ -0,0 +1,117 @@
+import threading
+
+import pytest
+
+from metrics_registry import Counter, MetricsRegistry, exposition
+
+THREADS = 8
+PER_THREAD = 20_000
+
+
+def hammer(record, threads=THREADS, per_thread=PER_THREAD):
+    workers = [threading.Thread(target=lambda: [record() for _ in range(per_thread)]) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def test_concurrent_increments_and_observations_are_not_lost():
+    registry = MetricsRegistry()
+    frames = registry.counter("frames_processed")
+    encode = registry.histogram("jpeg_encode_ms")
+    hammer(lambda: (frames.inc(), encode.observe(3.0)))
+
+    snapshot = registry.snapshot()
+    assert snapshot["frames_processed"] == THREADS * PER_THREAD
+    histogram = snapshot.histograms["jpeg_encode_ms"]
+    assert histogram.count == THREADS * PER_THREAD
+    assert histogram.sum == 3.0 * THREADS * PER_THREAD
+    assert histogram.quantile(0.5) == 5
+
+
+def test_histogram_snapshots_are_consistent_while_threads_observe():
+    # Every observation is 3.0, so a torn read would show a sum that disagrees with the count
+    encode = MetricsRegistry().histogram("jpeg_encode_ms")
+    done = threading.Event()
+    torn = []
+
+    def read():
+        while not done.is_set():
+            snapshot = encode.snapshot()
+            if snapshot.sum != 3.0 * snapshot.count or snapshot.counts[3] != snapshot.count:
+                torn.append((snapshot.count, snapshot.sum))
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        hammer(lambda: encode.observe(3.0), threads=4)
+    finally:
+        done.set()
+        reader.join()
+    assert torn == []
+    assert encode.snapshot().count == 4 * PER_THREAD
+
+
+def test_shards_of_exited_threads_are_folded():
+    counter = Counter("requests")
+    hammer(counter.inc, threads=20, per_thread=10)
+    assert counter.value() == 200
+    assert counter._shards == []
+    counter.inc()
+    assert counter.value() == 201
+    assert len(counter._shards) == 1
+
+
+def test_reset_restarts_counters_from_zero():
+    registry = MetricsRegistry()
+    frames = registry.counter("frames_processed")
+    people = registry.gauge("total_csv_rows")
+    frames.inc(5)
+    people.set(7)
+    registry.reset_counters()
+    frames.inc(2)
+    assert registry.snapshot().values == {"frames_processed": 2, "total_csv_rows": 7}
+
+
+def test_registering_a_name_twice():
+    registry = MetricsRegistry()
+    assert registry.counter("frames") is registry.counter("frames")
+    with pytest.raises(ValueError):
+        registry.histogram("frames")
+
+
+def test_summary_and_flat_snapshot():
+    registry = MetricsRegistry()
+    encode = registry.histogram("jpeg_encode_ms")
+    for value in (1, 1, 1, 40):
+        encode.observe(value)
+    assert encode.snapshot().summary() == {"count": 4, "mean": 10.75, "p50": 1, "p95": 50, "p99": 50}
+    assert registry.snapshot().flat()["jpeg_encode_ms_p50"] == 1
+
+
+def test_exposition():
+    registry = MetricsRegistry()
+    registry.counter("frames_processed", "Frames analyzed").inc(2)
+    registry.gauge("total_csv_rows").set(10)
+    encode = registry.histogram("jpeg_encode_ms", buckets=(1, 5))
+    encode.observe(0.5)
+    encode.observe(3.0)
+    encode.observe(9.0)
+
+    text = exposition(registry.snapshot(), extra={"analysis_ms": 12.5, "robot_id": "temi", "recording": True})
+    assert text == (
+        "# HELP temi_frames_processed_total Frames analyzed\n"
+        "# TYPE temi_frames_processed_total counter\n"
+        "temi_frames_processed_total 2\n"
+        "# TYPE temi_total_csv_rows gauge\n"
+        "temi_total_csv_rows 10\n"
+        "# TYPE temi_jpeg_encode_ms histogram\n"
+        'temi_jpeg_encode_ms_bucket{le="1"} 1\n'
+        'temi_jpeg_encode_ms_bucket{le="5"} 2\n'
+        'temi_jpeg_encode_ms_bucket{le="+Inf"} 3\n'
+        "temi_jpeg_encode_ms_sum 12.5\n"
+        "temi_jpeg_encode_ms_count 3\n"
+        "# TYPE temi_analysis_ms gauge\n"
+        "temi_analysis_ms 12.5\n"
+    )
@@ -0,0 +1,107 @@
+import glob
+import os
+
+import av
+import numpy as np
+import pytest
+
+from packet_recorder import PASSTHROUGH_CODECS, TIME_BASE, PacketRecorder, h264_nal_units, is_keyframe
+
+FRAME_TICKS = 3000  # 30 fps on the 90 kHz RTP clock
+
+
+# === BITSTREAM HELPERS ===
+def test_h264_nal_units_handles_3_and_4_byte_start_codes():
+    sps, pps, idr = b"\x67\x42\x00\x1f", b"\x68\xce\x3c\x80", b"\x65\x88\x84\x00\x00\x03"
+    data = b"\x00\x00\x00\x01" + sps + b"\x00\x00\x01" + pps + b"\x00\x00\x00\x01" + idr
+    assert h264_nal_units(data) == [sps, pps, idr]
+    assert h264_nal_units(b"") == []
+    assert h264_nal_units(b"\x00\x00\x01") == []
+
+
+def test_is_keyframe():
+    assert is_keyframe("h264", b"\x00\x00\x00\x01\x67\x42\x00\x00\x00\x01\x65\x88")
+    assert not is_keyframe("h264", b"\x00\x00\x00\x01\x41\x9a")
+    assert is_keyframe("vp8", b"\x10\x02\x00")
+    assert not is_keyframe("vp8", b"\x11\x02\x00")
+    assert not is_keyframe("vp8", b"")
+
+
+# === SEGMENTS ===
+def encode_frames(name, count=60, keyframe_every=30):
+    """RTP-reassembled frames from aiortc's own encoder, as the recorder receives them."""
+    codecs = pytest.importorskip("aiortc.codecs")
+    from aiortc.rtcrtpparameters import RTCRtpCodecParameters
+
+    rtp_codec = RTCRtpCodecParameters(mimeType=f"video/{name}", clockRate=90000, payloadType=96)
+    encoder = codecs.get_encoder(rtp_codec)
+    base = np.tile(np.linspace(0, 255, 320, dtype=np.uint8)[None, :, None], (240, 1, 3))
+    frames = []
+    for i in range(count):
+        frame = av.VideoFrame.from_ndarray(np.roll(base, i * 4, axis=1), format="bgr24")
+        frame.pts, frame.time_base = i * FRAME_TICKS, TIME_BASE
+        payloads, _ = encoder.encode(frame.reformat(format="yuv420p"), force_keyframe=i % keyframe_every == 0)
+        frames.append(b"".join(codecs.depayload(rtp_codec, payload) for payload in payloads))
+    return frames
+
+
+def record(directory, name, frames, timestamps, segment_seconds=300):
+    recorder = PacketRecorder(str(directory), segment_seconds=segment_seconds)
+    keyframe_requests = []
+    recorder._request_keyframe = lambda: keyframe_requests.append(True)
+    recorder.start()
+    for data, timestamp in zip(frames, timestamps):
+        assert recorder.submit(name, data, timestamp)
+    recorder.close()
+    return recorder, len(keyframe_requests) - 1  # the first request comes from start()
+
+
+def decoded_segments(directory):
+    result = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.mkv"))):
+        with av.open(path) as container:
+            result.append(sum(1 for _ in container.decode(video=0)))
+    return result
+
+
+@pytest.mark.parametrize("name", sorted(PASSTHROUGH_CODECS))
+def test_segments_are_cut_at_keyframes(tmp_path, name):
+    frames = encode_frames(name)
+    recorder, _ = record(tmp_path, name, frames, [i * FRAME_TICKS for i in range(60)], segment_seconds=1)
+    assert decoded_segments(tmp_path) == [30, 30]
+    assert recorder.segments_written == 2
+    assert recorder.packets_written == 60
+
+
+@pytest.mark.parametrize("name", sorted(PASSTHROUGH_CODECS))
+def test_recording_starts_at_the_first_keyframe(tmp_path, name):
+    frames = encode_frames(name)[10:]
+    first_keyframe = next(i for i, data in enumerate(frames) if is_keyframe(PASSTHROUGH_CODECS[name], data))
+    assert first_keyframe > 0
+    recorder, _ = record(tmp_path, name, frames, [i * FRAME_TICKS for i in range(10, 60)])
+    assert recorder.packets_skipped == first_keyframe
+    assert decoded_segments(tmp_path) == [50 - first_keyframe]
+
+
+@pytest.mark.parametrize("name", sorted(PASSTHROUGH_CODECS))
+def test_rtp_timestamp_wrap_keeps_one_segment(tmp_path, name):
+    frames = encode_frames(name)
+    start = (1 << 32) - 20 * FRAME_TICKS
+    recorder, keyframe_requests = record(tmp_path, name, frames,
+                                         [(start + i * FRAME_TICKS) % (1 << 32) for i in range(60)])
+    assert decoded_segments(tmp_path) == [60]
+    assert recorder.packets_skipped == 0
+    assert keyframe_requests == 0
+    with av.open(glob.glob(os.path.join(tmp_path, "*.mkv"))[0]) as container:
+        assert container.duration / 1e6 == pytest.approx(2.0, abs=0.05)
+
+
+def test_stream_restart_requests_a_keyframe(tmp_path):
+    frames = encode_frames("VP8")
+    # The robot reconnects 20 frames in, restarting its RTP clock at a lower value
+    timestamps = [900_000 + i * FRAME_TICKS for i in range(20)] + [i * FRAME_TICKS for i in range(40)]
+    recorder, keyframe_requests = record(tmp_path, "VP8", frames, timestamps)
+    assert keyframe_requests == 1
+    # Frames until the next keyframe (frame 30) cannot start the new file
+    assert recorder.packets_skipped == 10
+    assert decoded_segments(tmp_path) == [20, 30]
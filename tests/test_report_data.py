@@ -0,0 +1,111 @@
+import csv
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import report_visualizer
+from sensor_store import NUM_VALUES, SensorStore, migrate_csv
+
+HEADER = ["timestamp"] + [f"value_{i}" for i in range(NUM_VALUES)] + ["x_position", "y_position", "frame_filename"]
+
+
+def row(timestamp, value):
+    return [timestamp] + [float(value)] * NUM_VALUES + [1.0, 2.0, ""]
+
+
+@pytest.fixture
+def csv_path(tmp_path, monkeypatch):
+    path = tmp_path / "sensor_data_master.csv"
+    monkeypatch.setattr(report_visualizer, "SENSOR_CSV_PATH", str(path))
+    return path
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+
+
+def test_store_started_mid_day_keeps_earlier_rows_and_history(tmp_path, csv_path):
+    # History recorded before the store existed, then the store starts at noon on day two;
+    # the recorder writes every row after that to both
+    history = [row("2025-06-01 09:00:00", 1), row("2025-06-01 10:00:00", 2), row("2025-06-02 08:00:00", 3)]
+    live = [row("2025-06-02 12:00:00", 4), row("2025-06-03 09:00:00", 5)]
+    write_csv(csv_path, history + live)
+    store = SensorStore(str(tmp_path / "store"))
+    store.append_rows(live)
+
+    assert list(report_visualizer.load_daily_data(date(2025, 6, 1), store)["value_0"]) == [1, 2]
+    assert list(report_visualizer.load_daily_data(date(2025, 6, 2), store)["value_0"]) == [3, 4]
+    assert list(report_visualizer.load_daily_data(date(2025, 6, 3), store)["value_0"]) == [5]
+    # Only the day fully in the store is memoized by its store row count
+    assert report_visualizer.daily_data_version(store, date(2025, 6, 2)) is None
+    assert report_visualizer.daily_data_version(store, date(2025, 6, 3)) == "1"
+
+
+def test_migrated_store_is_read_without_the_csv(tmp_path, csv_path):
+    write_csv(csv_path, [row("2025-06-01 00:00:00", 1), row("2025-06-02 10:00:00", 2)])
+    root = str(tmp_path / "store")
+    migrate_csv(str(csv_path), root)
+    store = SensorStore(root)
+    csv_path.unlink()
+
+    assert list(report_visualizer.load_daily_data(date(2025, 6, 2), store)["value_0"]) == [2]
+    assert list(report_visualizer.load_daily_data(date(2025, 6, 1), store)["value_0"]) == [1]
+
+
+def test_empty_store_reads_the_csv(tmp_path, csv_path):
+    write_csv(csv_path, [row("2025-06-01 09:00:00", 7)])
+    store = SensorStore(str(tmp_path / "store"))
+
+    assert store.first_timestamp() is None
+    assert np.array_equal(report_visualizer.load_daily_data(date(2025, 6, 1), store)["value_0"], [7])
+
+
+@pytest.fixture
+def report_dir(tmp_path, monkeypatch):
+    # generate_tsne_visualization uses the default SensorStore and visualizations/ under the working directory
+    monkeypatch.chdir(tmp_path)
+    rng = np.random.default_rng(0)
+    training = pd.DataFrame(rng.uniform(1000, 5000, size=(40, NUM_VALUES)),
+                            columns=[f"ch{i + 1}" for i in range(64)] + ["humidity", "temperature"])
+    training["class"] = ["coffee", "air"] * 20
+    training.to_csv(tmp_path / "training.csv", index=False)
+    monkeypatch.setattr(report_visualizer, "TRAINING_DATA_PATH", "training.csv")
+    return tmp_path
+
+
+def cached_renders(report_dir, day):
+    cache = report_dir / report_visualizer.CACHE_DIR
+    return sorted(p.name for p in cache.iterdir() if p.name.startswith(f"tsne_{day}_"))
+
+
+def test_days_read_from_the_csv_are_not_memoized(report_dir, csv_path):
+    write_csv(csv_path, [row("2025-06-01 09:00:00", 1500), row("2025-06-01 10:00:00", 2500)])
+
+    for _ in range(2):
+        result = report_visualizer.generate_tsne_visualization(date=date(2025, 6, 1))
+        assert result["metadata"]["daily_readings_count"] == 2
+        assert result["metadata"]["data_version"] is None
+    assert cached_renders(report_dir, "2025-06-01") == []
+
+
+def test_days_in_the_store_are_memoized_by_row_count(report_dir, csv_path):
+    write_csv(csv_path, [])
+    store = SensorStore()
+    store.append_rows([row("2025-06-01 00:00:00", 1500)])
+
+    first = report_visualizer.generate_tsne_visualization(date=date(2025, 6, 1))
+    assert first["metadata"]["data_version"] == "1"
+    assert len(cached_renders(report_dir, "2025-06-01")) == 2
+    assert report_visualizer.generate_tsne_visualization(date=date(2025, 6, 1)) == first
+
+    store.append_rows([row("2025-06-01 10:00:00", 2500)])
+    second = report_visualizer.generate_tsne_visualization(date=date(2025, 6, 1))
+    assert second["metadata"]["data_version"] == "2"
+    # The render for the old row count is replaced, not kept alongside
+    renders = cached_renders(report_dir, "2025-06-01")
+    assert len(renders) == 2 and all(name.startswith("tsne_2025-06-01_2_") for name in renders)
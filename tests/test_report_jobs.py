@@ -0,0 +1,69 @@
+import datetime as dt
+import os
+import sys
+import threading
+import types
+
+import pytest
+
+import report_jobs
+from report_jobs import ReportJobQueue
+
+SERVER_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server.py")
+RECORDER_THREADS = {"sensor-recorder", "video-recorder", "packet-recorder", "fall-clips"}
+
+
+def describe_worker(date):
+    # Runs in the report worker instead of the t-SNE render
+    server = sys.modules.get("__mp_main__")
+    return {"metadata": {
+        "main_file": getattr(server, "__file__", None),
+        "threads": sorted(thread.name for thread in threading.enumerate()),
+        "recorders": [getattr(server, name, None) is None for name in
+                      ("sensor_recorder", "snapshot_writer", "video_recorder", "packet_recorder", "fall_clips")],
+        "heavy_modules": sorted(name for name in ("torch", "ultralytics") if name in sys.modules),
+    }}
+
+
+def no_visualization(date):
+    return None
+
+
+def test_delivery_gets_the_requested_date(monkeypatch):
+    monkeypatch.setattr(report_jobs, "_render_report", no_visualization)
+    delivered = []
+    queue = ReportJobQueue(deliver=lambda data, date: delivered.append((data, date)) or True)
+    try:
+        job = queue.submit(date=dt.date(2025, 6, 1), send_without_visualization=True)
+        assert job.done.wait(120)
+    finally:
+        queue.shutdown()
+    assert job.status == "succeeded", job.error
+    assert delivered == [(None, dt.date(2025, 6, 1))]
+
+
+def test_report_worker_does_not_start_server_threads(tmp_path, monkeypatch):
+    # Spawned workers re-import the parent's __main__; make that server.py, as it is in production
+    for module in ("aiohttp", "aiortc", "av", "flask", "schedule"):
+        pytest.importorskip(module)
+    server_main = types.ModuleType("__main__")
+    server_main.__file__ = SERVER_PATH
+    server_main.__spec__ = None
+    monkeypatch.setitem(sys.modules, "__main__", server_main)
+    monkeypatch.setattr(report_jobs, "_render_report", describe_worker)
+    monkeypatch.chdir(tmp_path)
+
+    queue = ReportJobQueue(deliver=lambda data, date: True)
+    try:
+        job = queue.submit()
+        assert job.done.wait(120)
+    finally:
+        queue.shutdown()
+
+    assert job.status == "succeeded", job.error
+    worker = job.metadata
+    assert worker["main_file"] == SERVER_PATH
+    assert RECORDER_THREADS.isdisjoint(worker["threads"])
+    assert all(worker["recorders"])
+    assert worker["heavy_modules"] == []
+    assert not os.path.exists(tmp_path / "Temi_VODs")
@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import report_visualizer
+from sensor_features import FEATURE_NAMES, NUM_RAW_VALUES, raw_to_features, row_to_features
+from smell_classifier import SmellClassifier
+
+# === BASELINE IMPLEMENTATIONS (as they were before sensor_features.py) ===
+BASELINE_CHANNEL_MAP = [999, 999, 11, 11, 11, 3, 3, 3, 2, 2, 2, 1, 1, 1, 999, 999,
+                        999, 999, 999, 999, 999, 9, 9, 9, 6, 6, 6, 5, 5, 5, 999, 999,
+                        999, 999, 14, 14, 14, 10, 10, 10, 7, 7, 7, 4, 4, 4, 999, 999,
+                        999, 999, 15, 15, 15, 13, 13, 13, 12, 12, 12, 8, 8, 8, 999, 999,
+                        16, 17]
+
+
+def baseline_format_data(data):
+    """server.format_data"""
+    if (len(data) != 66) or any(not isinstance(x, (int, float)) for x in data):
+        return None
+    filtered_data = [x for x, ch in zip(data, BASELINE_CHANNEL_MAP) if ch != 999]
+    num_groups = (len(filtered_data) - 2) // 3
+    averaged_data = []
+    for i in range(num_groups):
+        averaged_data.append(sum(filtered_data[i * 3:i * 3 + 3]) / 3)
+    averaged_data.append(filtered_data[-2])
+    averaged_data.append(filtered_data[-1])
+    return averaged_data
+
+
+def baseline_process_dataframe(df):
+    """SmellClassifier.process_dataframe"""
+    channel_map = BASELINE_CHANNEL_MAP + [0]
+    drop_list = []
+    for idx, x in enumerate(channel_map):
+        if x == 999 and idx < len(df.columns):
+            drop_list.append(df.columns[idx])
+    df = df.drop(columns=drop_list, errors='ignore')
+
+    num_cols = df.shape[1]
+    num_groups = (num_cols - 3) // 3 if 'class' in df.columns else (num_cols - 2) // 3
+    averaged_data = []
+    col_names = []
+    for i in range(num_groups):
+        averaged_data.append(df.iloc[:, i * 3:(i + 1) * 3].mean(axis=1))
+        col_names.append(f'channel_{i + 1}_avg')
+    if 'temperature' in df.columns:
+        averaged_data.append(df['temperature'])
+        col_names.append('temperature')
+    if 'humidity' in df.columns:
+        averaged_data.append(df['humidity'])
+        col_names.append('humidity')
+    if 'class' in df.columns:
+        averaged_data.append(df['class'])
+        col_names.append('class')
+    result_df = pd.concat(averaged_data, axis=1)
+    result_df.columns = col_names
+    return result_df
+
+
+def baseline_process_sensor_data(df):
+    """report_visualizer.process_sensor_data"""
+    value_cols = [col for col in df.columns if col.startswith("value_")]
+    data = df[value_cols]
+    indices_to_keep = [2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13,
+                       21, 22, 23, 24, 25, 26, 27, 28, 29,
+                       34, 35, 36, 37, 38, 39, 40, 41, 42, 43, 44, 45,
+                       50, 51, 52, 53, 54, 55, 56, 57, 58, 59, 60, 61,
+                       64, 65]
+    raw_values = data.iloc[:, indices_to_keep].values
+    averaged_values = np.zeros((raw_values.shape[0], 17))
+    for i in range(15):
+        averaged_values[:, i] = raw_values[:, i * 3:i * 3 + 3].mean(axis=1)
+    averaged_values[:, 15] = raw_values[:, -2]
+    averaged_values[:, 16] = raw_values[:, -1]
+    return averaged_values
+
+
+# === FIXTURES ===
+@pytest.fixture
+def raw_rows():
+    rng = np.random.default_rng(0)
+    rows = rng.uniform(1000, 2_500_000, size=(50, NUM_RAW_VALUES))
+    rows[:, 64] = rng.uniform(20, 80, size=50)   # humidity
+    rows[:, 65] = rng.uniform(18, 30, size=50)   # temperature
+    return rows
+
+
+@pytest.fixture
+def training_df(raw_rows):
+    # The training CSV layout: ch1..ch64, humidity, temperature, class
+    columns = [f"ch{i + 1}" for i in range(64)] + ["humidity", "temperature"]
+    df = pd.DataFrame(raw_rows, columns=columns)
+    df["class"] = ["coffee", "air"] * 25
+    return df
+
+
+# === TESTS ===
+def test_single_row_matches_baseline_format_data(raw_rows):
+    for row in raw_rows.tolist():
+        assert raw_to_features(row).tolist() == pytest.approx(baseline_format_data(row), rel=0, abs=1e-9)
+
+
+def test_row_path_matches_baseline_and_batch(raw_rows):
+    batch = raw_to_features(raw_rows)
+    for row, features in zip(raw_rows.tolist(), batch):
+        assert row_to_features(row) == baseline_format_data(row)
+        assert row_to_features(row) == features.tolist()
+    integers = [int(x) for x in raw_rows[0]]
+    assert row_to_features(integers) == raw_to_features(integers).tolist()
+
+
+def test_batch_matches_single_rows(raw_rows):
+    batch = raw_to_features(raw_rows)
+    assert batch.shape == (len(raw_rows), 17)
+    for row, features in zip(raw_rows, batch):
+        np.testing.assert_array_equal(raw_to_features(row), features)
+
+
+def test_report_features_match_baseline_process_sensor_data(raw_rows):
+    df = pd.DataFrame(raw_rows, columns=[f"value_{i}" for i in range(NUM_RAW_VALUES)])
+    processed = report_visualizer.process_sensor_data(df)
+    np.testing.assert_allclose(processed.to_numpy(), baseline_process_sensor_data(df), rtol=0, atol=1e-9)
+
+
+def test_training_features_match_baseline_process_dataframe_by_name(training_df):
+    # The baseline appended temperature before humidity, unlike format_data at inference; every
+    # column still holds the same values, and only that order changed
+    processed = SmellClassifier().process_dataframe(training_df)
+    baseline = baseline_process_dataframe(training_df)
+    assert sorted(processed.columns) == sorted(baseline.columns)
+    for column in baseline.columns:
+        if column == "class":
+            assert processed[column].tolist() == baseline[column].tolist()
+        else:
+            np.testing.assert_allclose(processed[column], baseline[column], rtol=0, atol=1e-9)
+
+
+def test_feature_order_matches_the_raw_layout(training_df, raw_rows):
+    # Training and inference put the features in the same order, and the names say what they hold
+    processed = SmellClassifier().process_dataframe(training_df)
+    assert processed.columns.tolist() == FEATURE_NAMES + ["class"]
+    assert FEATURE_NAMES[-2:] == ["humidity", "temperature"]
+    np.testing.assert_array_equal(processed["humidity"], training_df["humidity"])
+    np.testing.assert_array_equal(processed["temperature"], training_df["temperature"])
+    np.testing.assert_array_equal(processed[FEATURE_NAMES].to_numpy(), raw_to_features(raw_rows))
+
+
+def test_rejects_wrong_width():
+    with pytest.raises(ValueError):
+        raw_to_features(np.zeros((2, 65)))
+    with pytest.raises(ValueError):
+        row_to_features([0.0] * 65)
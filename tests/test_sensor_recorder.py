@@ -0,0 +1,129 @@
+import csv
+import time
+
+import pytest
+
+import sensor_recorder
+from metrics_registry import MetricsRegistry
+from sensor_recorder import SensorRecorder
+
+HEADER = ["timestamp", "value"]
+
+
+def read_rows(path):
+    with open(path, newline="") as f:
+        return list(csv.reader(f))
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def record_batches(recorder, batches, size):
+    # One batch at a time, so each becomes its own flush
+    for b in range(batches):
+        for i in range(b * size, (b + 1) * size):
+            recorder.record([f"t{i}", i])
+        wait_for(lambda: recorder.rows_written == (b + 1) * size)
+
+
+def test_full_batch_is_written_without_waiting_for_the_interval(tmp_path):
+    path = tmp_path / "sensor.csv"
+    recorder = SensorRecorder(str(path), header=HEADER, batch_size=3, flush_interval=60)
+    try:
+        for i in range(2):
+            recorder.record([f"t{i}", i])
+        time.sleep(0.1)
+        assert recorder.rows_written == 0
+        recorder.record(["t2", 2])
+        wait_for(lambda: recorder.rows_written == 3)
+        assert read_rows(path) == [HEADER, ["t0", "0"], ["t1", "1"], ["t2", "2"]]
+        assert recorder.flushes == 1
+    finally:
+        recorder.close()
+
+
+def test_partial_batch_is_written_after_the_flush_interval(tmp_path):
+    path = tmp_path / "sensor.csv"
+    recorder = SensorRecorder(str(path), header=HEADER, batch_size=50, flush_interval=0.05)
+    try:
+        recorder.record(["t0", 0])
+        wait_for(lambda: recorder.rows_written == 1)
+    finally:
+        recorder.close()
+    assert read_rows(path) == [HEADER, ["t0", "0"]]
+
+
+def test_close_flushes_pending_rows_and_rejects_new_ones(tmp_path):
+    path = tmp_path / "data" / "sensor.csv"
+    recorder = SensorRecorder(str(path), header=HEADER, batch_size=50, flush_interval=60)
+    for i in range(5):
+        recorder.record([f"t{i}", i])
+    recorder.close()
+    assert len(read_rows(path)) == 6
+    assert recorder.rows_written == 5
+    with pytest.raises(RuntimeError):
+        recorder.record(["t5", 5])
+    recorder.close()  # closing twice is harmless
+
+
+def test_header_is_written_once_across_recorders(tmp_path):
+    path = tmp_path / "sensor.csv"
+    for i in range(2):
+        recorder = SensorRecorder(str(path), header=HEADER)
+        recorder.record([f"t{i}", i])
+        recorder.close()
+    assert read_rows(path) == [HEADER, ["t0", "0"], ["t1", "1"]]
+
+
+def test_on_flush_runs_after_each_write_and_its_errors_are_contained(tmp_path):
+    path = tmp_path / "sensor.csv"
+    seen = []
+
+    def on_flush():
+        seen.append(len(read_rows(path)))
+        raise ValueError("dashboard is down")
+
+    recorder = SensorRecorder(str(path), header=HEADER, batch_size=2, flush_interval=60, on_flush=on_flush)
+    try:
+        record_batches(recorder, 2, 2)
+        wait_for(lambda: len(seen) == 2)
+    finally:
+        recorder.close()
+    # The callback sees the rows of its flush already on disk
+    assert seen == [3, 5]
+    assert recorder.rows_written == 4
+
+
+@pytest.mark.parametrize("fsync", [False, True])
+def test_fsync_option(tmp_path, monkeypatch, fsync):
+    synced = []
+    monkeypatch.setattr(sensor_recorder.os, "fsync", lambda fd: synced.append(fd))
+    recorder = SensorRecorder(str(tmp_path / "sensor.csv"), header=HEADER, batch_size=2, flush_interval=60,
+                              fsync=fsync)
+    record_batches(recorder, 2, 2)
+    recorder.close()
+    assert len(synced) == (recorder.flushes if fsync else 0)
+    assert recorder.flushes == 2
+
+
+def test_oldest_rows_are_dropped_past_max_pending(tmp_path):
+    path = tmp_path / "sensor.csv"
+    recorder = SensorRecorder(str(path), header=HEADER, batch_size=100, max_pending=3, flush_interval=60)
+    for i in range(5):
+        recorder.record([f"t{i}", i])
+    recorder.close()
+    assert recorder.rows_dropped == 2
+    assert read_rows(path)[1:] == [["t2", "2"], ["t3", "3"], ["t4", "4"]]
+
+
+def test_write_time_is_observed_per_flush(tmp_path):
+    write_time = MetricsRegistry().histogram("csv_write_ms")
+    recorder = SensorRecorder(str(tmp_path / "sensor.csv"), header=HEADER, batch_size=1, flush_interval=60,
+                              write_time=write_time)
+    record_batches(recorder, 3, 1)
+    recorder.close()
+    assert write_time.snapshot().count == recorder.flushes == 3
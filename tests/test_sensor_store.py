@@ -0,0 +1,51 @@
+import numpy as np
+
+from sensor_recorder import SensorRecorder
+from sensor_store import NUM_VALUES, SensorStore
+
+
+def row(timestamp, value):
+    return [timestamp] + [float(value)] * NUM_VALUES + [1.0, 2.0, ""]
+
+
+def bad_batch():
+    bad_value = row("2025-06-01 10:00:01", 2)
+    bad_value[5] = "n/a"
+    short = row("2025-06-01 10:00:02", 3)[:40]
+    bad_timestamp = row("not a time", 4)
+    return [row("2025-06-01 10:00:00", 1), bad_value, short, bad_timestamp, row("2025-06-01 10:00:03", 5)]
+
+
+def test_batch_with_bad_rows_still_stores_the_good_rows(tmp_path):
+    store = SensorStore(str(tmp_path / "store"))
+    assert store.append_rows(bad_batch()) == 2
+    day = store.read_day("2025-06-01")
+    assert day["values"][:, 0].tolist() == [1.0, 5.0]
+    assert day["positions"].tolist() == [[1.0, 2.0], [1.0, 2.0]]
+    assert store.row_count("2025-06-01") == 2
+
+
+def test_batch_with_only_bad_rows_stores_nothing(tmp_path):
+    store = SensorStore(str(tmp_path / "store"))
+    assert store.append_rows(bad_batch()[1:4]) == 0
+    assert store.partitions() == []
+
+
+def test_numeric_strings_are_stored(tmp_path):
+    store = SensorStore(str(tmp_path / "store"))
+    text_row = ["2025-06-01 10:00:00"] + ["1.5"] * NUM_VALUES + ["", "", "frame.jpg"]
+    assert store.append_rows([text_row]) == 1
+    day = store.read_day("2025-06-01")
+    assert np.all(day["values"] == 1.5)
+    assert np.isnan(day["positions"]).all()
+    assert day["frames"] == ["frame.jpg"]
+
+
+def test_recorder_keeps_the_good_rows_of_a_batch_in_the_store(tmp_path):
+    store = SensorStore(str(tmp_path / "store"))
+    recorder = SensorRecorder(str(tmp_path / "sensor.csv"), store=store, batch_size=50)
+    for r in bad_batch():
+        recorder.record(r)
+    recorder.close()
+    assert recorder.rows_written == 5
+    assert store.read_day("2025-06-01")["values"][:, 0].tolist() == [1.0, 5.0]
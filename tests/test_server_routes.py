@@ -0,0 +1,61 @@
+import pytest
+
+pytest.importorskip("aiortc")
+pytest.importorskip("flask")
+pytest.importorskip("schedule")
+
+import server
+from packet_recorder import PacketRecorder
+from video_recorder import VideoRecorder
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    video = VideoRecorder(str(tmp_path), segment_seconds=server.recording_segment_seconds)
+    packets = PacketRecorder(str(tmp_path), segment_seconds=server.recording_segment_seconds)
+    monkeypatch.setattr(server, "video_recorder", video)
+    monkeypatch.setattr(server, "packet_recorder", packets)
+    yield server.flask_app.test_client()
+    video.close()
+    packets.close()
+
+
+def test_start_and_stop_recording_in_the_default_mode(client):
+    response = client.post("/start-recording")
+    assert response.status_code == 200
+    assert response.get_json() == {"status": "recording started", "mode": server.recording_mode,
+                                   "segment_seconds": server.recording_segment_seconds}
+    assert server.video_recorder.recording
+
+    assert client.post("/start-recording").get_json()["status"] == "already recording"
+
+    response = client.post("/stop-recording")
+    assert response.get_json() == {"status": "recording stopped"}
+    assert not server.video_recorder.recording
+    assert client.post("/stop-recording").get_json() == {"status": "not recording"}
+
+
+@pytest.mark.parametrize("mode", ["raw", "passthrough"])
+def test_start_recording_with_a_mode(client, mode):
+    response = client.post(f"/start-recording?mode={mode}")
+    assert response.status_code == 200
+    assert response.get_json()["mode"] == mode
+    assert server.packet_recorder.recording == (mode == "passthrough")
+    assert server.video_recorder.recording == (mode != "passthrough")
+    assert client.post("/stop-recording").get_json() == {"status": "recording stopped"}
+
+
+def test_start_recording_rejects_an_unknown_mode(client):
+    response = client.post("/start-recording", json={"mode": "bogus"})
+    assert response.status_code == 400
+    assert not server.video_recorder.recording and not server.packet_recorder.recording
+
+
+def test_non_numeric_sensor_values_are_not_recorded(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(server, "sensor_recorder", type("Recorder", (), {"record": lambda self, r: recorded.append(r)})())
+    server.record_sensor_data_to_csv([1.0] * 65 + ["n/a"], "2025-06-01 10:00:00")
+    server.record_sensor_data_to_csv([1.0] * 65, "2025-06-01 10:00:00")
+    assert recorded == []
+    server.record_sensor_data_to_csv([1.0] * 66, "2025-06-01 10:00:00", 3.0, 4.0, "frame.jpg")
+    assert recorded == [["2025-06-01 10:00:00"] + [1.0] * 66 + [3.0, 4.0, "frame.jpg"]]
@@ -0,0 +1,107 @@
+import json
+import threading
+import time
+
+from sse_broker import SSEBroker, parse_last_event_id
+
+
+def events(messages):
+    return [(m.event, json.loads(m.data)) for m in messages]
+
+
+def test_every_subscriber_gets_every_event_in_order():
+    broker = SSEBroker()
+    first, second = broker.subscribe(), broker.subscribe()
+    ids = [broker.publish("sensor_update", {"n": n}) for n in range(3)]
+    assert ids == sorted(ids) and len(set(ids)) == 3
+    for subscription in (first, second):
+        messages = subscription.get(timeout=0)
+        assert events(messages) == [("sensor_update", {"n": n}) for n in range(3)]
+        assert [m.id for m in messages] == ids
+    assert first.get(timeout=0) == []
+
+
+def test_high_rate_state_events_are_coalesced():
+    broker = SSEBroker()
+    subscription = broker.subscribe()
+    broker.publish("metrics_update", {"frames": 1})
+    broker.publish("sensor_update", {"n": 1})
+    broker.publish("metrics_update", {"frames": 2})
+    broker.publish("robot_position_update", {"x": 1})
+    broker.publish("metrics_update", {"frames": 3})
+
+    assert events(subscription.get(timeout=0)) == [
+        ("sensor_update", {"n": 1}),
+        ("robot_position_update", {"x": 1}),
+        ("metrics_update", {"frames": 3}),
+    ]
+    assert subscription.dropped == 2
+
+
+def test_reconnect_replays_events_after_last_event_id():
+    broker = SSEBroker()
+    ids = [broker.publish("sensor_update", {"n": n}) for n in range(5)]
+    broker.publish("metrics_update", {"frames": 1})
+    latest_metrics = broker.publish("metrics_update", {"frames": 2})
+
+    resumed = broker.subscribe(last_event_id=ids[2])
+    messages = resumed.get(timeout=0)
+    assert events(messages) == [("sensor_update", {"n": 3}), ("sensor_update", {"n": 4}),
+                                ("metrics_update", {"frames": 2})]
+    assert messages[-1].id == latest_metrics
+
+    assert broker.subscribe(last_event_id=latest_metrics).get(timeout=0) == []
+    assert broker.subscribe().get(timeout=0) == []  # new clients get no backlog
+
+
+def test_replay_window_is_bounded():
+    broker = SSEBroker(replay_size=3)
+    first = broker.publish("sensor_update", {"n": 0})
+    for n in range(1, 6):
+        broker.publish("sensor_update", {"n": n})
+    assert [data["n"] for _, data in events(broker.subscribe(last_event_id=first).get(timeout=0))] == [3, 4, 5]
+
+
+def test_slow_subscriber_loses_its_oldest_events_without_holding_back_others():
+    broker = SSEBroker(buffer_size=4)
+    slow, fast = broker.subscribe(), broker.subscribe()
+    received = []
+    for n in range(10):
+        broker.publish("sensor_update", {"n": n})
+        received.extend(fast.get(timeout=0))
+
+    assert [data["n"] for _, data in events(received)] == list(range(10))
+    assert fast.dropped == 0
+    assert [data["n"] for _, data in events(slow.get(timeout=0))] == [6, 7, 8, 9]
+    assert slow.dropped == 6
+
+
+def test_get_waits_for_a_publish_and_times_out():
+    broker = SSEBroker()
+    subscription = broker.subscribe()
+    start = time.monotonic()
+    assert subscription.get(timeout=0.05) == []
+    assert time.monotonic() - start >= 0.04
+
+    threading.Timer(0.05, broker.publish, args=("sensor_update", {"n": 1})).start()
+    assert events(subscription.get(timeout=2)) == [("sensor_update", {"n": 1})]
+
+
+def test_unsubscribed_clients_get_nothing():
+    broker = SSEBroker()
+    subscription = broker.subscribe()
+    assert broker.subscriber_count == 1
+    subscription.close()
+    broker.publish("sensor_update", {"n": 1})
+    assert broker.subscriber_count == 0
+    assert subscription.get(timeout=0) == []
+
+
+def test_message_format_and_last_event_id_parsing():
+    broker = SSEBroker()
+    subscription = broker.subscribe()
+    message_id = broker.publish("map_clear", {"message": "hi"})
+    assert subscription.get(timeout=0)[0].format() == f'id: {message_id}\nevent: map_clear\ndata: {{"message": "hi"}}\n\n'
+    assert parse_last_event_id("42") == 42
+    assert parse_last_event_id(None) is None
+    assert parse_last_event_id("abc") is None
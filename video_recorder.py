@@ -0,0 +1,236 @@
+# video_recorder.py
+
+import fractions
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import av
+import numpy as np
+
+RECORDING_MODES = ("annotated", "raw")
+TIME_BASE = fractions.Fraction(1, 1000)
+_STOP = object()
+
+
+def default_codec():
+    return "libx264" if "libx264" in av.codecs_available else "mpeg4"
+
+
+class VideoRecorder:
+    """
+    Records the video feed to segmented MP4 files from a background thread.
+
+    `submit()` never blocks the render thread. Frames go into a bounded queue, and if the encoder
+    falls behind the newest ones are dropped and counted. Each frame carries its source timestamp
+    (the camera PTS), so files play back at the pace the camera captured them however often frames
+    were rendered or analyzed. A new file starts every `segment_seconds`, when the resolution
+    changes (e.g. switching between the grid and fullscreen views) and when the timeline jumps
+    (a robot reconnecting).
+
+    Mode "annotated" records the grid shown on /video_feed; mode "raw" records the decoded camera
+    frames directly, without converting them to BGR.
+    """
+
+    def __init__(self, directory, segment_seconds=300, mode="annotated", max_queue=60, codec=None,
+                 max_gap=5.0, write_time=None):
+        """
+        :param directory: Where segments are written, as recorded_video_<YYYYmmdd_HHMMSS>.mp4.
+        :param segment_seconds: Maximum length of one file, in source time.
+        :param mode: Default recording mode, "annotated" or "raw".
+        :param max_queue: Frames that may wait for the encoder before new ones are dropped.
+        :param codec: PyAV encoder name; libx264 when available, otherwise mpeg4.
+        :param max_gap: A timestamp gap (seconds) beyond which the next frame starts a new file.
+        :param write_time: Optional metrics_registry.Histogram observing each frame's encode in ms.
+        """
+        if mode not in RECORDING_MODES:
+            raise ValueError(f"Unknown recording mode '{mode}', expected one of {RECORDING_MODES}")
+        self.directory = directory
+        self.segment_seconds = segment_seconds
+        self.default_mode = mode
+        self.mode = mode
+        self.codec = codec or default_codec()
+        self.max_gap = max_gap
+        self.write_time = write_time
+        self.recording = False
+
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.segments_written = 0
+        self.failed = 0
+        self.current_file = None
+
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._container = None
+        self._stream = None
+        self._size = None
+        self._segment_start = None
+        self._last_time = None
+        self._last_pts = -1
+        self._reformatter = None
+        self._thread = threading.Thread(target=self._run, name="video-recorder", daemon=True)
+        self._thread.start()
+
+    def start(self, mode=None):
+        """
+        Starts recording in `mode` (the default mode if None).
+
+        :return: False if a recording is already running.
+        """
+        mode = mode or self.default_mode
+        if mode not in RECORDING_MODES:
+            raise ValueError(f"Unknown recording mode '{mode}', expected one of {RECORDING_MODES}")
+        with self._lock:
+            if self.recording:
+                return False
+            self.mode = mode
+            self.recording = True
+            return True
+
+    def stop(self):
+        """
+        Stops recording; frames already queued are still written before the file is closed.
+
+        :return: False if nothing was being recorded.
+        """
+        with self._lock:
+            if not self.recording:
+                return False
+            self.recording = False
+        self._queue.put(_STOP)
+        return True
+
+    def submit(self, image, timestamp):
+        """
+        Queues one frame for the current recording. Safe to call from any thread.
+
+        :param image: An av.VideoFrame, or a BGR ndarray (copied, so the caller may reuse it).
+        :param timestamp: Source time of the frame in seconds, e.g. `frame.time`.
+        :return: False if not recording or the frame was dropped.
+        """
+        if not self.recording:
+            return False
+        if isinstance(image, np.ndarray):
+            image = av.VideoFrame.from_ndarray(image, format="bgr24")
+        try:
+            self._queue.put_nowait((image, timestamp))
+        except queue.Full:
+            with self._lock:
+                self.frames_dropped += 1
+            return False
+        return True
+
+    def close(self):
+        with self._lock:
+            self.recording = False
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "recording": self.recording,
+                "recording_mode": self.mode,
+                "recording_file": self.current_file,
+                "recording_frames_written": self.frames_written,
+                "recording_frames_dropped": self.frames_dropped,
+                "recording_segments": self.segments_written,
+                "recording_failures": self.failed,
+                "recording_queue": self._queue.qsize(),
+            }
+
+    # === WRITER THREAD ===
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None or item is _STOP:
+                self._close_segment()
+                if item is None:
+                    return
+                continue
+            frame, timestamp = item
+            try:
+                start = time.perf_counter()
+                self._write(frame, timestamp)
+                if self.write_time is not None:
+                    self.write_time.observe((time.perf_counter() - start) * 1000)
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                print(f"❌ VideoRecorder failed to write a frame to {self.current_file}: {e}")
+                self._close_segment()
+
+    def _write(self, frame, timestamp):
+        # libx264 and mpeg4 need even dimensions
+        size = (frame.width - frame.width % 2, frame.height - frame.height % 2)
+        if self._container is not None and (
+                size != self._size
+                or timestamp < self._last_time
+                or timestamp - self._last_time > self.max_gap
+                or timestamp - self._segment_start >= self.segment_seconds):
+            self._close_segment()
+        if self._container is None:
+            self._open_segment(size, timestamp)
+
+        if self._reformatter is None:
+            from av.video.reformatter import VideoReformatter
+            self._reformatter = VideoReformatter()
+        # Own reformatter: the render and inference threads may be converting this frame too
+        out = self._reformatter.reformat(frame, width=size[0], height=size[1], format="yuv420p")
+        if out is frame:
+            # Already in the right format; copy it so setting pts does not touch the shared frame
+            out = av.VideoFrame.from_ndarray(frame.to_ndarray(), format="yuv420p")
+        pts = round((timestamp - self._segment_start) / TIME_BASE)
+        out.pts = max(pts, self._last_pts + 1)
+        out.time_base = TIME_BASE
+        for packet in self._stream.encode(out):
+            self._container.mux(packet)
+        self._last_pts = out.pts
+        self._last_time = timestamp
+        with self._lock:
+            self.frames_written += 1
+
+    def _open_segment(self, size, timestamp):
+        os.makedirs(self.directory, exist_ok=True)
+        name = datetime.now().strftime('recorded_video_%Y%m%d_%H%M%S')
+        path = os.path.join(self.directory, f"{name}.mp4")
+        n = 2
+        while os.path.exists(path):
+            path = os.path.join(self.directory, f"{name}_{n}.mp4")
+            n += 1
+
+        container = av.open(path, "w")
+        stream = container.add_stream(self.codec, rate=30)
+        stream.width, stream.height = size
+        stream.pix_fmt = "yuv420p"
+        # Millisecond timestamps; the nominal rate above only guides the encoder's rate control
+        stream.time_base = TIME_BASE
+        stream.codec_context.time_base = TIME_BASE
+        if self.codec == "libx264":
+            stream.options = {"preset": "veryfast"}
+
+        self._container, self._stream, self._size = container, stream, size
+        self._segment_start = self._last_time = timestamp
+        self._last_pts = -1
+        with self._lock:
+            self.current_file = path
+        print(f"🎥 Recording video to {path}")
+
+    def _close_segment(self):
+        if self._container is None:
+            return
+        try:
+            for packet in self._stream.encode():
+                self._container.mux(packet)
+            self._container.close()
+            with self._lock:
+                self.segments_written += 1
+        except Exception as e:
+            print(f"❌ VideoRecorder failed to finish {self.current_file}: {e}")
+        finally:
+            self._container = self._stream = self._size = None
+            with self._lock:
+                self.current_file = None
@@ -1,20 +1,123 @@
 import cv2
 import math
+import os
+import shutil
+import time
+import numpy as np
 from ultralytics import YOLO
 from fall_tracking import FallTracker
 
+BACKENDS = ("torch", "onnx", "openvino")
+
+
+class FrameAnalysis:
+    """
+    Structured output of a single pose-model forward pass over a frame.
+
+    Every fall heuristic and overlay in FallDetector can consume the same FrameAnalysis,
+    so a frame only has to go through the model once no matter how many views are drawn.
+    Row i of `boxes`, `box_confs`, `keypoints` and `keypoint_confs` all describe the same person.
+    """
+
+    def __init__(self, shape, boxes, box_confs, keypoints, keypoint_confs=None):
+        """
+        :param shape: (height, width) of the analyzed image.
+        :param boxes: (N, 4) int array of person boxes as x1, y1, x2, y2.
+        :param box_confs: (N,) float array of box confidences.
+        :param keypoints: (N, 17, 2) float array of keypoint coordinates, (0, 0) when missing.
+        :param keypoint_confs: (N, 17) float array of keypoint confidences, or None.
+        """
+        self.shape = shape
+        self.boxes = boxes
+        self.box_confs = box_confs
+        self.keypoints = keypoints
+        self.keypoint_confs = keypoint_confs
+
+    def __len__(self):
+        return len(self.boxes)
+
+    @classmethod
+    def empty(cls, shape):
+        return cls(shape, np.zeros((0, 4), dtype=int), np.zeros(0, dtype=np.float32),
+                   np.zeros((0, 17, 2), dtype=np.float32))
+
+
+def export_model(model_path, backend, int8=False, imgsz=640):
+    """
+    Exports a PyTorch pose model to an optimized CPU runtime, caching the result next to the weights.
+
+    The artifact is reused until the .pt file is newer than it. ONNX models are exported with a
+    dynamic batch axis so analyze_batch() works; INT8 ONNX uses ONNX Runtime dynamic (weight-only)
+    quantization, while INT8 OpenVINO is quantized by the ultralytics exporter (NNCF), which needs
+    its calibration dataset.
+
+    :param model_path: Path to the .pt weights.
+    :param backend: "onnx" or "openvino".
+    :param int8: Quantize the exported model to INT8.
+    :param imgsz: Inference image size baked into the export.
+    :return: Path to the exported model file or directory, loadable with YOLO(path, task="pose").
+    """
+    if backend not in ("onnx", "openvino"):
+        raise ValueError(f"Cannot export to backend {backend!r}; expected 'onnx' or 'openvino'")
+    stem = os.path.splitext(model_path)[0]
+    suffix = "_int8" if int8 else ""
+    if backend == "onnx":
+        artifact = f"{stem}{suffix}.onnx"
+    else:
+        artifact = f"{stem}{suffix}_openvino_model"
+
+    if os.path.exists(artifact) and os.path.getmtime(artifact) >= os.path.getmtime(model_path):
+        return artifact
+
+    print(f"Exporting {model_path} to {artifact} (first run only)...")
+    model = YOLO(model_path)
+    if backend == "onnx":
+        exported = model.export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+        if int8:
+            _quantize_onnx(exported, artifact)
+            return artifact
+    else:
+        exported = model.export(format="openvino", imgsz=imgsz, dynamic=True, int8=int8)
+    exported = str(exported)
+    if os.path.abspath(exported) != os.path.abspath(artifact):
+        if os.path.isdir(artifact):
+            shutil.rmtree(artifact)
+        shutil.move(exported, artifact)
+    return artifact
+
+
+def _quantize_onnx(src, dst):
+    import onnx
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(src, dst, weight_type=QuantType.QUInt8)
+    # ultralytics reads class names, stride and keypoint shape from the model metadata
+    source, quantized = onnx.load(src), onnx.load(dst)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(source.metadata_props)
+    onnx.save(quantized, dst)
+
 
 class FallDetector:
     """A class for detecting people and identifying potential falls using YOLO."""
 
-    def __init__(self, model_path="yolo_weights/yolo11n-pose.pt", conf_threshold=0.3):
+    def __init__(self, model_path="yolo_weights/yolo11n-pose.pt", conf_threshold=0.3, backend="torch", int8=False):
         """
         Initializes the FallDetector class.
 
-        :param model_path: Path to the YOLO pose detection model.
+        :param model_path: Path to the YOLO pose detection model (.pt).
         :param conf_threshold: Confidence threshold for detecting people.
+        :param backend: "torch" to run the weights directly, or "onnx"/"openvino" to run a CPU-optimized
+                        export of them (created and cached next to the weights on first use).
+        :param int8: Use an INT8-quantized export (onnx/openvino only).
         """
-        self.model = YOLO(model_path)
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend!r}; expected one of {BACKENDS}")
+        self.backend = backend
+        if backend == "torch":
+            self.model = YOLO(model_path)
+        else:
+            self.model = YOLO(export_model(model_path, backend, int8), task="pose")
         self.conf_threshold = conf_threshold
         self.UKBlue = (160, 51, 0)  # IN BGR
         self.Bluegrass = (255, 138, 30)
@@ -31,187 +134,257 @@ class FallDetector:
         ]
         self.fall_tracker = FallTracker(cooldown=1.0, persistence=1.0)
 
+    def analyze(self, img):
+        """
+        Runs the pose model once over a frame and returns a FrameAnalysis.
+
+        :param img: The input frame (numpy array, BGR). It is not modified.
+        :return: FrameAnalysis holding person boxes, confidences and keypoints.
+        """
+        results = self.model(img, conf=self.conf_threshold, verbose=False)
+        return self._to_analysis(results[0], img.shape[:2])
+
+    def analyze_batch(self, imgs):
+        """
+        Runs the pose model once over several frames (e.g. the latest frame of every robot).
+
+        The frames are letterboxed into a single batch, so the per-call preprocessing and
+        dispatch overhead is paid once rather than once per frame.
+
+        :param imgs: List of BGR frames; they may differ in size.
+        :return: List of FrameAnalysis, one per frame, in the same order.
+        """
+        if not imgs:
+            return []
+        results = self.model(list(imgs), conf=self.conf_threshold, verbose=False)
+        return [self._to_analysis(result, img.shape[:2]) for result, img in zip(results, imgs)]
+
+    def _to_analysis(self, result, shape):
+        if result.boxes is None or len(result.boxes) == 0:
+            return FrameAnalysis.empty(shape)
+
+        person = result.boxes.cls.cpu().numpy().astype(int) == 0
+        boxes = result.boxes.xyxy.cpu().numpy()[person].astype(int)
+        box_confs = result.boxes.conf.cpu().numpy()[person]
+
+        if result.keypoints is not None:
+            keypoints = result.keypoints.xy.cpu().numpy()[person]
+            keypoint_confs = result.keypoints.conf
+            if keypoint_confs is not None:
+                keypoint_confs = keypoint_confs.cpu().numpy()[person]
+        else:
+            keypoints = np.zeros((len(boxes), 17, 2), dtype=np.float32)
+            keypoint_confs = None
+
+        return FrameAnalysis(shape, boxes, box_confs, keypoints, keypoint_confs)
+
+    # === FALL HEURISTICS (one flag per person in the analysis) ===
+    @staticmethod
+    def box_falls(analysis):
+        """A person is fallen when their bounding box is wider than it is tall."""
+        boxes = analysis.boxes
+        return (boxes[:, 3] - boxes[:, 1]) < (boxes[:, 2] - boxes[:, 0])
+
+    @staticmethod
+    def pose_falls(analysis):
+        """
+        A person is fallen when either shoulder-to-ankle vertical distance is shorter than the
+        shoulder-to-hip distance. People missing any of the required keypoints are never fallen.
+        """
+        fallen = np.zeros(len(analysis), dtype=bool)
+        for i, points in enumerate(analysis.keypoints):
+            measures = FallDetector._pose_measures(points)
+            if measures is not None:
+                dist_shoulder_ankle_L, dist_shoulder_ankle_R, dist_shoulder_hip = measures[:3]
+                fallen[i] = (dist_shoulder_ankle_L < dist_shoulder_hip) or (dist_shoulder_ankle_R < dist_shoulder_hip)
+        return fallen
+
+    @staticmethod
+    def bottom_falls(analysis, line_frac=1 / 2):
+        """A person is fallen when every visible keypoint is below the line at `line_frac` of the height."""
+        line_height = int(analysis.shape[0] * line_frac)
+        points = analysis.keypoints
+        visible = (points[:, :, 0] != 0) | (points[:, :, 1] != 0)
+        below = (points[:, :, 1] > line_height) | ~visible
+        return visible.any(axis=1) & below.all(axis=1)
+
+    def fall_verdicts(self, analysis):
+        """(N, len(FALL_METHODS)) bool array of every method's verdict for every person."""
+        verdicts = np.column_stack([self.box_falls(analysis), self.pose_falls(analysis),
+                                    self.bottom_falls(analysis)]).reshape(len(analysis), 3)
+        return np.column_stack([verdicts, verdicts.all(axis=1)])
+
+    def track_falls(self, analysis, tracker):
+        """
+        Feeds every person's per-method verdicts to a FallTracker built with methods=FALL_METHODS.
+
+        :return: {method: ids of the tracks whose fall was confirmed in this frame}
+        """
+        boxes = analysis.boxes
+        centroids = (boxes[:, :2] + boxes[:, 2:]) // 2
+        return tracker.observe(centroids, self.fall_verdicts(analysis))
+
+    @staticmethod
+    def _pose_measures(points):
+        required_points_indices = [5, 6, 11, 12, 15, 16]
+        if len(points) <= max(required_points_indices) or any(points[idx][0] == 0 and points[idx][1] == 0 for idx in required_points_indices):
+            return None  # Critical points are missing or out of bounds
 
-    def test_process_frame_box(self, img):
-        results = self.model(img, stream=True, conf=self.conf_threshold, verbose=False)
+        shoulder_avg = (points[5] + points[6]) / 2
+        hip_avg = (points[11] + points[12]) / 2
+
+        # Vertical distances (y-axis)
+        dist_shoulder_ankle_L = abs(points[15][1] - points[5][1])
+        dist_shoulder_ankle_R = abs(points[16][1] - points[6][1])
+
+        # True (Euclidean) distance between shoulders and hips
+        dist_shoulder_hip = math.sqrt((shoulder_avg[0] - hip_avg[0])**2 + (shoulder_avg[1] - hip_avg[1])**2)
+        return dist_shoulder_ankle_L, dist_shoulder_ankle_R, dist_shoulder_hip, shoulder_avg, hip_avg
+
+
+    def test_process_frame_box(self, img, analysis=None, tracker=None, track=True):
+        """
+        Draws person boxes and tracks box-based falls.
+
+        :param img: The frame to draw on (numpy array).
+        :param analysis: Optional FrameAnalysis for this frame; the model is run if omitted.
+        :param tracker: FallTracker to update, e.g. one per camera; defaults to self.fall_tracker.
+        :param track: Set False to only draw, when falls are tracked separately (see track_falls).
+        :return: (frame, fall triggered, person count, unique faller count)
+        """
+        if analysis is None:
+            analysis = self.analyze(img)
+        if tracker is None:
+            tracker = self.fall_tracker
         centroids_fallen = []
         height, width, _ = img.shape
         person_count = 0
 
-        for r in results:
-            for box in r.boxes:
-                if int(box.cls[0]) == 0:
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    cx = (x1 + x2) // 2
-                    cy = (y1 + y2) // 2
-                    person_count += 1
+        for (x1, y1, x2, y2), conf, is_fallen in zip(analysis.boxes, analysis.box_confs, self.box_falls(analysis)):
+            x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+            cx = (x1 + x2) // 2
+            cy = (y1 + y2) // 2
+            person_count += 1
 
-                    confidence = math.ceil((box.conf[0] * 100)) / 100
-                    cv2.rectangle(img, (x1, y1), (x2, y2), self.UKBlue, 3)
-                    cv2.putText(img, f"Person {confidence:.2f}", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, self.Bluegrass, 2)
+            confidence = math.ceil((conf * 100)) / 100
+            cv2.rectangle(img, (x1, y1), (x2, y2), self.UKBlue, 3)
+            cv2.putText(img, f"Person {confidence:.2f}", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, self.Bluegrass, 2)
 
-                    # Determine if this box is a fall
-                    w, h = x2 - x1, y2 - y1
-                    is_fallen = h < w  # horizontal aspect → fallen
-                    if is_fallen:
-                        cv2.putText(img, "Fall Detected", (20, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, self.UKBlue, 2)
+            # Determine if this box is a fall (horizontal aspect → fallen)
+            if is_fallen:
+                cv2.putText(img, "Fall Detected", (20, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, self.UKBlue, 2)
 
-                    centroids_fallen.append((cx, cy, is_fallen))
+            centroids_fallen.append((cx, cy, bool(is_fallen)))
 
         # === Update tracker
-        triggered_ids = self.fall_tracker.update(centroids_fallen)
+        triggered_ids = tracker.update(centroids_fallen) if track else []
 
-        return img, len(triggered_ids) > 0, person_count, self.fall_tracker.get_unique_faller_count()
+        return img, len(triggered_ids) > 0, person_count, tracker.get_unique_faller_count()
     
-    def test_process_frame_pose(self, img):
+    def test_process_frame_pose(self, img, analysis=None):
         """
         Processes a single frame and plots pose keypoints detected by YOLO.
 
         :param img: The input frame (numpy array).
+        :param analysis: Optional FrameAnalysis for this frame; the model is run if omitted.
         :return: Frame with keypoints plotted.
         """
-        results = self.model(img, stream=True, conf=self.conf_threshold, verbose=False)
-
-        # Iterate over the detection results
-        for result in results:
-            keypoints = result.keypoints
-
-            if keypoints is not None:
-                for person_keypoints in keypoints.xy:
-                    for idx, keypoint in enumerate(person_keypoints):
-                        x, y = map(int, keypoint[:2])
-                        # Plot keypoints on the image
-                        cv2.circle(img, (x, y), 5, self.UKBlue, -1)
-
-                        # # Optionally label keypoints
-                        # joint_name = [
-                        #     "Nose", "Left Eye", "Right Eye", "Left Ear", "Right Ear",
-                        #     "Left Shoulder", "Right Shoulder", "Left Elbow", "Right Elbow",
-                        #     "Left Wrist", "Right Wrist", "Left Hip", "Right Hip",
-                        #     "Left Knee", "Right Knee", "Left Ankle", "Right Ankle"
-                        # ][idx]
-                        # cv2.putText(img, joint_name, (x + 5, y - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, self.UKBlue, 1)
+        if analysis is None:
+            analysis = self.analyze(img)
+
+        for person_keypoints in analysis.keypoints:
+            for idx, keypoint in enumerate(person_keypoints):
+                x, y = map(int, keypoint[:2])
+                # Plot keypoints on the image
+                cv2.circle(img, (x, y), 5, self.UKBlue, -1)
 
         return img
     
-    def test_process_frame_pose_fall(self, img):
-        results = self.model(img, stream=True, conf=self.conf_threshold, verbose=False)
+    def test_process_frame_pose_fall(self, img, analysis=None):
+        if analysis is None:
+            analysis = self.analyze(img)
         fallen = False
         height, width, _ = img.shape
 
-        for r in results:
-            for keypoints in r.keypoints.xy:
-                points = keypoints.cpu().numpy()
-                if len(points) < 17:
-                    continue  # Skip if insufficient keypoints
-
-                # Plot keypoints
-                for idx, (x, y) in enumerate(points):
-                    if x == 0 and y == 0:
-                        continue
-                    cv2.circle(img, (int(x), int(y)), 5, self.Bluegrass, -1)
-                    
-                    # Print keypoints body labels
-                    # cv2.putText(img, self.keypoints_labels[idx], (int(x) + 5, int(y) - 5), 
-                    #             cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
-
-                # Fall detection logic with error handling
-                required_points_indices = [5, 6, 11, 12, 15, 16]
-                if len(points) <= max(required_points_indices) or any(points[idx][0] == 0 and points[idx][1] == 0 for idx in required_points_indices):
-                    continue  # Skip detection if critical points are missing or out of bounds
-
-                required_points = {
-                    "LShoulder": points[5],
-                    "RShoulder": points[6],
-                    "LHip": points[11],
-                    "RHip": points[12],
-                    "LAnkle": points[15],
-                    "RAnkle": points[16]
-                }
-
-                shoulder_avg = (required_points["LShoulder"] + required_points["RShoulder"]) / 2
-                hip_avg = (required_points["LHip"] + required_points["RHip"]) / 2
-
-                # Vertical distances (y-axis)
-                dist_shoulder_ankle_L = abs(required_points["LAnkle"][1] - required_points["LShoulder"][1])
-                dist_shoulder_ankle_R = abs(required_points["RAnkle"][1] - required_points["RShoulder"][1])
-
-                # True (Euclidean) distance between shoulders and hips
-                dist_shoulder_hip = math.sqrt((shoulder_avg[0] - hip_avg[0])**2 + (shoulder_avg[1] - hip_avg[1])**2)
-
-                # Visualization lines
-                cv2.line(img, tuple(shoulder_avg.astype(int)), tuple(hip_avg.astype(int)), self.Golenrod, 2)
-                cv2.putText(img, f"S-H: {dist_shoulder_hip:.1f}", (int(shoulder_avg[0]), int(shoulder_avg[1]-40)),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, self.Golenrod, 2)
-
-
-                # #line from ankle to shoulder
-                # cv2.line(img, tuple(required_points["LShoulder"].astype(int)), tuple(required_points["LAnkle"].astype(int)), (0, 255, 255), 2)
-                # cv2.line(img, tuple(required_points["RShoulder"].astype(int)), tuple(required_points["RAnkle"].astype(int)), (0, 255, 255), 2)
-
-                #line from ankle to vertical distance up calculated above to shoulder
-                cv2.line(img, tuple(required_points["LAnkle"].astype(int)), (int(required_points["LAnkle"][0]), int(required_points["LAnkle"][1] - dist_shoulder_ankle_L)), self.UKBlue, 2)
-                cv2.line(img, tuple(required_points["RAnkle"].astype(int)), (int(required_points["RAnkle"][0]), int(required_points["RAnkle"][1] - dist_shoulder_ankle_R)), self.UKBlue, 2)
-
-
-
-                cv2.putText(img, f"LS-LA: {dist_shoulder_ankle_L:.1f}", (int(required_points["LShoulder"][0]), int(required_points["LShoulder"][1]-10)),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, self.UKBlue, 2)
-                cv2.putText(img, f"RS-RA: {dist_shoulder_ankle_R:.1f}", (int(required_points["RShoulder"][0]), int(required_points["RShoulder"][1]+20)),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, self.UKBlue, 2)
-
-                # Determine fall
-                if (dist_shoulder_ankle_L < dist_shoulder_hip) or (dist_shoulder_ankle_R < dist_shoulder_hip):
-                    fallen = True
-                    x1, y1 = int(shoulder_avg[0]), int(shoulder_avg[1])
-                    
-                    # # Text on top of person
-                    # cv2.putText(img, "Fall Detected", (x1, y1 - 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, self.UKBlue, 3)
-                    
-                    # Text in top right
-                    cv2.putText(img, "Fall Detected", (width - 120, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, self.UKBlue, 3)
-
+        for points, person_fallen in zip(analysis.keypoints, self.pose_falls(analysis)):
+            if len(points) < 17:
+                continue  # Skip if insufficient keypoints
+
+            # Plot keypoints
+            for idx, (x, y) in enumerate(points):
+                if x == 0 and y == 0:
+                    continue
+                cv2.circle(img, (int(x), int(y)), 5, self.Bluegrass, -1)
+
+            measures = self._pose_measures(points)
+            if measures is None:
+                continue  # Skip detection if critical points are missing or out of bounds
+            dist_shoulder_ankle_L, dist_shoulder_ankle_R, dist_shoulder_hip, shoulder_avg, hip_avg = measures
+
+            # Visualization lines
+            cv2.line(img, tuple(shoulder_avg.astype(int)), tuple(hip_avg.astype(int)), self.Golenrod, 2)
+            cv2.putText(img, f"S-H: {dist_shoulder_hip:.1f}", (int(shoulder_avg[0]), int(shoulder_avg[1]-40)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, self.Golenrod, 2)
+
+            #line from ankle to vertical distance up calculated above to shoulder
+            cv2.line(img, tuple(points[15].astype(int)), (int(points[15][0]), int(points[15][1] - dist_shoulder_ankle_L)), self.UKBlue, 2)
+            cv2.line(img, tuple(points[16].astype(int)), (int(points[16][0]), int(points[16][1] - dist_shoulder_ankle_R)), self.UKBlue, 2)
+
+            cv2.putText(img, f"LS-LA: {dist_shoulder_ankle_L:.1f}", (int(points[5][0]), int(points[5][1]-10)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, self.UKBlue, 2)
+            cv2.putText(img, f"RS-RA: {dist_shoulder_ankle_R:.1f}", (int(points[6][0]), int(points[6][1]+20)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, self.UKBlue, 2)
+
+            # Determine fall
+            if person_fallen:
+                fallen = True
+                # Text in top right
+                cv2.putText(img, "Fall Detected", (width - 120, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, self.UKBlue, 3)
 
         return img, fallen
 
-    def bottom_frac_fall_detection(self, img):
+    def bottom_frac_fall_detection(self, img, analysis=None):
+        if analysis is None:
+            analysis = self.analyze(img)
         height, width, _ = img.shape
         line_height = int(height * 1 / 2)
 
         cv2.line(img, (0, line_height), (width, line_height), self.UKBlue, 2)
 
-        results = self.model(img, conf=self.conf_threshold, verbose=False)
-        fallen = False
+        person_falls = self.bottom_falls(analysis)
+        fallen = bool(person_falls.any())
 
-        for r in results:
-            for keypoints in r.keypoints.xy:
-                points = keypoints.cpu().numpy()
-                valid_points = [(x, y) for x, y in points if x != 0 or y != 0]
+        for points, person_fallen in zip(analysis.keypoints, person_falls):
+            if person_fallen:
+                #Text in bottom left
+                cv2.putText(img, "Fall Detected", (20, height - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, self.UKBlue, 3)
 
-                if valid_points and all(y > line_height for x, y in valid_points):
-                    fallen = True
-                    # #Text above line
-                    # cv2.putText(img, "Fall Detected", (30, line_height - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, self.UKBlue, 3)
-                    
-                    #Text in bottom left
-                    cv2.putText(img, "Fall Detected", (20, height - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, self.UKBlue, 3)
-
-
-                for x, y in valid_points:
+            for x, y in points:
+                if x != 0 or y != 0:
                     cv2.circle(img, (int(x), int(y)), 4, self.Bluegrass, -1)
 
         return img, fallen
 
-    def combined_frame(self, img):
-        fallen = False
+    def combined_frame(self, img, analysis=None):
+        if analysis is None:
+            analysis = self.analyze(img)
 
-        height, width, _ = img.shape
-        box_img, box_fallen, _, _ = self.test_process_frame_box(img.copy())
-        pose_img, pose_fallen = self.test_process_frame_pose_fall(img.copy())
-        bottom_img, bottom_fallen = self.bottom_frac_fall_detection(img.copy())
+        box_img, box_fallen, _, _ = self.test_process_frame_box(img.copy(), analysis)
+        pose_img, pose_fallen = self.test_process_frame_pose_fall(img.copy(), analysis)
+        bottom_img, bottom_fallen = self.bottom_frac_fall_detection(img.copy(), analysis)
+
+        return self.combine_overlays(box_img, pose_img, bottom_img, box_fallen, pose_fallen, bottom_fallen)
+
+    def combine_overlays(self, box_img, pose_img, bottom_img, box_fallen, pose_fallen, bottom_fallen, out=None):
+        """
+        Blends already-drawn box/pose/bottom views into the consensus view without re-running anything.
+
+        :param out: Optional preallocated image (same shape as the views) to blend into.
+        """
+        fallen = False
 
-        combined_img = cv2.addWeighted(box_img, 0.33, pose_img, 0.33, 0)
-        combined_img = cv2.addWeighted(combined_img, 1, bottom_img, 0.34, 0)
+        combined_img = cv2.addWeighted(box_img, 0.33, pose_img, 0.33, 0, dst=out)
+        combined_img = cv2.addWeighted(combined_img, 1, bottom_img, 0.34, 0, dst=combined_img)
 
         if box_fallen and pose_fallen and bottom_fallen:
             fallen = True
@@ -220,50 +393,186 @@ class FallDetector:
 
         return combined_img, fallen
 
-    def draw_glasses_mustache(self, img):
+    def draw_glasses_mustache(self, img, analysis=None):
         BLACK = (0, 0, 0)
-        results = self.model(img, stream=True, conf=self.conf_threshold, verbose=False)
+        if analysis is None:
+            analysis = self.analyze(img)
 
-        for r in results:
-            if hasattr(r, "keypoints"):
-                for keypoints in r.keypoints.xy:
-                    keypoints_list = keypoints.cpu().numpy().tolist()
+        for keypoints in analysis.keypoints:
+            keypoints_list = keypoints.tolist()
 
-                    if len(keypoints_list) >= 5 and all(kp != [0.0, 0.0] for kp in keypoints_list[:5]):
-                        nose = tuple(map(int, keypoints_list[0]))
-                        left_eye = tuple(map(int, keypoints_list[1]))
-                        right_eye = tuple(map(int, keypoints_list[2]))
-                        left_ear = tuple(map(int, keypoints_list[3]))
-                        right_ear = tuple(map(int, keypoints_list[4]))
+            if len(keypoints_list) >= 5 and all(kp != [0.0, 0.0] for kp in keypoints_list[:5]):
+                nose = tuple(map(int, keypoints_list[0]))
+                left_eye = tuple(map(int, keypoints_list[1]))
+                right_eye = tuple(map(int, keypoints_list[2]))
+                left_ear = tuple(map(int, keypoints_list[3]))
+                right_ear = tuple(map(int, keypoints_list[4]))
 
-                        eye_distance = math.sqrt((right_eye[0] - left_eye[0]) ** 2 + (right_eye[1] - left_eye[1]) ** 2)
-                        lens_radius = int(eye_distance * 0.4)
-                        frame_size = int(lens_radius / 4)
+                eye_distance = math.sqrt((right_eye[0] - left_eye[0]) ** 2 + (right_eye[1] - left_eye[1]) ** 2)
+                lens_radius = int(eye_distance * 0.4)
+                frame_size = int(lens_radius / 4)
 
-                        cv2.circle(img, left_eye, lens_radius, BLACK, -1)
-                        cv2.circle(img, right_eye, lens_radius, BLACK, -1)
+                cv2.circle(img, left_eye, lens_radius, BLACK, -1)
+                cv2.circle(img, right_eye, lens_radius, BLACK, -1)
 
-                        left_frame_start = (left_eye[0] + lens_radius, left_eye[1])
-                        left_frame_end = (left_ear[0], left_ear[1] - lens_radius)
-                        right_frame_start = (right_eye[0] - lens_radius, right_eye[1])
-                        right_frame_end = (right_ear[0], right_ear[1] - lens_radius)
+                left_frame_start = (left_eye[0] + lens_radius, left_eye[1])
+                left_frame_end = (left_ear[0], left_ear[1] - lens_radius)
+                right_frame_start = (right_eye[0] - lens_radius, right_eye[1])
+                right_frame_end = (right_ear[0], right_ear[1] - lens_radius)
 
-                        cv2.line(img, left_frame_start, left_frame_end, BLACK, frame_size)
-                        cv2.line(img, right_frame_start, right_frame_end, BLACK, frame_size)
-                        cv2.line(img, left_frame_start, right_frame_start, BLACK, frame_size)
+                cv2.line(img, left_frame_start, left_frame_end, BLACK, frame_size)
+                cv2.line(img, right_frame_start, right_frame_end, BLACK, frame_size)
+                cv2.line(img, left_frame_start, right_frame_start, BLACK, frame_size)
 
-                        mustache_length = int(eye_distance * 0.48)
-                        mustache_offset_y = int(eye_distance * 0.32)
-                        mustache_y = nose[1] + int(mustache_offset_y * 1.2)
+                mustache_length = int(eye_distance * 0.48)
+                mustache_offset_y = int(eye_distance * 0.32)
+                mustache_y = nose[1] + int(mustache_offset_y * 1.2)
 
-                        cv2.line(img, (nose[0], mustache_y), (nose[0] - mustache_length, mustache_y + int(mustache_length * 0.3)), BLACK, frame_size)
-                        cv2.line(img, (nose[0], mustache_y), (nose[0] + mustache_length, mustache_y + int(mustache_length * 0.3)), BLACK, frame_size)
-                    else:
-                        cv2.putText(img, "Missing Face Keypoints", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 0, 0), 1)
+                cv2.line(img, (nose[0], mustache_y), (nose[0] - mustache_length, mustache_y + int(mustache_length * 0.3)), BLACK, frame_size)
+                cv2.line(img, (nose[0], mustache_y), (nose[0] + mustache_length, mustache_y + int(mustache_length * 0.3)), BLACK, frame_size)
+            else:
+                cv2.putText(img, "Missing Face Keypoints", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 0, 0), 1)
 
         return img
 
 
     def reset(self):
         # Reset any internal state, clear caches, etc.
-        pass
\ No newline at end of file
+        pass
+
+def benchmark(detector, img, iterations=20):
+    """
+    Times the per-view path (every view runs its own forward pass, as gen_frames used to:
+    box, pose, bottom, then combined re-running all three) against one shared analyze() pass.
+
+    :return: dict of mean milliseconds per frame for each path.
+    """
+    def per_view():
+        detector.test_process_frame_box(img.copy(), detector.analyze(img))
+        detector.test_process_frame_pose_fall(img.copy(), detector.analyze(img))
+        detector.bottom_frac_fall_detection(img.copy(), detector.analyze(img))
+        box_img, box_fallen, _, _ = detector.test_process_frame_box(img.copy(), detector.analyze(img))
+        pose_img, pose_fallen = detector.test_process_frame_pose_fall(img.copy(), detector.analyze(img))
+        bottom_img, bottom_fallen = detector.bottom_frac_fall_detection(img.copy(), detector.analyze(img))
+        detector.combine_overlays(box_img, pose_img, bottom_img, box_fallen, pose_fallen, bottom_fallen)
+
+    def shared():
+        analysis = detector.analyze(img)
+        box_img, box_fallen, _, _ = detector.test_process_frame_box(img.copy(), analysis)
+        pose_img, pose_fallen = detector.test_process_frame_pose_fall(img.copy(), analysis)
+        bottom_img, bottom_fallen = detector.bottom_frac_fall_detection(img.copy(), analysis)
+        detector.combine_overlays(box_img, pose_img, bottom_img, box_fallen, pose_fallen, bottom_fallen)
+
+    timings = {}
+    for name, fn in (("per_view_6_passes", per_view), ("shared_1_pass", shared)):
+        fn()  # warm-up
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        timings[name] = (time.perf_counter() - start) * 1000 / iterations
+    return timings
+
+
+def benchmark_batch(detector, img, robot_counts=(1, 2, 4), iterations=10):
+    """
+    Times N separate analyze() calls (N independent pipelines) against one analyze_batch() call.
+
+    :return: dict mapping N to (sequential ms, batched ms) per round of N frames.
+    """
+    timings = {}
+    for n in robot_counts:
+        frames = [img.copy() for _ in range(n)]
+        detector.analyze_batch(frames)  # warm-up
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for frame in frames:
+                detector.analyze(frame)
+        sequential = (time.perf_counter() - start) * 1000 / iterations
+        start = time.perf_counter()
+        for _ in range(iterations):
+            detector.analyze_batch(frames)
+        batched = (time.perf_counter() - start) * 1000 / iterations
+        timings[n] = (sequential, batched)
+    return timings
+
+
+def keypoint_agreement(reference, other, tolerance=5.0):
+    """
+    Compares two FrameAnalysis of the same frame, pairing each reference person with the other
+    analysis's person whose box center is nearest.
+
+    :param tolerance: Pixel distance under which a keypoint counts as agreeing.
+    :return: dict with matched person counts, mean keypoint error (px), the fraction of keypoints
+             within `tolerance` and whether every fall heuristic gave the same verdicts.
+    """
+    ref_centers = (reference.boxes[:, :2] + reference.boxes[:, 2:]) / 2
+    other_centers = (other.boxes[:, :2] + other.boxes[:, 2:]) / 2
+    errors = []
+    for i, center in enumerate(ref_centers):
+        if len(other_centers) == 0:
+            break
+        j = int(np.argmin(np.linalg.norm(other_centers - center, axis=1)))
+        visible = (reference.keypoints[i] != 0).any(axis=1) & (other.keypoints[j] != 0).any(axis=1)
+        errors.extend(np.linalg.norm(reference.keypoints[i][visible] - other.keypoints[j][visible], axis=1))
+    errors = np.asarray(errors)
+    same_falls = all(
+        np.array_equal(heuristic(reference), heuristic(other))
+        for heuristic in (FallDetector.box_falls, FallDetector.pose_falls, FallDetector.bottom_falls)
+    ) if len(reference) == len(other) else False
+    return {
+        "people": (len(reference), len(other)),
+        "mean_error_px": float(errors.mean()) if len(errors) else 0.0,
+        "within_tolerance": float((errors <= tolerance).mean()) if len(errors) else 1.0,
+        "same_fall_verdicts": same_falls,
+    }
+
+
+def benchmark_backends(img, backends=BACKENDS, int8=False, iterations=20, model_path="yolo_weights/yolo11n-pose.pt"):
+    """
+    Times analyze() on each backend and checks its keypoints against the torch backend.
+
+    :return: dict mapping backend name to {"ms": ..., "agreement": keypoint_agreement(...)}.
+    """
+    reference = FallDetector(model_path).analyze(img)
+    results = {}
+    for backend in backends:
+        detector = FallDetector(model_path, backend=backend, int8=int8 and backend != "torch")
+        detector.analyze(img)  # warm-up
+        start = time.perf_counter()
+        for _ in range(iterations):
+            analysis = detector.analyze(img)
+        results[backend] = {
+            "ms": (time.perf_counter() - start) * 1000 / iterations,
+            "agreement": keypoint_agreement(reference, analysis),
+        }
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="FallDetector benchmarks")
+    parser.add_argument("image_path", nargs="?", default="static/fallen_man.jfif")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS,
+                        help="Compare latency and keypoint agreement of these backends instead")
+    parser.add_argument("--int8", action="store_true", help="Use INT8 exports for onnx/openvino")
+    args = parser.parse_args()
+
+    frame = cv2.resize(cv2.imread(args.image_path), (320, 240))
+    if args.backends:
+        for backend, result in benchmark_backends(frame, args.backends, args.int8).items():
+            agreement = result["agreement"]
+            print(f"{backend}: {result['ms']:.1f} ms/frame, people {agreement['people']}, "
+                  f"keypoint error {agreement['mean_error_px']:.2f} px, "
+                  f"{agreement['within_tolerance'] * 100:.1f}% within 5 px, "
+                  f"same fall verdicts: {agreement['same_fall_verdicts']}")
+        raise SystemExit(0)
+
+    results = benchmark(FallDetector(), frame)
+    for name, ms in results.items():
+        print(f"{name}: {ms:.1f} ms/frame ({1000 / ms:.1f} fps)")
+    print(f"speedup: {results['per_view_6_passes'] / results['shared_1_pass']:.2f}x")
+
+    for n, (sequential, batched) in benchmark_batch(FallDetector(), frame).items():
+        print(f"{n} robot(s): {sequential:.1f} ms sequential, {batched:.1f} ms batched "
+              f"({n * 1000 / batched:.1f} frames/s, {sequential / batched:.2f}x)")